@@ -0,0 +1,223 @@
+"""
+核心引擎基准套件：用空操作节点测量 pocketflow 核心的调度开销与扩展性。
+
+- dispatch: 单个节点 run() 的耗时
+- flow / async_flow: Flow、AsyncFlow 每秒的节点转换数
+- batch_node / batch_flow: BatchNode、BatchFlow 在不同项目数下的吞吐量
+- parallel: AsyncParallelBatchNode 在模拟延迟下随并发数的扩展效率
+- nested: 节点嵌套在多层流程中时每步的耗时
+- memory: AsyncParallelBatchNode 每个处理中项目占用的内存
+
+结果以 JSON 输出（--json），并可与保存的基线比较（--baseline）：任一指标比基线差超过 --tolerance 时以状态码 1 退出。
+
+用法:
+    python benchmarks/bench_core.py [--quick] [--sizes 10,1000,100000,1000000] [--json out.json]
+    python benchmarks/bench_core.py --baseline benchmarks/baseline.json [--tolerance 0.25]
+    python benchmarks/bench_core.py --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, BatchNode, Flow, AsyncFlow, BatchFlow, AsyncParallelBatchNode
+
+class Noop(Node):
+    pass
+
+class Counter(Node):
+    # 计数到 limit 后结束，否则回到自身
+    def prep(self, shared):
+        shared["n"] += 1
+        return shared["n"]
+
+    def post(self, shared, prep_res, exec_res):
+        return "loop" if prep_res < shared["limit"] else "done"
+
+class AsyncCounter(AsyncNode):
+    async def prep_async(self, shared):
+        shared["n"] += 1
+        return shared["n"]
+
+    async def post_async(self, shared, prep_res, exec_res):
+        return "loop" if prep_res < shared["limit"] else "done"
+
+class Items(BatchNode):
+    def prep(self, shared):
+        return range(shared["items"])
+
+class ItemFlow(BatchFlow):
+    def prep(self, shared):
+        return [{"i": i} for i in range(shared["items"])]
+
+class Sleepy(AsyncParallelBatchNode):
+    # 每个项目模拟一次延迟为 latency 秒的 I/O 调用
+    async def prep_async(self, shared):
+        return range(shared["items"])
+
+    async def exec_async(self, item):
+        await asyncio.sleep(self.params["latency"])
+
+class Held(AsyncParallelBatchNode):
+    # 所有项目等待同一个事件，用于测量同时在处理中的项目的内存
+    async def prep_async(self, shared):
+        return range(shared["items"])
+
+    async def exec_async(self, item):
+        self.params["ready"][0] += 1
+        await self.params["release"].wait()
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def best(fn, repeat):
+    # 取多次运行中最快的一次，减少噪声
+    return min(timed(fn) for _ in range(repeat))
+
+def loop_flow(node_cls, flow_cls):
+    a, b = node_cls(), node_cls()
+    a - "loop" >> b
+    b - "loop" >> a
+    return flow_cls(start=a)
+
+def bench_dispatch(args, add):
+    node, shared, n = Noop(), {}, args.steps
+    def run():
+        for _ in range(n):
+            node.run(shared)
+    add("dispatch.node_run", best(run, args.repeat) / n * 1e9, "ns/op", "lower")
+
+def bench_flows(args, add):
+    flow, async_flow, n = loop_flow(Counter, Flow), loop_flow(AsyncCounter, AsyncFlow), args.steps
+    add("flow.transitions", n / best(lambda: flow.run({"n": 0, "limit": n}), args.repeat), "steps/s", "higher")
+    add("async_flow.transitions", n / best(lambda: asyncio.run(async_flow.run_async({"n": 0, "limit": n})), args.repeat),
+        "steps/s", "higher")
+
+def bench_batches(args, add):
+    for size in args.sizes:
+        repeat = args.repeat if size <= 100_000 else 1
+        add(f"batch_node.{size}", size / best(lambda: Items().run({"items": size}), repeat), "items/s", "higher")
+        flow = ItemFlow(start=Noop())
+        add(f"batch_flow.{size}", size / best(lambda: flow.run({"items": size}), repeat), "items/s", "higher")
+
+def bench_parallel(args, add):
+    # 效率 = 理想耗时（批次数 * 延迟）/ 实际耗时；1.0 表示调度没有额外开销
+    items, latency = args.parallel_items, args.latency
+    for limit in (10, 100, None):
+        node = Sleepy(max_concurrency=limit)
+        node.set_params({"latency": latency})
+        seconds = best(lambda: asyncio.run(node._run_async({"items": items})), args.repeat)
+        ideal = latency * (1 if limit is None else -(-items // limit))
+        add(f"parallel.efficiency.{limit or 'unbounded'}", ideal / seconds, "ratio", "higher")
+
+def bench_nested(args, add):
+    # 外层流程的每一步进入 depth 层子流程后运行一个节点，子流程结束时把节点的动作传回外层
+    n = args.steps // 4
+    def build(depth):
+        step = Counter()
+        for _ in range(depth):
+            step = Flow(start=step)
+        step - "loop" >> step
+        return Flow(start=step)
+    for depth in (0, 1, 4):
+        flow = build(depth)
+        add(f"nested.depth_{depth}", best(lambda: flow.run({"n": 0, "limit": n}), args.repeat) / n * 1e9, "ns/step", "lower")
+
+def bench_memory(args, add):
+    items = args.memory_items
+    async def run():
+        ready, release = [0], asyncio.Event()
+        node = Held()
+        node.set_params({"ready": ready, "release": release})
+        task = asyncio.ensure_future(node._run_async({"items": items}))
+        while ready[0] < items:
+            await asyncio.sleep(0.001)
+        current = tracemalloc.get_traced_memory()[0]
+        release.set()
+        await task
+        return current
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    current = asyncio.run(run())
+    tracemalloc.stop()
+    add("memory.in_flight_item", (current - before) / items, "bytes/item", "lower")
+
+def compare(results, baseline, tolerance):
+    # 返回比基线差超过 tolerance 的指标
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b or not b["value"]:
+            continue
+        change = r["value"] / b["value"] - 1
+        worse = -change if r["better"] == "higher" else change
+        r["baseline"], r["change"] = b["value"], round(change, 4)
+        if worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="较小的规模，用于快速检查")
+    parser.add_argument("--sizes", default=None, help="BatchNode/BatchFlow 的项目数，逗号分隔")
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--json", help="把结果写入该文件（- 表示标准输出）")
+    parser.add_argument("--baseline", help="与该基线文件比较")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许比基线差的比例")
+    parser.add_argument("--save-baseline", help="把结果保存为基线文件")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    default_sizes = "10,1000,10000" if args.quick else "10,1000,100000,1000000"
+    args.sizes = [int(s) for s in (args.sizes or default_sizes).split(",")]
+    args.steps = args.steps or (20_000 if args.quick else 200_000)
+    args.parallel_items = 200 if args.quick else 2000
+    args.memory_items = 1000 if args.quick else 10_000
+
+    results = {}
+    def add(name, value, unit, better):
+        results[name] = {"value": round(value, 3), "unit": unit, "better": better}
+        print(f"{name:<32} {value:>14,.2f} {unit}", file=sys.stderr)
+
+    for bench in (bench_dispatch, bench_flows, bench_batches, bench_parallel, bench_nested, bench_memory):
+        bench(args, add)
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name in regressions:
+            r = results[name]
+            print(f"REGRESSION {name}: {r['value']:,} {r['unit']} (baseline {r['baseline']:,}, {r['change']:+.1%})",
+                  file=sys.stderr)
+
+    report = {
+        "meta": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                 "machine": platform.machine(), "quick": args.quick},
+        "results": results,
+        "regressions": regressions,
+    }
+    text = json.dumps(report, indent=2)
+    if args.json == "-":
+        print(text)
+    elif args.json:
+        Path(args.json).write_text(text + "\n")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps({"meta": report["meta"], "results": results}, indent=2) + "\n")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+流程调度微基准：比较编译后的执行计划与旧的逐步调度方式（每步 copy.copy + get_next_node + run）。
+
+用法:
+    python benchmarks/bench_flow_dispatch.py [--steps N]
+"""
+
+import argparse
+import asyncio
+import copy
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow
+
+class Counter(Node):
+    # 空操作节点：计数到 limit 后结束，否则回到自身
+    def prep(self, shared):
+        shared["n"] += 1
+        return shared["n"]
+
+    def post(self, shared, prep_res, exec_res):
+        return "loop" if prep_res < shared["limit"] else "done"
+
+class AsyncCounter(AsyncNode):
+    async def prep_async(self, shared):
+        shared["n"] += 1
+        return shared["n"]
+
+    async def post_async(self, shared, prep_res, exec_res):
+        return "loop" if prep_res < shared["limit"] else "done"
+
+def legacy_orch(flow, shared):
+    # 旧的调度循环：每一步都 copy.copy 节点、通过 run() 运行并调用 get_next_node
+    curr, p, last_action = copy.copy(flow.start_node), {**flow.params}, None
+    while curr:
+        curr.set_params(p)
+        last_action = curr.run(shared)
+        curr = copy.copy(flow.get_next_node(curr, last_action))
+    return last_action
+
+async def legacy_orch_async(flow, shared):
+    curr, p, last_action = copy.copy(flow.start_node), {**flow.params}, None
+    while curr:
+        curr.set_params(p)
+        last_action = await curr._run_async(shared) if isinstance(curr, AsyncNode) else curr.run(shared)
+        curr = copy.copy(flow.get_next_node(curr, last_action))
+    return last_action
+
+def build(node_cls, flow_cls):
+    # 两个节点相互循环，模拟智能体循环
+    a, b = node_cls(), node_cls()
+    a - "loop" >> b
+    b - "loop" >> a
+    return flow_cls(start=a)
+
+def measure(fn, steps):
+    shared = {"n": 0, "limit": steps}
+    start = time.perf_counter()
+    fn(shared)
+    return steps / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=200_000)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    flow = build(Counter, Flow)
+    async_flow = build(AsyncCounter, AsyncFlow)
+    rows = [
+        ("Flow (legacy)", measure(lambda s: legacy_orch(flow, s), args.steps)),
+        ("Flow (compiled)", measure(lambda s: flow._orch(s), args.steps)),
+        ("AsyncFlow (legacy)", measure(lambda s: asyncio.run(legacy_orch_async(async_flow, s)), args.steps)),
+        ("AsyncFlow (compiled)", measure(lambda s: asyncio.run(async_flow._orch_async(s)), args.steps)),
+    ]
+    for name, rate in rows:
+        print(f"{name:<22} {rate:>12,.0f} steps/s")
+
+if __name__ == "__main__":
+    main()
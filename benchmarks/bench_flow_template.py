@@ -0,0 +1,99 @@
+"""
+流程模板基准：小型流程在并发负载下每秒可处理的请求数，比较三种常见做法：
+- rebuild: 每个请求调用 create_flow() 重新构建流程图（同时使所有已编译的执行计划失效）
+- deepcopy: 启动时构建一次，每个请求 copy.deepcopy 一份
+- template: 启动时构建一次 FlowTemplate，每个请求直接运行
+
+用法:
+    python benchmarks/bench_flow_template.py [--requests N] [--threads N] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import copy
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow, FlowTemplate
+
+class Classify(Node):
+    def prep(self, shared):
+        return shared["message"]
+
+    def exec(self, message):
+        return "question" if message.endswith("?") else "chat"
+
+    def post(self, shared, prep_res, exec_res):
+        return exec_res
+
+class Answer(Node):
+    def post(self, shared, prep_res, exec_res):
+        shared["reply"] = "answer"
+
+class Chat(Node):
+    def post(self, shared, prep_res, exec_res):
+        shared["reply"] = "chat"
+
+class AsyncClassify(AsyncNode):
+    async def prep_async(self, shared):
+        return shared["message"]
+
+    async def post_async(self, shared, prep_res, exec_res):
+        return "question" if prep_res.endswith("?") else "chat"
+
+def create_flow(async_=False):
+    # 路由 -> 回答 / 闲聊，模拟一个小型聊天流程
+    classify = AsyncClassify() if async_ else Classify()
+    classify - "question" >> Answer()
+    classify - "chat" >> Chat()
+    return (AsyncFlow if async_ else Flow)(start=classify)
+
+def sync_modes():
+    shared_flow, template = create_flow(), FlowTemplate(create_flow())
+    return {
+        "rebuild": lambda s: create_flow().run(s),
+        "deepcopy": lambda s: copy.deepcopy(shared_flow).run(s),
+        "template": template.run,
+    }
+
+def async_modes():
+    shared_flow, template = create_flow(True), FlowTemplate(create_flow(True))
+    return {
+        "rebuild": lambda s: create_flow(True).run_async(s),
+        "deepcopy": lambda s: copy.deepcopy(shared_flow).run_async(s),
+        "template": template.run_async,
+    }
+
+def bench_threads(handle, requests, threads):
+    with ThreadPoolExecutor(threads) as ex:
+        start = time.perf_counter()
+        list(ex.map(lambda i: handle({"message": f"hi {i}?"}), range(requests)))
+        return requests / (time.perf_counter() - start)
+
+async def bench_tasks(handle, requests, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    async def one(i):
+        async with sem:
+            await handle({"message": f"hi {i}?"})
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    for name, handle in sync_modes().items():
+        print(f"Flow      {name:<10} {bench_threads(handle, args.requests, args.threads):>10,.0f} req/s  ({args.threads} threads)")
+    for name, handle in async_modes().items():
+        rate = asyncio.run(bench_tasks(handle, args.requests, args.concurrency))
+        print(f"AsyncFlow {name:<10} {rate:>10,.0f} req/s  ({args.concurrency} tasks)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+对冲请求基准：模拟长尾延迟的 LLM 调用（大部分调用接近中位数，少数调用慢数倍），
+比较 AsyncParallelBatchNode 在不对冲和对冲时的整批延迟，以及对冲带来的额外调用比例。
+
+用法:
+    python benchmarks/bench_hedge.py [--batches N] [--batch-size N] [--median S] [--tail-prob P] [--tail-factor F] [--percentile P] [--max-extra R]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import AsyncParallelBatchNode, HedgePolicy
+
+class CallLLM(AsyncParallelBatchNode):
+    async def prep_async(self, shared):
+        return shared["items"]
+
+    async def exec_async(self, item):
+        cfg = self.params
+        latency = cfg["median"] * random.lognormvariate(0, 0.25)
+        if random.random() < cfg["tail_prob"]:
+            latency *= cfg["tail_factor"]
+        await asyncio.sleep(latency)
+        return item
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p * len(values)))] * 1000
+    return f"p50={pick(0.5):>7.0f}ms  p95={pick(0.95):>7.0f}ms  p99={pick(0.99):>7.0f}ms"
+
+async def run(args, policy):
+    node, batches = CallLLM(), []
+    node.hedge_policy = policy
+    node.set_params({"median": args.median, "tail_prob": args.tail_prob, "tail_factor": args.tail_factor})
+    for _ in range(args.batches):
+        start = time.monotonic()
+        await node.run_async({"items": list(range(args.batch_size))})
+        batches.append(time.monotonic() - start)
+    return batches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--median", type=float, default=0.02, help="单次调用延迟的中位数（秒）")
+    parser.add_argument("--tail-prob", type=float, default=0.02, help="慢调用的比例")
+    parser.add_argument("--tail-factor", type=float, default=8.0, help="慢调用相对正常调用的倍数")
+    parser.add_argument("--percentile", type=float, default=0.95)
+    parser.add_argument("--max-extra", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name in ("none", "hedged"):
+        random.seed(args.seed)
+        policy = HedgePolicy(args.percentile, max_extra=args.max_extra) if name == "hedged" else None
+        batches = asyncio.run(run(args, policy))
+        calls = args.batches * args.batch_size
+        print(f"[{name}] batch  {percentiles(batches)}")
+        if policy is not None:
+            s = policy.stats()
+            print(f"[{name}] extra calls={s['hedged']}/{calls} hedge_rate={s['hedge_rate']:.3f} "
+                  f"win_rate={s['win_rate']:.2f} delay={s['delay'] * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+事件循环延迟基准：AsyncFlow 运行阻塞的同步节点时，比较直接在事件循环中运行与 offload_sync（在线程池中运行）。
+
+一个心跳协程每隔 --tick 毫秒醒来一次并记录实际的延迟；同时多个会话各自运行一个包含阻塞同步节点的 AsyncFlow。
+
+用法:
+    python benchmarks/bench_loop_latency.py [--sessions N] [--nodes N] [--block-ms MS] [--tick MS]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncFlow
+
+class BlockingNode(Node):
+    # 模拟基于 requests 的工具调用或 sqlite 查询
+    def exec(self, prep_res):
+        time.sleep(self.params["block"])
+
+def build(nodes, offload):
+    first = curr = BlockingNode()
+    for _ in range(nodes - 1):
+        curr = curr >> BlockingNode()
+    flow = AsyncFlow(start=first)
+    flow.offload_sync = offload
+    return flow
+
+async def heartbeat(tick, lags, stop):
+    # 记录每次醒来比预期晚了多少毫秒
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append((time.perf_counter() - start - tick) * 1000)
+
+async def run(args, offload):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(args.tick / 1000, lags, stop))
+    start = time.perf_counter()
+    flows = [build(args.nodes, offload) for _ in range(args.sessions)]
+    for f in flows:
+        f.set_params({"block": args.block_ms / 1000})
+    await asyncio.gather(*(f.run_async({}) for f in flows))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    lags.sort()
+    return elapsed, statistics.median(lags), lags[int(len(lags) * 0.99) - 1], lags[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--nodes", type=int, default=5)
+    parser.add_argument("--block-ms", type=float, default=20)
+    parser.add_argument("--tick", type=float, default=1)
+    args = parser.parse_args()
+
+    print(f"{'mode':<16} {'wall (s)':>9} {'lag p50 (ms)':>13} {'lag p99 (ms)':>13} {'lag max (ms)':>13}")
+    for name, offload in (("on event loop", False), ("offload_sync", True)):
+        elapsed, p50, p99, worst = asyncio.run(run(args, offload))
+        print(f"{name:<16} {elapsed:>9.2f} {p50:>13.2f} {p99:>13.2f} {worst:>13.2f}")
+
+if __name__ == "__main__":
+    main()
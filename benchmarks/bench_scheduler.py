@@ -0,0 +1,85 @@
+"""
+调度器负载测试：过载时交互式租户与批处理租户的端到端延迟。
+
+若干批处理租户一次性提交大量流程，同时交互式租户按固定速率提交短流程；总负载超过工作者的处理能力。
+比较两种配置：
+- fifo: 所有运行同一优先级、同一租户（相当于没有调度，先到先服务）
+- scheduled: 交互式流程优先级更高，每个批处理租户有并发上限
+
+用法:
+    python benchmarks/bench_scheduler.py [--workers N] [--batch-tenants N] [--batch-runs N] [--interactive-rps N] [--duration S]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import AsyncNode, AsyncFlow, AsyncFlowScheduler
+
+class CallLLM(AsyncNode):
+    # 模拟一次 LLM 调用
+    async def exec_async(self, prep_res):
+        await asyncio.sleep(self.params["latency"])
+
+def build(latency, steps):
+    first = curr = CallLLM()
+    for _ in range(steps - 1):
+        curr = curr >> CallLLM()
+    flow = AsyncFlow(start=first)
+    flow.set_params({"latency": latency})
+    return flow
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p * len(values)))] * 1000
+    return f"n={len(values):<5} p50={pick(0.5):>8.0f}ms  p95={pick(0.95):>8.0f}ms  p99={pick(0.99):>8.0f}ms"
+
+async def run(args, scheduled):
+    if scheduled:
+        sched = AsyncFlowScheduler(args.workers, tenant_limits={f"batch-{i}": args.batch_quota for i in range(args.batch_tenants)})
+    else:
+        sched = AsyncFlowScheduler(args.workers)
+    latencies = {"interactive": [], "batch": []}
+
+    async def submit(kind, tenant, flow, priority):
+        start = time.monotonic()
+        if scheduled:
+            await sched.submit(flow, {}, priority=priority, tenant=tenant)
+        else:
+            await sched.submit(flow, {})
+        latencies[kind].append(time.monotonic() - start)
+
+    jobs = [asyncio.ensure_future(submit("batch", f"batch-{t}", build(args.latency, args.batch_steps), 10))
+            for t in range(args.batch_tenants) for _ in range(args.batch_runs)]
+    start = time.monotonic()
+    while time.monotonic() - start < args.duration:
+        jobs.append(asyncio.ensure_future(submit("interactive", "chat", build(args.latency, 1), 0)))
+        await asyncio.sleep(1 / args.interactive_rps)
+    await asyncio.gather(*jobs)
+    return latencies, sched.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--batch-tenants", type=int, default=4)
+    parser.add_argument("--batch-runs", type=int, default=200, help="每个批处理租户提交的流程数")
+    parser.add_argument("--batch-steps", type=int, default=3)
+    parser.add_argument("--batch-quota", type=int, default=6, help="scheduled 配置下每个批处理租户的并发上限")
+    parser.add_argument("--interactive-rps", type=float, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="每次模拟 LLM 调用的秒数")
+    parser.add_argument("--duration", type=float, default=3.0, help="交互式请求持续提交的秒数")
+    args = parser.parse_args()
+
+    for name, scheduled in (("fifo", False), ("scheduled", True)):
+        latencies, stats = asyncio.run(run(args, scheduled))
+        print(f"[{name}] completed={stats['completed']} rejected={stats['rejected']}")
+        for kind in ("interactive", "batch"):
+            print(f"  {kind:<12} {percentiles(latencies[kind])}")
+        waits = {str(t): s["wait_p95"] * 1000 for t, s in stats["tenants"].items()}
+        print("  queue wait p95: " + ", ".join(f"{t}={w:.0f}ms" for t, w in sorted(waits.items())))
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,21 @@
-import asyncio, warnings, copy, time
+import asyncio, warnings, copy, time, os, functools, contextvars, heapq, queue, threading, hashlib, pickle
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as _FutureTimeout
+from concurrent.futures import wait as _wait_futures, FIRST_COMPLETED
+
+class _FrozenSuccessors(dict):
+    # FlowTemplate 中节点的只读后继表；pickle（例如发送给工作进程）后为普通字典
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Successors of a node in a FlowTemplate are read-only")
+
+    __setitem__ = __delitem__ = setdefault = pop = popitem = clear = update = __ior__ = _readonly
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+def _check_mutable(node):
+    # 属于 FlowTemplate 的节点不能再修改流程图
+    if type(node.successors) is _FrozenSuccessors:
+        raise TypeError(f"{type(node).__name__} belongs to a FlowTemplate and cannot be modified")
 
 # BaseNode 是所有节点的基础类，定义了节点的通用行为和生命周期方法。
 class BaseNode:
@@ -12,6 +29,8 @@ class BaseNode:
 
     def next(self, node, action="default"):
         # 定义节点的下一个后继节点
+        _check_mutable(self)
+        _graph_changed()
         if action in self.successors:
             warnings.warn(f"Overwriting successor for action '{action}'")
         self.successors[action] = node
@@ -34,7 +53,10 @@ class BaseNode:
         return self.exec(prep_res)
 
     def _run(self, shared):
-        # 内部运行方法，按顺序调用 prep, _exec, post 方法
+        # 内部运行方法，按顺序调用 prep, _exec, post 方法；启用追踪时记录每个阶段
+        t = _tracer_var.get()
+        if t is not None:
+            return t.run_phases(self, shared)
         p = self.prep(shared)
         e = self._exec(p)
         return self.post(shared, p, e)
@@ -67,6 +89,17 @@ class _ConditionalTransition:
 
 # Node 类继承自 BaseNode，增加了重试机制
 class Node(BaseNode):
+    # cache 为可选的结果缓存（见 pocketflow.cache），cache_version 变化时旧的缓存结果不再命中
+    cache, cache_version = None, 0
+    # retry_policy 为可选的重试策略（见 pocketflow.retry），未设置时每次失败后固定等待 wait 秒
+    retry_policy = None
+    # exec_timeout 为单次 exec 的超时时间（秒），超时视为一次可重试的失败；所在流程设置了 timeout 时不超过剩余时间
+    exec_timeout = None
+    # rate_limit 为限流器名称或 RateLimiter 实例（见 pocketflow.ratelimit），每次 exec 尝试前取得一次请求和 rate_cost 的额度
+    rate_limit = None
+    # always_run 为 True 时增量执行（见 pocketflow.incremental）不跳过该节点，用于有外部副作用的节点
+    always_run = False
+
     def __init__(self, max_retries=1, wait=0):
         # 初始化节点，设置最大重试次数和重试间隔
         super().__init__()
@@ -76,36 +109,632 @@ class Node(BaseNode):
         # 执行失败时的回退方法，默认重新抛出异常
         raise exc
 
-    def _exec(self, prep_res):
-        # 内部执行方法，包含重试逻辑
-        for cur_retry in range(self.max_retries):
+    def rate_cost(self, prep_res):
+        # 本次 exec 预计消耗的 token 或成本，计入限流器的 tpm 预算，子类可重写
+        return 0
+
+    def cache_key(self, prep_res):
+        # 计算缓存键，默认由节点类、cache_version、params 和 prep_res 的哈希组成，子类可重写
+        return _cache.make_key(self, prep_res)
+
+    def _retry_delay(self, cur_retry, exc):
+        # 第 cur_retry 次尝试失败后等待的秒数；返回 None 表示不再重试（已是最后一次、重试策略不重试该异常，或等待后已超过流程的截止时间）
+        if cur_retry >= self.max_retries - 1:
+            return None
+        delay = self.wait if self.retry_policy is None else self.retry_policy.delay(cur_retry, exc)
+        left = remaining_time()
+        return None if delay is not None and left is not None and left <= delay else delay
+
+    def _exec_timeout(self):
+        # 本次 exec 的超时时间：exec_timeout 与所在流程剩余时间中较小的一个，都没有时为 None
+        left = remaining_time()
+        if left is None:
+            return self.exec_timeout
+        return left if self.exec_timeout is None else min(self.exec_timeout, left)
+
+    def _exec_once(self, prep_res):
+        # 执行一次 exec；节点设置了 exec_timeout 时在单独的线程中运行，超时后抛出 TimeoutError（该线程无法被强制终止，会在后台运行完）
+        # 只有流程的截止时间时不使用线程（exec 可以使用 prep 中创建的线程绑定资源，例如 sqlite 连接），只在每次尝试前检查剩余时间
+        if self.rate_limit is not None:
+            if _prepaid_var.get() is self:
+                _prepaid_var.set(None)
+            else:
+                _ratelimit.acquire(self, self.rate_cost(prep_res))
+        timeout = self._exec_timeout()
+        if timeout is not None and timeout <= 0:
+            raise _timeout_error(self, timeout)
+        if self.exec_timeout is None:
+            return self.exec(prep_res)
+        fut, ctx = Future(), contextvars.copy_context()
+        def target():
+            fut.set_running_or_notify_cancel()
+            try:
+                fut.set_result(ctx.run(self.exec, prep_res))
+            except BaseException as e:
+                fut.set_exception(e)
+        threading.Thread(target=target, daemon=True).start()
+        try:
+            return fut.result(timeout)
+        except _FutureTimeout:
+            raise _timeout_error(self, timeout) from None
+
+    def _exec(self, prep_res, start=0):
+        # 内部执行方法：启用缓存时先查询缓存，只缓存成功的结果，回退结果不会被缓存
+        if self.cache is not None:
+            try:
+                return self.cache.get_or_call(self.cache_key(prep_res), self._exec_retry, prep_res, False, start)
+            except Exception as e:
+                return self.exec_fallback(prep_res, e)
+        if (self.rate_limit is not None or self.exec_timeout is not None
+                or _tracer_var.get() is not None or _deadline_var.get() is not None):
+            return self._exec_retry(prep_res, True, start)
+        # 没有追踪、限流、exec_timeout 和流程截止时间时直接调用 exec，每次尝试不经过 _exec_once
+        for cur_retry in range(start, self.max_retries):
             try:
                 return self.exec(prep_res)
             except Exception as e:
-                # 如果是最后一次重试，则调用回退方法
-                if cur_retry == self.max_retries - 1:
-                    return self.exec_fallback(prep_res, e)
-                # 如果设置了等待时间，则暂停
-                if self.wait > 0:
-                    time.sleep(self.wait)
+                done, res = self._failed(prep_res, cur_retry, e, True)
+                if done:
+                    return res
+        raise Exception("Max retries reached")
+
+    def _exec_retry(self, prep_res, fallback=True, start=0):
+        # 带重试逻辑的执行，从第 start 次尝试开始；fallback 为 False 时最后一次失败直接抛出异常；启用追踪时记录每次尝试
+        t = _tracer_var.get()
+        for cur_retry in range(start, self.max_retries):
+            try:
+                if t is None:
+                    return self._exec_once(prep_res)
+                return t.call(self, "exec", self._exec_once, prep_res, attempt=cur_retry)
+            except Exception as e:
+                done, res = self._failed(prep_res, cur_retry, e, fallback)
+                if done:
+                    return res
         raise Exception("Max retries reached")
 
+    def _failed(self, prep_res, cur_retry, exc, fallback):
+        # 第 cur_retry 次尝试失败后调用：不再重试时返回 (True, 回退结果)（fallback 为 False 时抛出异常），否则等待后返回 (False, None)
+        delay = self._retry_delay(cur_retry, exc)
+        if delay is None:
+            if not fallback:
+                raise exc
+            return True, self.exec_fallback(prep_res, exc)
+        if delay > 0:
+            # 在线程池批处理中不占用工作线程等待，而是交给调度循环延后重新提交（见 _run_deferrable）
+            if _defer_var.get() is self:
+                raise _Deferred(delay, cur_retry + 1)
+            time.sleep(delay)
+        return False, None
+
+# 当前流程的截止时间（time.monotonic() 的值），由设置了 timeout 的流程设置并传递给嵌套的流程和节点
+_deadline_var = contextvars.ContextVar("pocketflow_deadline", default=None)
+
+def remaining_time():
+    # 返回所在流程剩余的时间（秒，可能为负数）；不在设置了 timeout 的流程中运行时返回 None
+    d = _deadline_var.get()
+    return None if d is None else d - time.monotonic()
+
+def _enter_deadline(flow):
+    # 流程设置了 timeout 时设置其截止时间（不晚于外层流程的截止时间），返回用于恢复的令牌
+    if flow.timeout is None:
+        return None
+    d, outer = time.monotonic() + flow.timeout, _deadline_var.get()
+    return _deadline_var.set(d if outer is None else min(d, outer))
+
+def _timeout_error(node, timeout):
+    return TimeoutError(f"{type(node).__name__}.exec timed out after {max(timeout, 0):.3g}s")
+
+# _Deferred 表示线程池中的某个项目需要在 delay 秒后从第 start 次尝试继续
+# 继承自 BaseException，不会被 exec_fallback 或缓存当作普通的执行失败
+class _Deferred(BaseException):
+    def __init__(self, delay, start):
+        self.delay, self.start = delay, start
+
+# 当前线程池项目中允许延后重试的节点
+_defer_var = contextvars.ContextVar("pocketflow_defer", default=None)
+
+# 当前项目下一次 exec 尝试已经计入限流的节点（向量化批处理的整块失败后逐项回退时）
+_prepaid_var = contextvars.ContextVar("pocketflow_prepaid", default=None)
+
+def _prepaid(node, fn, item):
+    token = _prepaid_var.set(node)
+    try:
+        return fn(item)
+    finally:
+        _prepaid_var.reset(token)
+
 
 # BatchNode 类继承自 Node，用于批量处理数据
+# 重写 exec_batch 时按 batch_size 分块整体执行（适合 NumPy、pandas 等向量化运算），否则对每个项目调用 exec
 class BatchNode(Node):
+    # batch_size 为每次调用 exec_batch 的项目数，None 表示整个批次一次调用；可通过 params["batch_size"] 按次运行覆盖
+    batch_size = None
+    # on_error 为单个项目重试用完后仍失败时的处理方式："raise" 抛出异常并取消其余项目，
+    # "collect" 记录异常并继续，post 收到 BatchResult；可通过 params["on_error"] 按次运行覆盖
+    on_error = "raise"
+
+    def exec_batch(self, items):
+        # 可选：一次处理一块项目，返回与 items 等长、顺序一致的结果（列表或可迭代对象，例如数组）
+        raise NotImplementedError
+
+    def _exec(self, items):
+        # 批量执行，对每个项调用父类的 _exec 方法；重写了 exec_batch 时改为分块执行
+        prev, items = _pending(self, items)
+        if type(self).exec_batch is BatchNode.exec_batch:
+            fn, its = _indexed(_guarded(self, super(BatchNode, self)._exec), items or [])
+            return _finish(self, prev, items, [fn(i) for i in its])
+        items, res = list(items or []), []
+        size = self.params.get("batch_size", self.batch_size) or len(items) or 1
+        for s in range(0, len(items), size):
+            res.extend(self._exec_chunk(items[s:s + size], s))
+        return _finish(self, prev, items, res)
+
+    def _exec_chunk(self, chunk, offset):
+        # 整块执行一次（计入限流和追踪）；失败时对块内每个项目回退为带重试的 exec，块内其他项目不受影响
+        # 整块已计入限流时，每个项目回退后的第一次尝试不再计入；没有重写 exec 时不回退，每个项目直接交给 exec_fallback
+        t, charged = _tracer_var.get(), False
+        try:
+            if self.rate_limit is not None:
+                _ratelimit.acquire(self, sum(self.rate_cost(i) for i in chunk))
+                charged = True
+            out = self.exec_batch(chunk) if t is None else t.call(self, "exec_batch", self.exec_batch, chunk, size=len(chunk))
+        except Exception as e:
+            if type(self).exec is BaseNode.exec:
+                fn = lambda item: self.exec_fallback(item, e)
+            elif charged:
+                fn = functools.partial(_prepaid, self, super(BatchNode, self)._exec)
+            else:
+                fn = super(BatchNode, self)._exec
+            fn = _guarded(self, fn)
+            if t is None:
+                return [fn(i) for i in chunk]
+            return list(map(_tracing.indexed(fn), enumerate(chunk, offset)))
+        return _check_batch(chunk, out if isinstance(out, list) else list(out))
+
+# BatchResult 是 on_error="collect" 时批处理节点的 exec_res：按项目顺序排列的结果列表，失败项目的位置为 None
+# errors 为 下标 -> 异常，items 为对应的输入项目；prep 返回上次的 BatchResult 时只重新执行其中失败的项目
+class BatchResult(list):
+    def __init__(self, results=(), items=(), errors=None):
+        super().__init__(results)
+        self.items, self.errors = list(items), dict(errors or {})
+
+    @property
+    def failed(self):
+        # 失败项目的下标（升序）
+        return sorted(self.errors)
+
+    def __repr__(self):
+        return f"BatchResult({list(self)!r}, errors={self.errors!r})"
+
+class _Failed:
+    # 收集模式下单个项目的失败
+    __slots__ = ("exc",)
+
+    def __init__(self, exc):
+        self.exc = exc
+
+def _collecting(node):
+    return node.params.get("on_error", node.on_error) == "collect"
+
+def _pending(node, items):
+    # 返回 (上次的 BatchResult 或 None, 本次要执行的项目)；收集模式下把项目转为列表以便记录在结果中
+    if isinstance(items, BatchResult):
+        return items, [items.items[i] for i in items.failed]
+    if _collecting(node):
+        return None, list(items or [])
+    return None, items
+
+def _guarded(node, fn):
+    # 收集模式下包装单项执行函数：失败时返回 _Failed 而不是抛出异常
+    if not _collecting(node):
+        return fn
+    if asyncio.iscoroutinefunction(fn):
+        async def call_async(item):
+            try:
+                return await fn(item)
+            except Exception as e:
+                return _Failed(e)
+        return call_async
+    def call(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return _Failed(e)
+    return call
+
+def _finish(node, prev, items, res):
+    # 组装批处理结果：收集模式或续跑上次的结果时返回 BatchResult，否则原样返回列表
+    if prev is None and not _collecting(node):
+        return res
+    errors = {i: r.exc for i, r in enumerate(res) if type(r) is _Failed}
+    out = BatchResult((None if type(r) is _Failed else r for r in res), items, errors)
+    if prev is None:
+        return out
+    merged = BatchResult(prev, prev.items)
+    for j, i in enumerate(prev.failed):
+        merged[i] = out[j]
+        if j in errors:
+            merged.errors[i] = errors[j]
+    return merged
+
+def _indexed(fn, items):
+    # 启用追踪时包装单项执行函数，使每个项目内的事件记录其在批次中的下标；未启用时原样返回
+    if _tracer_var.get() is None:
+        return fn, items
+    return _tracing.indexed(fn), enumerate(items)
+
+# _pool_map 在执行器中按输入顺序映射 fn；未提供 executor 时按 max_workers 临时创建一个 pool_cls 实例
+def _pool_map(pool_cls, executor, max_workers, fn, items, chunksize=1):
+    if not items:
+        return []
+    ex = executor or pool_cls(max_workers)
+    try:
+        return list(ex.map(fn, items, chunksize=chunksize))
+    except BaseException:
+        # 某个项目失败时，取消尚未开始的项目
+        if executor is None:
+            ex.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        if executor is None:
+            ex.shutdown(wait=True)
+
+def _in_context(fn):
+    # 让线程池中的任务继承调用方的 contextvars（例如检查点游标）
+    ctx = contextvars.copy_context()
+    return lambda *args: ctx.copy().run(fn, *args)
+
+def _exec_item(node, item):
+    # 对单个项目执行带重试的 exec；定义在模块级别以便进程池 pickle
+    return _guarded(node, functools.partial(Node._exec, node))(item)
+
+def _attempt_item(node, i, item, start):
+    # 在线程池中运行第 i 个项目，从第 start 次尝试开始；需要等待重试时返回 _Deferred 而不是占用线程
+    _defer_var.set(node)
+    if _tracer_var.get() is not None:
+        _tracing._item.set(i)
+    try:
+        return Node._exec(node, item, start)
+    except _Deferred as d:
+        return d
+    except Exception as e:
+        if not _collecting(node):
+            raise
+        return _Failed(e)
+
+def _run_deferrable(executor, max_workers, node, items):
+    # 在线程池中执行每个项目，结果保持输入顺序；等待重试的项目由本线程按定时器重新提交，等待期间不占用工作线程
+    if not items:
+        return []
+    ex, done, timers = executor or ThreadPoolExecutor(max_workers), queue.SimpleQueue(), []
+    res, pending = [None] * len(items), {}
+    def submit(i, start):
+        # 每次提交都使用调用方 contextvars 的一份新副本
+        f = ex.submit(contextvars.copy_context().run, _attempt_item, node, i, items[i], start)
+        pending[f] = i
+        f.add_done_callback(done.put)
+    try:
+        for i in range(len(items)):
+            submit(i, 0)
+        while pending or timers:
+            try:
+                f = done.get(timeout=max(0, timers[0][0] - time.monotonic()) if timers else None)
+            except queue.Empty:
+                f = None
+            if f is not None:
+                i, r = pending.pop(f), f.result()
+                if isinstance(r, _Deferred):
+                    heapq.heappush(timers, (time.monotonic() + r.delay, i, r.start))
+                else:
+                    res[i] = r
+            while timers and timers[0][0] <= time.monotonic():
+                _, i, start = heapq.heappop(timers)
+                submit(i, start)
+        return res
+    except BaseException:
+        # 某个项目失败时，取消尚未开始的项目
+        for f in pending:
+            f.cancel()
+        raise
+    finally:
+        if executor is None:
+            ex.shutdown(wait=True)
+
+# ThreadPoolBatchNode 类继承自 BatchNode，在线程池中并行执行每个项目，适合阻塞 I/O（如同步的 call_llm）
+class ThreadPoolBatchNode(BatchNode):
+    def __init__(self, max_retries=1, wait=0, max_workers=None, executor=None):
+        # max_workers 限制工作线程数（可通过 params["max_workers"] 按次运行覆盖）；executor 可传入共享的线程池
+        super().__init__(max_retries, wait)
+        self.max_workers, self.executor = max_workers, executor
+
     def _exec(self, items):
-        # 批量执行，对每个项调用父类的 _exec 方法
-        return [super(BatchNode, self)._exec(i) for i in (items or [])]
+        # 并行批量执行，结果保持输入顺序；重试等待期间不占用工作线程
+        prev, items = _pending(self, items)
+        workers = self.params.get("max_workers", self.max_workers)
+        items = list(items or [])
+        return _finish(self, prev, items, _run_deferrable(self.executor, workers, self, items))
+
+# ProcessPoolBatchNode 类继承自 BatchNode，在进程池中并行执行每个项目，适合 CPU 密集型任务
+# 节点类、项目和结果都必须可以 pickle（节点类需定义在模块级别）
+class ProcessPoolBatchNode(BatchNode):
+    def __init__(self, max_retries=1, wait=0, max_workers=None, executor=None, chunksize=None):
+        # chunksize 为每次发送给工作进程的项目数，None 时按项目数和进程数自动计算
+        super().__init__(max_retries, wait)
+        self.max_workers, self.executor, self.chunksize = max_workers, executor, chunksize
+
+    def _exec(self, items):
+        # 并行批量执行，结果保持输入顺序
+        prev, items = _pending(self, items)
+        items = list(items or [])
+        workers = self.params.get("max_workers", self.max_workers)
+        chunksize = self.chunksize or max(1, len(items) // ((workers or os.cpu_count() or 1) * 4))
+        # 发送给工作进程的副本不携带后继节点和执行器，避免 pickle 整个图
+        node = copy.copy(self)
+        node.successors, node.executor = {}, None
+        return _finish(self, prev, items, _pool_map(ProcessPoolExecutor, self.executor, workers,
+                                                    functools.partial(_exec_item, node), items, chunksize))
+
+# StreamingBatchNode 类继承自 BatchNode，逐个消费 prep 返回的任意可迭代对象（如生成器、分块读取器）
+# 每个项目完成后立即调用 post_item，不在内存中保留结果列表；post 收到的 exec_res 为已处理的项目数
+class StreamingBatchNode(BatchNode):
+    def post_item(self, shared, item, exec_res):
+        # 单个项目完成后的处理（例如累加统计、写入文件），子类可重写
+        pass
+
+    def _run(self, shared):
+        # 流式运行：prep -> 对每个项目 exec + post_item -> post
+        p, n = self.prep(shared), 0
+        for item in (p or ()):
+            self.post_item(shared, item, super(BatchNode, self)._exec(item))
+            n += 1
+        return self.post(shared, p, n)
+
+# _Coalescer 收集多个线程对同一个微批处理节点的调用；第一个加入新批次的调用方负责在批次满或等待超时后执行整批
+class _Coalescer:
+    def __init__(self):
+        self.cond, self.batch = threading.Condition(), None
+
+    def call(self, node, item):
+        fut = Future()
+        with self.cond:
+            batch, leader = self.batch, self.batch is None
+            if leader:
+                batch = self.batch = []
+            batch.append((item, fut))
+            if len(batch) >= node.max_batch_size:
+                self.batch = None
+                self.cond.notify_all()
+        if leader:
+            deadline = time.monotonic() + node.max_wait_ms / 1000
+            with self.cond:
+                while self.batch is batch and time.monotonic() < deadline:
+                    self.cond.wait(deadline - time.monotonic())
+                if self.batch is batch:
+                    self.batch = None
+            try:
+                results = node._exec_batch([i for i, _ in batch])
+            except BaseException as e:
+                for _, f in batch:
+                    f.set_exception(e)
+            else:
+                for (_, f), r in zip(batch, results):
+                    f.set_result(r)
+        return fut.result()
+
+def _check_batch(items, results):
+    if len(results) != len(items):
+        raise ValueError(f"exec_batch returned {len(results)} results for {len(items)} items")
+    return results
+
+# MicroBatchNode 类继承自 Node，把并发调用方（例如多个线程中运行的流程）的单个 exec 合并为一次 exec_batch(items)
+# 批次在达到 max_batch_size 个项目或第一个项目等待了 max_wait_ms 毫秒后执行；收集状态由节点的所有浅拷贝共享
+class MicroBatchNode(Node):
+    def __init__(self, max_retries=1, wait=0, max_batch_size=32, max_wait_ms=5):
+        super().__init__(max_retries, wait)
+        self.max_batch_size, self.max_wait_ms, self._batcher = max_batch_size, max_wait_ms, _Coalescer()
+
+    def exec_batch(self, items):
+        # 批量执行，返回与 items 等长、顺序一致的结果列表，子类应重写
+        raise NotImplementedError
+
+    def _exec(self, prep_res):
+        # 整批重试用完后，每个调用方各自调用 exec_fallback
+        try:
+            return self._batcher.call(self, prep_res)
+        except Exception as e:
+            return self.exec_fallback(prep_res, e)
+
+    def _exec_batch(self, items):
+        # 带重试逻辑的批量执行；启用追踪时记录每次尝试及批次大小
+        t = _tracer_var.get()
+        for cur_retry in range(self.max_retries):
+            try:
+                if self.rate_limit is not None:
+                    _ratelimit.acquire(self, sum(self.rate_cost(i) for i in items))
+                if t is None:
+                    return _check_batch(items, self.exec_batch(items))
+                return _check_batch(items, t.call(self, "exec_batch", self.exec_batch, items, attempt=cur_retry, size=len(items)))
+            except Exception as e:
+                delay = self._retry_delay(cur_retry, e)
+                if delay is None:
+                    raise
+                if delay > 0:
+                    time.sleep(delay)
+
+# _cloner 返回对 cls 实例做浅拷贝的函数；普通类直接复制 __dict__，结果与 copy.copy 相同但快得多
+def _cloner(cls):
+    plain = (cls.__new__ is object.__new__ and cls.__reduce_ex__ is object.__reduce_ex__
+             and cls.__reduce__ is object.__reduce__ and not hasattr(cls, "__copy__")
+             and getattr(cls, "__getstate__", None) is getattr(object, "__getstate__", None)
+             and not hasattr(cls, "__setstate__") and all("__slots__" not in vars(c) for c in cls.__mro__))
+    if not plain:
+        return copy.copy
+    def clone(node, new=object.__new__):
+        c = new(cls)
+        c.__dict__.update(node.__dict__)
+        return c
+    return clone
+
+# _Step 是编译后执行计划中的一步：节点模板、克隆函数、是否异步，以及 动作 -> 下一步 的后继表
+# call 为同步运行该节点的方法：节点类重写了 run() 时与未编译的流程一样调用 run()，否则直接调用 _run()
+class _Step:
+    __slots__ = ("node", "clone", "is_async", "is_flow", "succ", "index", "call", "custom")
+
+    def __init__(self, node, index):
+        cls = type(node)
+        self.node, self.index, self.succ = node, index, {}
+        self.clone, self.is_async, self.is_flow = _cloner(cls), isinstance(node, AsyncNode), isinstance(node, Flow)
+        self.custom = cls.run is not BaseNode.run and cls.run is not Flow.run
+        self.call = cls.run if self.custom else cls._run
+
+# 当前最外层流程运行中已经检查过后继表的执行计划；next() 和 start() 修改流程图时清空
+_checked_var = contextvars.ContextVar("pocketflow_checked", default=None)
+
+def _graph_changed():
+    checked = _checked_var.get()
+    if checked:
+        checked.clear()
+
+def _stale(steps):
+    # 编译后任一节点的 successors 被修改（替换了字典，增加、删除或替换了后继）时执行计划失效
+    for s in steps:
+        d = s.node.successors
+        if len(d) != len(s.succ):
+            return True
+        for action, nxt in d.items():
+            st = s.succ.get(action)
+            if st is None or st.node is not nxt:
+                return True
+    return False
+
+def _next_step(step, action):
+    # 根据动作查找下一步，与 Flow.get_next_node 的行为一致
+    nxt = step.succ.get(action or "default")
+    if nxt is None and step.succ:
+        warnings.warn(f"Flow ends: '{action}' not found in {list(step.node.successors)}")
+    return nxt
+
+# _Plan 保存流程的已编译执行计划；由流程的所有浅拷贝共享，state 整体替换以保证线程安全
+class _Plan:
+    __slots__ = ("state",)
+
+    def __init__(self):
+        # state 为 (是否已冻结, 起始节点, 第一步, 所有步骤)
+        self.state = (False, None, None, ())
+
+    def __reduce__(self):
+        # pickle（例如发送给工作进程）时不携带已编译的计划，收到的一方按需重新编译
+        return (_Plan, ())
+
+# _Hooks 汇总编排时每一步的附加处理（检查点、追踪、截止时间、增量执行、访问记录）；都未启用时 _hooks() 返回 None，调度循环不做额外工作
+# 每次编排使用一个新的 _Hooks，访问记录以它标识同一次编排中依次运行的步骤
+class _Hooks:
+    __slots__ = ("ck", "tracer", "deadline", "inc", "access")
+
+    def __init__(self, ck, tracer, deadline, inc=None, access=None):
+        self.ck, self.tracer, self.deadline, self.inc, self.access = ck, tracer, deadline, inc, access
+
+    def _enter_step(self, flow, step, curr):
+        # 已超过截止时间时不再开始新的一步；嵌套的流程设置了 timeout 时为其设置截止时间
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TimeoutError(f"{type(flow).__name__} deadline exceeded before {type(curr).__name__}")
+        return (self.ck.enter(step) if self.ck is not None else None,
+                _enter_deadline(curr) if step.is_flow else None)
+
+    def _view(self, shared):
+        # 启用检查点时，这一步在记录读写的 Recorder 上运行，保存时只重新序列化读写过的键
+        return shared if self.ck is None else _store.Recorder(shared, copied_reads=False)
+
+    def run_step(self, flow, step, curr, shared):
+        # 运行流程中的一步，返回 (下一步, 动作)
+        toks, view = self._enter_step(flow, step, curr), self._view(shared)
+        if self.inc is None or step.is_flow or step.custom:
+            run = functools.partial(step.call, curr)
+        else:
+            run = functools.partial(self.inc.run, curr)
+        if self.access is not None:
+            run = functools.partial(self.access.run, flow, step, self, run)
+        try:
+            action = self.tracer.step(flow, curr, view, run) if self.tracer is not None else run(view)
+        finally:
+            if toks[1] is not None:
+                _deadline_var.reset(toks[1])
+        nxt = _next_step(step, action)
+        if self.ck is not None:
+            self.ck.leave(toks[0], step, nxt, action, shared, view)
+        return nxt, action
+
+    async def run_step_async(self, flow, step, curr, shared):
+        toks, view = self._enter_step(flow, step, curr), self._view(shared)
+        inc = None if step.is_flow else self.inc
+        run = lambda s: flow._run_node(step, curr, s, inc)
+        if self.access is not None:
+            run = functools.partial(self.access.run_async, flow, step, self, run)
+        try:
+            if self.tracer is not None:
+                action = await self.tracer.step_async(flow, curr, lambda: run(view))
+            else:
+                action = await run(view)
+        finally:
+            if toks[1] is not None:
+                _deadline_var.reset(toks[1])
+        nxt = _next_step(step, action)
+        if self.ck is not None:
+            self.ck.leave(toks[0], step, nxt, action, shared, view)
+        return nxt, action
+
+    def _enter_item(self, i):
+        # 进入第 i 组批处理参数：已完成时返回 None，否则返回用于退出的令牌
+        if self.ck is not None and self.ck.batch_done(i):
+            return None
+        if self.access is not None:
+            _access.enter_branch(i)
+        return (self.ck.enter_batch(i) if self.ck is not None else None,
+                _tracing._item.set(i) if self.tracer is not None else None)
+
+    def _leave_item(self, toks, i, shared, view):
+        if toks[1] is not None:
+            _tracing._item.reset(toks[1])
+        if self.ck is not None:
+            self.ck.leave_batch(toks[0], i, shared, view)
+
+    def run_item(self, fn, i, shared):
+        # 运行第 i 组批处理参数的子流程 fn(shared)；启用检查点时跳过已完成的批次并记录进度
+        toks = self._enter_item(i)
+        if toks is not None:
+            view = self._view(shared)
+            fn(view)
+            self._leave_item(toks, i, shared, view)
+
+    async def run_item_async(self, fn, i, shared):
+        toks = self._enter_item(i)
+        if toks is not None:
+            view = self._view(shared)
+            await fn(view)
+            self._leave_item(toks, i, shared, view)
+
+def _hooks():
+    ck, t, d, inc, acc = _ckpt_var.get(), _tracer_var.get(), _deadline_var.get(), _inc_var.get(), _access.current.get()
+    return None if ck is None and t is None and d is None and inc is None and acc is None else _Hooks(ck, t, d, inc, acc)
+
+# 未启用任何附加处理时，嵌套的流程仍通过它运行，以便设置其截止时间
+_NO_HOOKS = _Hooks(None, None, None)
 
 # Flow 类继承自 BaseNode，用于定义和管理节点流程
 class Flow(BaseNode):
+    # checkpoint 为可选的检查点（见 pocketflow.checkpoint），只对最外层运行的流程生效
+    # timeout 为整个流程的时间预算（秒），嵌套的流程和节点通过 remaining_time() 获取剩余时间
+    checkpoint, timeout = None, None
+
     def __init__(self, start=None):
         # 初始化流程，设置起始节点
         super().__init__()
-        self.start_node = start
+        self.start_node, self._plan = start, _Plan()
 
     def start(self, start):
         # 设置流程的起始节点
+        _check_mutable(self)
+        _graph_changed()
         self.start_node = start
         return start
 
@@ -117,15 +746,89 @@ class Flow(BaseNode):
             warnings.warn(f"Flow ends: '{action}' not found in {list(curr.successors)}")
         return nxt
 
+    def compile(self):
+        # 校验流程图并预先计算后继表，之后的运行直接按表调度；嵌套的流程会一并编译
+        # 运行时也会按需自动编译，修改流程图（next()、start() 或直接修改 successors）后会自动重新编译
+        steps, todo = {}, []
+        def step_for(node):
+            if not isinstance(node, BaseNode):
+                raise TypeError(f"Successor must be a node, got {type(node).__name__}")
+            if id(node) not in steps:
+                steps[id(node)] = _Step(node, len(steps))
+                todo.append(node)
+            return steps[id(node)]
+        first = step_for(self.start_node) if self.start_node is not None else None
+        while todo:
+            node = todo.pop(0)
+            step = steps[id(node)]
+            step.succ = {action: step_for(nxt) for action, nxt in node.successors.items()}
+            if isinstance(node, Flow) and node is not self:
+                node.compile()
+        if not hasattr(self, "_plan"):
+            self._plan = _Plan()
+        self._plan.state = (False, self.start_node, first, tuple(steps.values()))
+        return self
+
+    def _compiled(self):
+        # 返回当前有效的执行计划中的第一步；起始节点或任一节点的后继变化时重新编译
+        # 最外层运行中每个执行计划只检查一次后继表（批处理的每组参数、每次进入嵌套流程时不再重复检查）
+        plan, checked = getattr(self, "_plan", None), _checked_var.get()
+        frozen, start, first, steps = plan.state if plan is not None else (False, None, None, ())
+        if not frozen and (start is not self.start_node or ((checked is None or plan not in checked) and _stale(steps))):
+            first = self.compile()._plan.state[2]
+        if checked is not None and not frozen:
+            checked.add(self._plan)
+        return first
+
     def _orch(self, shared, params=None):
-        # 流程编排方法，按顺序执行节点
-        curr, p, last_action = copy.copy(self.start_node), (params or {**self.params}), None
-        while curr:
+        # 流程编排方法，按已编译的执行计划顺序执行节点；每个节点每次执行时都使用一份新的浅拷贝
+        step, p, last_action, h = self._compiled(), (params or {**self.params}), None, _hooks()
+        if h is not None and h.ck is not None:
+            step, last_action = h.ck.resume(self, step)
+        while step:
+            curr = step.clone(step.node)
             curr.set_params(p)
-            last_action = curr.run(shared)
-            curr = copy.copy(self.get_next_node(curr, last_action))
+            # 未启用附加处理时节点直接运行；嵌套的流程只在设置了 timeout 时经过 _NO_HOOKS 以设置其截止时间
+            if h is None and (not step.is_flow or curr.timeout is None):
+                last_action = step.call(curr, shared)
+                step = _next_step(step, last_action)
+            else:
+                step, last_action = (h or _NO_HOOKS).run_step(self, step, curr, shared)
         return last_action
 
+    def _orch_item(self, shared, i, bp):
+        # 运行第 i 组批处理参数的子流程（检查点与追踪见 _Hooks.run_item）
+        h = _hooks()
+        def run(shared):
+            if not self.isolate:
+                return self._orch(shared, {**self.params, **bp})
+            # 子流程在 shared 快照的写时复制视图上运行，结束后按 merge_rules 提交
+            view = _store.Overlay(_store.snapshot(shared))
+            self._orch(view, {**self.params, **bp})
+            _store.commit(shared, view, self.merge_rules)
+        if h is None:
+            return run(shared)
+        h.run_item(run, i, shared)
+
+    def run(self, shared):
+        # 运行流程；设置了 timeout 时在截止时间内运行，设置了 checkpoint 时先从检查点恢复，成功结束后删除检查点
+        dl, chk = _enter_deadline(self), (_checked_var.set(set()) if _checked_var.get() is None else None)
+        try:
+            if self.checkpoint is None or _ckpt_var.get() is not None:
+                return super().run(shared)
+            tok = _ckpt_var.set(self.checkpoint._start(self, shared))
+            try:
+                res = super().run(shared)
+            finally:
+                _ckpt_var.reset(tok)
+            self.checkpoint.clear()
+            return res
+        finally:
+            if dl is not None:
+                _deadline_var.reset(dl)
+            if chk is not None:
+                _checked_var.reset(chk)
+
     def _run(self, shared):
         # 内部运行方法，调用 prep, _orch, post 方法
         p = self.prep(shared)
@@ -137,16 +840,159 @@ class Flow(BaseNode):
         return exec_res
 
 # BatchFlow 类继承自 Flow，用于批量运行流程
+# isolate 为 True 时，每组参数的子流程在 shared 的写时复制视图（pocketflow.store.Overlay）上运行，
+# 结束后按 merge_rules（键 -> 规则名或函数，见 pocketflow.store.RULES）把修改提交回 shared
 class BatchFlow(Flow):
+    isolate, merge_rules = False, None
+
     def _run(self, shared):
         # 批量运行流程，对每个批处理参数执行编排
         pr = self.prep(shared) or []
-        for bp in pr:
-            self._orch(shared, {**self.params, **bp})
+        for i, bp in enumerate(pr):
+            self._orch_item(shared, i, bp)
+        return self.post(shared, pr, None)
+
+# ThreadPoolBatchFlow 类继承自 BatchFlow，在线程池中并行运行每组批处理参数的子流程
+# 默认所有子流程共享同一个 shared，并发写入同一个键时需要自行处理，或设置 isolate = True
+class ThreadPoolBatchFlow(BatchFlow):
+    def __init__(self, start=None, max_workers=None, executor=None):
+        # max_workers 限制工作线程数（可通过 params["max_workers"] 按次运行覆盖）；executor 可传入共享的线程池
+        super().__init__(start)
+        self.max_workers, self.executor = max_workers, executor
+
+    def _run(self, shared):
+        # 并行批量运行流程
+        pr = self.prep(shared) or []
+        workers = self.params.get("max_workers", self.max_workers)
+        tok = _access.fork()
+        try:
+            _pool_map(ThreadPoolExecutor, self.executor, workers,
+                      _in_context(lambda ibp: self._orch_item(shared, *ibp)), list(enumerate(pr)))
+        finally:
+            _access.join(tok)
+        return self.post(shared, pr, None)
+
+def merge_updates(shared, updates):
+    # 默认的合并函数：按分支顺序把每个分支新增或替换的键写回 shared，后面的分支覆盖前面的
+    for u in updates:
+        if u is not None:
+            shared.update(u)
+
+def _digest(value):
+    return hashlib.blake2b(pickle.dumps(value, protocol=4), digest_size=16).digest()
+
+# FanOutFlow 类继承自 Flow，在线程池中同时运行多个相互独立的分支（节点或流程），每个分支使用 shared 的写时复制视图
+# 等待全部（或最先完成的 first 个）分支结束后，由 reduce(shared, updates) 把各分支的修改合并回 shared；
+# 未指定 reduce 时按分支顺序依 merge_rules 提交（与 BatchFlow 的 merge_rules 相同）
+class FanOutFlow(Flow):
+    merge_rules = None
+
+    def __init__(self, *branches, first=None, reduce=None, max_workers=None):
+        # updates 按分支顺序排列，为每个分支新增或替换的键；未完成的分支为 None
+        super().__init__()
+        self.branches, self.first, self.reduce, self.max_workers = list(branches), first, reduce, max_workers
+
+    def _branch(self, i, step, view, run):
+        # 在分支自己的上下文中运行：分支内部不记录检查点（整个扇出作为一步保存），追踪事件记录分支下标
+        _ckpt_var.set(None)
+        if _tracer_var.get() is not None:
+            _tracing._item.set(i)
+        _access.enter_branch(i)
+        curr = step.clone(step.node)
+        curr.set_params({**self.params})
+        return run(_hooks() or _NO_HOOKS, step, curr, view)
+
+    def _run_branch(self, h, step, curr, view):
+        return h.run_step(self, step, curr, view)[1]
+
+    def _quorum(self):
+        n = len(self.branches)
+        return n if self.first is None else max(0, min(self.first, n))
+
+    def _merge(self, shared, views, finished):
+        if self.reduce is not None:
+            updates = [v.changes()[0] if i in finished else None for i, v in enumerate(views)]
+            self.reduce(shared, updates)
+            return updates
+        return [_store.commit(shared, v, self.merge_rules) if i in finished else None for i, v in enumerate(views)]
+
+    def _views(self, shared):
+        snapshot = _store.snapshot(shared)
+        return [_store.Overlay(snapshot) for _ in self.branches]
+
+    def _run(self, shared):
+        # 分支视图在第一次读取 list、dict、set 时浅拷贝；其他可变对象（例如数组）不复制，原地修改会影响其他分支和 shared
+        p = self.prep(shared)
+        steps, views, finished = [_Step(b, i) for i, b in enumerate(self.branches)], self._views(shared), set()
+        ex, tok = ThreadPoolExecutor(self.max_workers or max(1, len(steps))), _access.fork()
+        futs = {ex.submit(contextvars.copy_context().run, self._branch, i, st, views[i], self._run_branch): i
+                for i, st in enumerate(steps)}
+        _access.join(tok)
+        try:
+            pending = set(futs)
+            while len(finished) < self._quorum():
+                done, pending = _wait_futures(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    f.result()
+                    finished.add(futs[f])
+        finally:
+            # 已达到所需数量时不再等待其余分支（无法中断的线程会在后台运行完，结果被丢弃）
+            ex.shutdown(wait=False, cancel_futures=True)
+        return self.post(shared, p, self._merge(shared, views, finished))
+
+    def post(self, shared, prep_res, exec_res):
+        # exec_res 为各分支的修改；默认返回 None（即 "default" 动作）
+        return None
+
+def _run_shard(flow, item):
+    # 在工作进程中对一个分片运行子流程，只返回新增、替换或原地修改的键；定义在模块级别以便进程池 pickle
+    # 分片本身经过 pickle 传入，因此按运行前后的 pickle 摘要比较，原地修改（例如 append）的值也会返回
+    bp, shard = item
+    base = {k: _digest(v) for k, v in shard.items()}
+    flow._orch(shard, {**flow.params, **bp})
+    return {k: v for k, v in shard.items() if base.get(k) != _digest(v)}
+
+# ProcessBatchFlow 类继承自 BatchFlow，在进程池中运行每组批处理参数的子流程，适合 CPU 密集型的子流程
+# 每组参数使用 shard(shared, bp) 返回的独立分片，结束后由 merge(shared, updates) 把各分片的修改合并回 shared
+# 流程图中的节点、分片和修改都必须可以 pickle（节点类需定义在模块级别）
+class ProcessBatchFlow(BatchFlow):
+    def __init__(self, start=None, max_workers=None, executor=None, chunksize=1):
+        # chunksize 为每次发送给工作进程的批次数，批次很多且每个都很快时调大可以减少进程间通信
+        super().__init__(start)
+        self.max_workers, self.executor, self.chunksize = max_workers, executor, chunksize
+
+    def shard(self, shared, bp):
+        # 返回第 bp 组参数的子流程使用的分片，默认为 shared 的浅拷贝；只返回子流程需要的键可以减少 pickle 的开销
+        return dict(shared)
+
+    def merge(self, shared, updates):
+        # 合并各分片的修改，updates 按批次顺序排列，为每个分片新增、替换或原地修改的键
+        # 未重写时按批次顺序依 merge_rules 写回 shared（规则的 base 为分片运行前的值）；直接调用时依次写回，后面的批次覆盖前面的
+        merge_updates(shared, updates)
+
+    def _run(self, shared):
+        # 整个批处理在检查点中作为一步保存
+        pr = self.prep(shared) or []
+        workers = self.params.get("max_workers", self.max_workers)
+        # 发送给工作进程的副本不携带后继节点、执行器和检查点
+        flow = copy.copy(self)
+        flow.successors, flow.executor, flow.checkpoint = {}, None, None
+        shards = [self.shard(shared, bp) for bp in pr]
+        updates = _pool_map(ProcessPoolExecutor, self.executor, workers, functools.partial(_run_shard, flow),
+                            list(zip(pr, shards)), self.chunksize)
+        if type(self).merge is ProcessBatchFlow.merge:
+            # 主进程中的分片没有被修改，其中的值即为运行前的值
+            for shard, u in zip(shards, updates):
+                _store.apply(shared, u, lambda k, shard=shard: shard.get(k, _store.MISSING), self.merge_rules)
+        else:
+            self.merge(shared, updates)
         return self.post(shared, pr, None)
 
 # AsyncNode 类继承自 Node，用于支持异步操作
 class AsyncNode(Node):
+    # hedge_policy 为可选的对冲策略（见 pocketflow.hedge），exec_async 运行过久时再发起一次相同的调用，采用先成功的结果
+    hedge_policy = None
+
     async def prep_async(self, shared):
         # 异步准备阶段，子类可重写
         pass
@@ -164,17 +1010,59 @@ class AsyncNode(Node):
         pass
 
     async def _exec(self, prep_res):
-        # 内部异步执行方法，包含重试逻辑
+        # 内部异步执行方法：启用缓存时先查询缓存，相同的并发请求共享同一次调用
+        if self.cache is None:
+            return await self._exec_retry(prep_res)
+        try:
+            return await self.cache.get_or_call_async(self.cache_key(prep_res), self._exec_retry, prep_res, False)
+        except Exception as e:
+            return await self.exec_fallback_async(prep_res, e)
+
+    async def _exec_once(self, prep_res):
+        # 执行一次 exec_async；超时后取消该协程并抛出 TimeoutError
+        # exec_async 产出或返回异步迭代器时结果为 Stream，超时只计算到第一块到达（见 pocketflow.stream）
+        # 设置了 hedge_policy 时超时覆盖原调用和对冲调用
+        if self.rate_limit is not None:
+            await _ratelimit.acquire_async(self, self.rate_cost(prep_res))
+        timeout = self._exec_timeout()
+        if timeout is not None and timeout <= 0:
+            raise _timeout_error(self, timeout)
+        if self.hedge_policy is not None:
+            call = self.hedge_policy.run(self, prep_res)
+        elif timeout is None:
+            res = self.exec_async(prep_res)
+            if hasattr(res, "__anext__"):
+                return await _stream._exec_result(res)
+            res = await res
+            return await _stream._exec_result(res) if hasattr(res, "__anext__") else res
+        else:
+            call = _stream._exec_result(self.exec_async(prep_res))
+        if timeout is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            raise _timeout_error(self, timeout) from None
+
+    async def _exec_retry(self, prep_res, fallback=True):
+        # 带重试逻辑的异步执行；fallback 为 False 时最后一次失败直接抛出异常；启用追踪时记录每次尝试
+        t = _tracer_var.get()
         for cur_retry in range(self.max_retries):
             try:
-                return await self.exec_async(prep_res)
+                if t is None:
+                    return await self._exec_once(prep_res)
+                return await t.call_async(self, "exec", self._exec_once, prep_res, attempt=cur_retry)
             except Exception as e:
-                # 如果是最后一次重试，则调用异步回退方法
-                if cur_retry == self.max_retries - 1:
+                # 不再重试时调用异步回退方法
+                delay = self._retry_delay(cur_retry, e)
+                if delay is None:
+                    if not fallback:
+                        raise
                     return await self.exec_fallback_async(prep_res, e)
-                # 如果设置了等待时间，则异步暂停
-                if self.wait > 0:
-                    await asyncio.sleep(self.wait)
+                # 异步等待；在受限并发的批处理中等待期间归还并发名额
+                if delay > 0:
+                    slot = _slot_var.get()
+                    await (asyncio.sleep(delay) if slot is None else slot.sleep(delay))
         raise Exception("Max retries reached")
 
     async def run_async(self, shared):
@@ -184,7 +1072,10 @@ class AsyncNode(Node):
         return await self._run_async(shared)
 
     async def _run_async(self, shared):
-        # 内部异步运行方法，按顺序调用异步 prep, _exec, post 方法
+        # 内部异步运行方法，按顺序调用异步 prep, _exec, post 方法；启用追踪时记录每个阶段
+        t = _tracer_var.get()
+        if t is not None:
+            return await t.run_phases_async(self, shared)
         p = await self.prep_async(shared)
         e = await self._exec(p)
         return await self.post_async(shared, p, e)
@@ -197,26 +1088,292 @@ class AsyncNode(Node):
 class AsyncBatchNode(AsyncNode, BatchNode):
     async def _exec(self, items):
         # 异步批量执行，对每个项调用父类的异步 _exec 方法
-        return [await super(AsyncBatchNode, self)._exec(i) for i in items]
+        prev, items = _pending(self, items)
+        fn, its = _indexed(_guarded(self, super(AsyncBatchNode, self)._exec), items or [])
+        return _finish(self, prev, items, [await fn(i) for i in its])
+
+# _Slot 是受限并发批处理中某个项目持有的并发名额；项目在重试等待期间暂时归还名额，使其他项目可以运行
+class _Slot:
+    __slots__ = ("sem", "task", "held")
+
+    def __init__(self, sem):
+        self.sem, self.task, self.held = sem, asyncio.current_task(), True
+
+    async def sleep(self, delay):
+        # 只有持有名额的任务本身会归还名额；该项目内部再并发创建的子任务照常等待
+        if asyncio.current_task() is not self.task or not self.held:
+            return await asyncio.sleep(delay)
+        self.sem.release()
+        self.held = False
+        await asyncio.sleep(delay)
+        await self.sem.acquire()
+        self.held = True
+
+    def leave(self):
+        if self.held:
+            self.held = False
+            self.sem.release()
+
+# 当前项目持有的并发名额
+_slot_var = contextvars.ContextVar("pocketflow_slot", default=None)
+
+# _gather_limited 并行运行 fn(item)，同一时刻最多有 limit 个项目持有并发名额，结果保持输入顺序
+async def _gather_limited(fn, items, limit=None):
+    items = list(items or [])
+    # 上限为 None 或不小于项目数时，所有项目同时运行；任一项目失败时取消其余项目
+    if limit is not None and limit < 1:
+        raise ValueError("max_concurrency must be >= 1")
+    if limit is None or limit >= len(items):
+        return await _run_all(fn(i) for i in items)
+    sem, tasks, failed = asyncio.Semaphore(limit), [], []
+    async def run(item):
+        slot = _Slot(sem)
+        _slot_var.set(slot)
+        try:
+            return await fn(item)
+        except BaseException:
+            failed.append(item)
+            raise
+        finally:
+            slot.leave()
+    try:
+        # 按输入顺序准入：取得名额后才为下一个项目创建任务；已有项目失败时停止准入
+        for item in items:
+            await sem.acquire()
+            if failed:
+                sem.release()
+                break
+            tasks.append(asyncio.ensure_future(run(item)))
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
 # AsyncParallelBatchNode 类继承自 AsyncNode 和 BatchNode，用于异步并行批量处理数据
 class AsyncParallelBatchNode(AsyncNode, BatchNode):
+    def __init__(self, max_retries=1, wait=0, max_concurrency=None):
+        # max_concurrency 限制同时运行的项目数，None 表示不限制；可通过 params["max_concurrency"] 按次运行覆盖
+        super().__init__(max_retries, wait)
+        self.max_concurrency = max_concurrency
+
     async def _exec(self, items):
-        # 异步并行批量执行，使用 asyncio.gather 并行运行
-        return await asyncio.gather(*(super(AsyncParallelBatchNode, self)._exec(i) for i in items))
+        # 异步并行批量执行，使用 asyncio.gather 并行运行（受 max_concurrency 限制）
+        limit = self.params.get("max_concurrency", self.max_concurrency)
+        prev, items = _pending(self, items)
+        fn, its = _indexed(_guarded(self, super(AsyncParallelBatchNode, self)._exec), items or [])
+        return _finish(self, prev, items, await _gather_limited(fn, its, limit))
+
+async def _aiter(items):
+    # 将同步或异步可迭代对象统一为异步迭代器
+    if hasattr(items, "__aiter__"):
+        async for i in items:
+            yield i
+    else:
+        for i in (items or ()):
+            yield i
+
+async def _run_workers(worker, n):
+    # 并发运行 n 个工作协程；任意一个失败时取消其余协程并抛出异常
+    await _run_all([worker() for _ in range(n)])
+
+async def _run_all(coros):
+    # 并发运行多个协程并按顺序返回结果；任意一个失败时取消其余协程并抛出异常
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+# AsyncStreamingBatchNode 类继承自 AsyncNode 和 StreamingBatchNode，prep_async 可返回同步或异步可迭代对象
+class AsyncStreamingBatchNode(AsyncNode, StreamingBatchNode):
+    async def post_item_async(self, shared, item, exec_res):
+        # 单个项目完成后的异步处理，子类可重写
+        pass
+
+    async def _run_async(self, shared):
+        # 流式运行：逐个异步执行项目并调用 post_item_async
+        p, n = await self.prep_async(shared), 0
+        async for item in _aiter(p):
+            await self.post_item_async(shared, item, await self._exec(item))
+            n += 1
+        return await self.post_async(shared, p, n)
+
+# AsyncParallelStreamingBatchNode 类在流式批处理的基础上并发执行项目
+# 同一时刻最多有 max_concurrency 个项目在运行，post_item_async 按完成顺序调用
+class AsyncParallelStreamingBatchNode(AsyncStreamingBatchNode):
+    def __init__(self, max_retries=1, wait=0, max_concurrency=16):
+        # max_concurrency 同时限制内存中的项目数，可通过 params["max_concurrency"] 按次运行覆盖
+        super().__init__(max_retries, wait)
+        self.max_concurrency = max_concurrency
+
+    async def _run_async(self, shared):
+        p = await self.prep_async(shared)
+        it, lock, n = _aiter(p), asyncio.Lock(), 0
+        async def worker():
+            nonlocal n
+            while True:
+                # 多个工作协程共享一个迭代器，取下一个项目时需要加锁
+                async with lock:
+                    try:
+                        item = await it.__anext__()
+                    except StopAsyncIteration:
+                        return
+                await self.post_item_async(shared, item, await self._exec(item))
+                n += 1
+        limit = self.params.get("max_concurrency", self.max_concurrency)
+        if not limit or limit < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        await _run_workers(worker, limit)
+        return await self.post_async(shared, p, n)
+
+# _AsyncCoalescer 是 _Coalescer 的异步版本；每个批次由单独的任务在批次满或等待超时后执行，调用方被取消不影响其他调用方
+class _AsyncCoalescer:
+    # 等待中的批次按事件循环分开：同一个节点可能同时在多个线程各自的事件循环中运行（例如 FlowScheduler 运行的 FlowTemplate），
+    # 不同事件循环的调用方不能加入同一个批次
+    def __init__(self):
+        self.pending, self.tasks = {}, set()
+
+    async def call(self, node, item):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        entry = self.pending.get(loop)
+        if entry is None:
+            entry = self.pending[loop] = ([], asyncio.Event())
+            task = asyncio.ensure_future(self._flush(node, loop, *entry))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        batch, full = entry
+        batch.append((item, fut))
+        if len(batch) >= node.max_batch_size:
+            del self.pending[loop]
+            full.set()
+        return await asyncio.shield(fut)
+
+    async def _flush(self, node, loop, batch, full):
+        try:
+            await asyncio.wait_for(full.wait(), node.max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+        if self.pending.get(loop, (None,))[0] is batch:
+            del self.pending[loop]
+        try:
+            results = await node._exec_batch([i for i, _ in batch])
+        except BaseException as e:
+            for _, f in batch:
+                if not f.done():
+                    f.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            for (_, f), r in zip(batch, results):
+                if not f.done():
+                    f.set_result(r)
+
+# AsyncMicroBatchNode 类是 MicroBatchNode 的异步版本，把并发协程的单个调用合并为一次 exec_batch_async(items)
+class AsyncMicroBatchNode(AsyncNode):
+    def __init__(self, max_retries=1, wait=0, max_batch_size=32, max_wait_ms=5):
+        super().__init__(max_retries, wait)
+        self.max_batch_size, self.max_wait_ms, self._batcher = max_batch_size, max_wait_ms, _AsyncCoalescer()
+
+    async def exec_batch_async(self, items):
+        # 异步批量执行，返回与 items 等长、顺序一致的结果列表，子类应重写
+        raise NotImplementedError
+
+    async def _exec(self, prep_res):
+        try:
+            return await self._batcher.call(self, prep_res)
+        except Exception as e:
+            return await self.exec_fallback_async(prep_res, e)
+
+    async def _exec_batch(self, items):
+        t = _tracer_var.get()
+        for cur_retry in range(self.max_retries):
+            try:
+                if self.rate_limit is not None:
+                    await _ratelimit.acquire_async(self, sum(self.rate_cost(i) for i in items))
+                if t is None:
+                    return _check_batch(items, await self.exec_batch_async(items))
+                return _check_batch(items, await t.call_async(self, "exec_batch", self.exec_batch_async, items,
+                                                              attempt=cur_retry, size=len(items)))
+            except Exception as e:
+                delay = self._retry_delay(cur_retry, e)
+                if delay is None:
+                    raise
+                if delay > 0:
+                    await asyncio.sleep(delay)
 
 # AsyncFlow 类继承自 Flow 和 AsyncNode，用于定义和管理异步节点流程
 class AsyncFlow(Flow, AsyncNode):
+    # offload_sync 为 True 时同步节点在 executor（None 为事件循环的默认线程池）中运行，不阻塞事件循环
+    offload_sync, executor = False, None
+
+    async def _run_node(self, step, node, shared, inc=None):
+        # 运行一步中的节点：异步节点直接 await；同步节点按 offload_sync 在执行器中或直接在事件循环中运行
+        # inc 为当前的增量执行记录（见 pocketflow.incremental）时由它决定运行节点还是恢复上次的输出
+        if step.is_async:
+            return await (node._run_async(shared) if inc is None else inc.run_async(node, shared))
+        run = functools.partial(step.call, node) if inc is None or step.custom else functools.partial(inc.run, node)
+        if not self.offload_sync:
+            return run(shared)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, contextvars.copy_context().run, run, shared)
+
     async def _orch_async(self, shared, params=None):
-        # 异步流程编排方法，按顺序异步执行节点
-        curr, p, last_action = copy.copy(self.start_node), (params or {**self.params}), None
-        while curr:
+        # 异步流程编排方法，按已编译的执行计划顺序异步执行节点
+        step, p, last_action, h = self._compiled(), (params or {**self.params}), None, _hooks()
+        if h is not None and h.ck is not None:
+            step, last_action = h.ck.resume(self, step)
+        while step:
+            curr = step.clone(step.node)
             curr.set_params(p)
-            # 根据节点类型选择同步或异步运行方法
-            last_action = await curr._run_async(shared) if isinstance(curr, AsyncNode) else curr.run(shared)
-            curr = copy.copy(self.get_next_node(curr, last_action))
+            if h is None and (not step.is_flow or curr.timeout is None):
+                # 根据节点类型选择同步或异步运行方法
+                if step.is_async:
+                    last_action = await curr._run_async(shared)
+                else:
+                    last_action = await self._run_node(step, curr, shared) if self.offload_sync else step.call(curr, shared)
+                step = _next_step(step, last_action)
+            else:
+                step, last_action = await (h or _NO_HOOKS).run_step_async(self, step, curr, shared)
         return last_action
 
+    async def _orch_item_async(self, shared, i, bp):
+        # 异步运行第 i 组批处理参数的子流程（检查点与追踪见 _Hooks.run_item_async）
+        h = _hooks()
+        async def run(shared):
+            if not self.isolate:
+                return await self._orch_async(shared, {**self.params, **bp})
+            view = _store.Overlay(_store.snapshot(shared))
+            await self._orch_async(view, {**self.params, **bp})
+            _store.commit(shared, view, self.merge_rules)
+        if h is None:
+            return await run(shared)
+        await h.run_item_async(run, i, shared)
+
+    async def run_async(self, shared):
+        # 异步运行流程；设置了 timeout 时在截止时间内运行，设置了 checkpoint 时先从检查点恢复，成功结束后删除检查点
+        dl, chk = _enter_deadline(self), (_checked_var.set(set()) if _checked_var.get() is None else None)
+        try:
+            if self.checkpoint is None or _ckpt_var.get() is not None:
+                return await super().run_async(shared)
+            tok = _ckpt_var.set(self.checkpoint._start(self, shared))
+            try:
+                res = await super().run_async(shared)
+            finally:
+                _ckpt_var.reset(tok)
+            self.checkpoint.clear()
+            return res
+        finally:
+            if dl is not None:
+                _deadline_var.reset(dl)
+            if chk is not None:
+                _checked_var.reset(chk)
+
     async def _run_async(self, shared):
         # 内部异步运行方法，调用异步 prep, _orch, post 方法
         p = await self.prep_async(shared)
@@ -232,14 +1389,191 @@ class AsyncBatchFlow(AsyncFlow, BatchFlow):
     async def _run_async(self, shared):
         # 异步批量运行流程，对每个批处理参数异步执行编排
         pr = await self.prep_async(shared) or []
-        for bp in pr:
-            await self._orch_async(shared, {**self.params, **bp})
+        for i, bp in enumerate(pr):
+            await self._orch_item_async(shared, i, bp)
         return await self.post_async(shared, pr, None)
 
 # AsyncParallelBatchFlow 类继承自 AsyncFlow 和 BatchFlow，用于异步并行批量运行流程
 class AsyncParallelBatchFlow(AsyncFlow, BatchFlow):
+    def __init__(self, start=None, max_concurrency=None):
+        # max_concurrency 限制同时运行的子流数，None 表示不限制；可通过 params["max_concurrency"] 按次运行覆盖
+        super().__init__(start)
+        self.max_concurrency = max_concurrency
+
     async def _run_async(self, shared):
-        # 异步并行批量运行流程，使用 asyncio.gather 并行执行编排
+        # 异步并行批量运行流程，使用 asyncio.gather 并行执行编排（受 max_concurrency 限制）
         pr = await self.prep_async(shared) or []
-        await asyncio.gather(*(self._orch_async(shared, {**self.params, **bp}) for bp in pr))
-        return await self.post_async(shared, pr, None)
\ No newline at end of file
+        limit = self.params.get("max_concurrency", self.max_concurrency)
+        tok = _access.fork()
+        try:
+            await _gather_limited(lambda ibp: self._orch_item_async(shared, *ibp), enumerate(pr), limit)
+        finally:
+            _access.join(tok)
+        return await self.post_async(shared, pr, None)
+
+# AsyncFanOutFlow 类继承自 AsyncFlow 和 FanOutFlow，以并发任务运行各个分支；达到 first 个后取消其余分支
+class AsyncFanOutFlow(AsyncFlow, FanOutFlow):
+    def __init__(self, *branches, first=None, reduce=None):
+        super().__init__(*branches, first=first, reduce=reduce)
+
+    async def _run_async(self, shared):
+        p = await self.prep_async(shared)
+        steps, views, finished = [_Step(b, i) for i, b in enumerate(self.branches)], self._views(shared), set()
+        async def branch(i, st):
+            # 每个任务创建时复制当前上下文，分支内对 contextvars 的修改互不影响
+            return await self._branch(i, st, views[i], self._run_branch_async)
+        tok = _access.fork()
+        tasks = {asyncio.ensure_future(branch(i, st)): i for i, st in enumerate(steps)}
+        _access.join(tok)
+        pending = set(tasks)
+        try:
+            while len(finished) < self._quorum():
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    t.result()
+                    finished.add(tasks[t])
+        finally:
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return await self.post_async(shared, p, self._merge(shared, views, finished))
+
+    async def _run_branch_async(self, h, step, curr, view):
+        return (await h.run_step_async(self, step, curr, view))[1]
+
+    async def post_async(self, shared, prep_res, exec_res):
+        return None
+
+# 流水线中表示上游已结束的标记
+_END = object()
+
+# AsyncPipelineFlow 类继承自 AsyncFlow，把沿 "default" 动作相连的节点作为流水线的各个阶段，项目逐个流过各阶段
+# prep_async 返回项目来源（同步或异步可迭代对象）；每个阶段对项目调用节点的 exec（含重试、回退等），结果交给下一阶段
+# 阶段之间为容量 queue_size 的队列，队列满时上游等待；节点的 workers 属性（默认 1）为该阶段的并发数
+class AsyncPipelineFlow(AsyncFlow):
+    def __init__(self, start=None, queue_size=16):
+        super().__init__(start)
+        self.queue_size = queue_size
+
+    async def post_item_async(self, shared, item, exec_res):
+        # 项目流过最后一个阶段后调用，item 为来源中的原始项目，子类可重写
+        pass
+
+    def _stages(self):
+        # 从起始节点沿 "default" 动作得到各个阶段
+        stages, step = [], self._compiled()
+        while step is not None:
+            if step in stages:
+                raise ValueError("Pipeline stages must not form a cycle")
+            if set(step.succ) - {"default"}:
+                raise ValueError(f"Pipeline stage {type(step.node).__name__} can only use the default action")
+            stages.append(step)
+            step = step.succ.get("default")
+        return stages
+
+    async def _run_async(self, shared):
+        # 阶段返回 None 时丢弃该项目（可用于过滤）；同步节点的 exec 在 executor 中运行
+        p, stages, n = await self.prep_async(shared), self._stages(), 0
+        qs = [asyncio.Queue(self.queue_size) for _ in stages]
+        workers = [max(1, getattr(st.node, "workers", 1)) for st in stages]
+        loop = asyncio.get_running_loop()
+        async def feed():
+            async for item in _aiter(p):
+                await qs[0].put((item, item))
+        async def worker(k):
+            nonlocal n
+            step = stages[k]
+            node = step.clone(step.node)
+            node.set_params({**self.params})
+            while True:
+                x = await qs[k].get()
+                if x is _END:
+                    return
+                item, value = x
+                if step.is_async:
+                    res = await node._exec(value)
+                else:
+                    res = await loop.run_in_executor(self.executor, contextvars.copy_context().run, node._exec, value)
+                if res is None:
+                    continue
+                if k + 1 < len(stages):
+                    await qs[k + 1].put((item, res))
+                else:
+                    await self.post_item_async(shared, item, res)
+                    n += 1
+        async def stage(k):
+            # 来源或上一阶段全部结束后，向下一阶段的每个工作协程发送结束标记
+            await (feed() if k < 0 else _run_workers(lambda: worker(k), workers[k]))
+            if k + 1 < len(stages):
+                for _ in range(workers[k + 1]):
+                    await qs[k + 1].put(_END)
+        if stages:
+            await _run_all([stage(k) for k in range(-1, len(stages))])
+        return await self.post_async(shared, p, n)
+
+    async def post_async(self, shared, prep_res, exec_res):
+        # exec_res 为流过全部阶段的项目数；默认返回 None（即 "default" 动作）
+        return None
+
+# FlowTemplate 把一个流程冻结为不可变的模板：启动时构建一次，之后由多个线程或任务同时运行，不必为每个请求重新构建流程图
+# 冻结后流程图中每个节点的 successors 为只读字典，运行时不再检查流程图是否被修改
+# 每次运行使用顶层流程的一份浅拷贝，各节点每次执行时也使用新的浅拷贝，因此运行中对节点属性的赋值互不影响；
+# 节点在 __init__ 中创建的可变对象（列表、字典等）仍由所有运行共享，运行状态应保存在 shared 或 params 中
+# 异步流程的模板为 _AsyncFlowTemplate，只有它提供 run_async，调度器据此选择运行方式
+class FlowTemplate:
+    def __new__(cls, flow):
+        if cls is FlowTemplate and isinstance(flow, AsyncNode):
+            cls = _AsyncFlowTemplate
+        return super().__new__(cls)
+
+    def __init__(self, flow):
+        if not isinstance(flow, Flow):
+            raise TypeError(f"FlowTemplate needs a Flow, got {type(flow).__name__}")
+        self.flow, self._clone = flow, _cloner(type(flow))
+        flows, seen, todo = [], set(), [flow]
+        while todo:
+            node = todo.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            todo.extend(node.successors.values())
+            node.successors = _FrozenSuccessors(node.successors)
+            if isinstance(node, Flow):
+                flows.append(node)
+                todo.extend(n for n in [node.start_node, *getattr(node, "branches", ())] if n is not None)
+        # 先编译所有流程（编译外层流程时会重新编译嵌套的流程），再统一冻结执行计划
+        for f in flows:
+            f.compile()
+        for f in flows:
+            f._plan.state = (True, *f._plan.state[1:])
+
+    def _instance(self, params):
+        flow = self._clone(self.flow)
+        flow.params = {**self.flow.params, **(params or {})}
+        return flow
+
+    def run(self, shared, params=None):
+        # 用一份新的流程实例运行一次；params 与模板流程的参数合并后传给各节点
+        return self._instance(params).run(shared)
+
+class _AsyncFlowTemplate(FlowTemplate):
+    async def run_async(self, shared, params=None):
+        return await self._instance(params).run_async(shared)
+
+from . import cache as _cache
+from .cache import Cache, LRUCache, DiskCache
+from .checkpoint import Checkpoint, current as _ckpt_var
+from . import tracing as _tracing
+from .tracing import Tracer, current as _tracer_var
+from .retry import RetryPolicy
+from . import ratelimit as _ratelimit
+from .ratelimit import RateLimiter, rate_limiter
+from . import store as _store
+from .store import Overlay
+from .scheduler import FlowScheduler, AsyncFlowScheduler
+from . import stream as _stream
+from .stream import Stream
+from .hedge import HedgePolicy
+from .incremental import Incremental, current as _inc_var
+from . import access as _access
+from .access import AccessLog
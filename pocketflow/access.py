@@ -0,0 +1,194 @@
+# 共享存储访问记录：记录流程中每次节点运行读取和写入的 shared 键，检测并行分支之间冲突的读写，
+# 并根据读写集合报告顺序连接（>>）的节点中哪些相互独立、可以并行运行
+import contextvars, threading, time
+from .store import Recorder, MISSING
+from .incremental import _fingerprint
+
+# 当前启用的访问记录，由 with AccessLog() 设置
+current = contextvars.ContextVar("pocketflow_access", default=None)
+# 当前所在的并行分支路径 ((并行运行的标识, 分支下标), ...)；同一并行运行中下标不同的两个分支同时运行
+_branch = contextvars.ContextVar("pocketflow_access_branch", default=())
+# 并行流程开始分支前设置的标识，由 enter_branch 取用
+_fork = contextvars.ContextVar("pocketflow_access_fork", default=None)
+
+def fork():
+    # 并行流程（线程池批处理流、异步并行批处理流、扇出）创建分支前调用；未启用访问记录时返回 None
+    return _fork.set(object()) if current.get() is not None else None
+
+def join(token):
+    if token is not None:
+        _fork.reset(token)
+
+def enter_branch(i):
+    # 在分支自己的上下文中调用：所在流程是并行流程时把 (标识, i) 加入分支路径；嵌套的顺序批处理不再使用该标识
+    f = _fork.get()
+    if f is not None:
+        _branch.set(_branch.get() + ((f, i),))
+        _fork.set(None)
+
+def concurrent(a, b):
+    # 两个分支路径在第一个不同的位置属于同一个并行运行的不同分支时，它们可能同时运行
+    for x, y in zip(a, b):
+        if x != y:
+            return x[0] is y[0]
+    return False
+
+class Access:
+    # 一次节点（或嵌套流程）运行的记录；orch 标识所在的那一次编排，同一次编排中的步骤依次运行
+    __slots__ = ("node", "flow", "step", "orch", "branch", "reads", "writes", "action", "control", "start", "end")
+
+    def __init__(self, node, flow, step, orch, branch, control):
+        self.node, self.flow, self.step, self.orch, self.branch = node, flow, step, orch, branch
+        self.control, self.action, self.reads, self.writes = control, None, set(), set()
+        self.start, self.end = time.perf_counter(), None
+
+    def __repr__(self):
+        return f"Access({self.node}, reads={sorted(map(str, self.reads))}, writes={sorted(map(str, self.writes))})"
+
+class AccessLog:
+    def __init__(self):
+        self.records, self._lock = [], threading.Lock()
+
+    def __enter__(self):
+        self._token = current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        current.reset(self._token)
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+    def _begin(self, flow, step, orch, shared):
+        # step 有多个后继时它返回的动作决定后面运行哪些节点，之后的步骤在控制上依赖它
+        # 记录每个键第一次被读取时的值的指纹，结束时与当前值比较，以发现原地修改（例如 shared["history"].append(...)）
+        rec = Access(type(step.node).__name__, type(flow).__name__, step.index, orch, _branch.get(), len(step.succ) > 1)
+        before = {}
+        return rec, Recorder(shared, lambda k, v: before.__setitem__(k, _fingerprint(v))), before
+
+    def _end(self, rec, view, before, action):
+        # 原地修改过的值计为写入；无法 pickle 的值无法比较，只计为读取
+        base = view._base
+        changed = {k for k, fp in before.items() if fp is not None and _fingerprint(base.get(k, MISSING)) != fp}
+        rec.reads, rec.writes, rec.action, rec.end = set(view.reads), view.writes | view.deletes | changed, action, time.perf_counter()
+        with self._lock:
+            self.records.append(rec)
+        return action
+
+    def run(self, flow, step, orch, run, shared):
+        # run(shared) 运行该步骤；shared 替换为记录读写的包装，嵌套流程中的节点的读写同时计入该步骤
+        rec, view, before = self._begin(flow, step, orch, shared)
+        return self._end(rec, view, before, run(view))
+
+    async def run_async(self, flow, step, orch, run, shared):
+        rec, view, before = self._begin(flow, step, orch, shared)
+        return self._end(rec, view, before, await run(view))
+
+    def by_node(self):
+        # 按节点类名汇总：运行次数以及所有运行读取和写入的键
+        with self._lock:
+            records = list(self.records)
+        nodes = {}
+        for r in records:
+            n = nodes.setdefault(r.node, {"runs": 0, "reads": set(), "writes": set()})
+            n["runs"] += 1
+            n["reads"] |= r.reads
+            n["writes"] |= r.writes
+        return nodes
+
+    def conflicts(self):
+        # 可能同时运行的两次运行访问同一个键：都写入为 write-write，一个写入另一个读取为 read-write
+        # 返回按 (键, 类型, 节点对) 汇总的列表，count 为发生的次数
+        with self._lock:
+            records = list(self.records)
+        by_key = {}
+        for r in records:
+            if r.branch:
+                for k in r.reads | r.writes:
+                    by_key.setdefault(k, []).append(r)
+        found = {}
+        for key, rs in by_key.items():
+            for i, a in enumerate(rs):
+                for b in rs[i + 1:]:
+                    if not concurrent(a.branch, b.branch):
+                        continue
+                    if key in a.writes and key in b.writes:
+                        kind = "write-write"
+                    elif key in a.writes or key in b.writes:
+                        kind = "read-write"
+                    else:
+                        continue
+                    pair = tuple(sorted((a.node, b.node)))
+                    c = found.setdefault((key, kind, pair), {"key": key, "kind": kind, "nodes": pair, "count": 0})
+                    c["count"] += 1
+        return list(found.values())
+
+    def dependencies(self):
+        # 按 (流程, 步骤序列) 汇总每次编排中依次运行的步骤，合并多次运行的读写集合后计算依赖和并行阶段
+        # 返回列表，每项包括 flow、nodes、runs、deps（(前一步下标, 后一步下标, 原因) 的列表）和 stages（可以同时运行的步骤下标的分组）
+        with self._lock:
+            records = list(self.records)
+        orchs = {}
+        for r in records:
+            orchs.setdefault(id(r.orch), (r.orch, []))[1].append(r)
+        chains = {}
+        for _, rs in orchs.values():
+            rs.sort(key=lambda r: r.start)
+            key = (rs[0].flow, tuple(r.step for r in rs))
+            chain = chains.get(key)
+            if chain is None:
+                chain = chains[key] = {"flow": rs[0].flow, "nodes": [r.node for r in rs], "runs": 0,
+                                       "reads": [set() for _ in rs], "writes": [set() for _ in rs],
+                                       "control": [False] * len(rs)}
+            chain["runs"] += 1
+            for i, r in enumerate(rs):
+                chain["reads"][i] |= r.reads
+                chain["writes"][i] |= r.writes
+                chain["control"][i] = chain["control"][i] or r.control
+        return [_analyze(c) for c in chains.values()]
+
+    def report(self):
+        # 文本形式的依赖报告：每个顺序连接的流程中可以并行运行的步骤，以及并行分支之间冲突的读写
+        lines = []
+        for d in self.dependencies():
+            if len(d["nodes"]) < 2:
+                continue
+            lines.append(f"{d['flow']} ({d['runs']} run{'s' if d['runs'] > 1 else ''}): {' >> '.join(d['nodes'])}")
+            for n, stage in enumerate(d["stages"], 1):
+                names = [d["nodes"][i] for i in stage]
+                mark = "  <- can run in parallel" if len(stage) > 1 else ""
+                lines.append(f"  stage {n}: {' | '.join(names)}{mark}")
+            for i, j, why in d["deps"]:
+                lines.append(f"    {d['nodes'][j]} depends on {d['nodes'][i]}: {why}")
+        conflicts = self.conflicts()
+        if conflicts:
+            lines.append("Conflicting access from parallel branches:")
+            for c in conflicts:
+                lines.append(f"  {c['kind']} on {c['key']!r}: {c['nodes'][0]} / {c['nodes'][1]} ({c['count']}x)")
+        return "\n".join(lines)
+
+def _analyze(chain):
+    # 后一步读取前一步写入的键（读后写）、写入前一步读取或写入的键，或前一步是分支点时，后一步依赖前一步
+    reads, writes, control = chain["reads"], chain["writes"], chain["control"]
+    deps, level = [], []
+    for j in range(len(reads)):
+        lv = 0
+        for i in range(j):
+            why = []
+            if reads[j] & writes[i]:
+                why.append(f"reads {_keys(reads[j] & writes[i])}")
+            if writes[j] & (reads[i] | writes[i]):
+                why.append(f"writes {_keys(writes[j] & (reads[i] | writes[i]))}")
+            if control[i]:
+                why.append("branches on its action")
+            if why:
+                deps.append((i, j, ", ".join(why)))
+                lv = max(lv, level[i] + 1)
+        level.append(lv)
+    stages = [[j for j in range(len(level)) if level[j] == lv] for lv in range(max(level) + 1)] if level else []
+    return {"flow": chain["flow"], "nodes": chain["nodes"], "runs": chain["runs"], "deps": deps, "stages": stages,
+            "reads": reads, "writes": writes}
+
+def _keys(keys):
+    return ", ".join(repr(k) for k in sorted(keys, key=str))
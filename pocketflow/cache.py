@@ -0,0 +1,186 @@
+# 节点 exec 结果缓存：内存 LRU 与本地 sqlite 两种后端，支持同步与异步的单飞（single-flight）去重
+import asyncio, hashlib, pickle, sqlite3, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future
+from .stream import Stream
+
+def make_key(node, prep_res):
+    # 由节点类、cache_version、params 和 prep_res 计算稳定的缓存键
+    cls = type(node)
+    ident = (f"{cls.__module__}.{cls.__qualname__}", node.cache_version, node.params, prep_res)
+    try:
+        data = pickle.dumps(ident, protocol=4)
+    except Exception as e:
+        raise TypeError(f"Cannot build cache key for {cls.__qualname__}; override cache_key(): {e}") from e
+    return hashlib.sha256(data).hexdigest()
+
+# Cache 是缓存后端的基础类，子类实现 _get/_set/_clear/__len__
+class Cache:
+    def __init__(self):
+        self.hits = self.misses = self.shared = 0
+        self._lock, self._inflight = threading.RLock(), {}
+
+    def _get(self, key):
+        # 返回 (是否命中, 值)，子类实现
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _keep(self, key, value):
+        # 写入调用结果；流式结果（Stream）在结束后才写入，结束前无法 pickle，缓存的流也应包含全部块
+        if isinstance(value, Stream) and not value.done:
+            value._on_done(lambda stream: self.set(key, stream))
+        else:
+            self.set(key, value)
+
+    def get(self, key):
+        # 查询缓存并更新命中统计
+        with self._lock:
+            hit, value = self._get(key)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return hit, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+            self.hits = self.misses = self.shared = 0
+
+    def stats(self):
+        # 返回命中统计：hits、misses、shared（加入其他调用者正在进行的请求的次数）和命中率
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "shared": self.shared,
+                "hit_rate": self.hits / total if total else 0.0, "size": len(self)}
+
+    def get_or_call(self, key, fn, *args):
+        # 同步版本：未命中时调用 fn(*args) 并写入缓存；多个线程同时请求同一个键时只执行一次
+        with self._lock:
+            hit, value = self.get(key)
+            if hit:
+                return value
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return fut.result()
+        try:
+            value = fn(*args)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            self._keep(key, value)
+            fut.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_call_async(self, key, fn, *args):
+        # 异步版本：未命中时 await fn(*args)；并发的相同请求共享同一个进行中的调用，包括其他线程中的事件循环发起的请求
+        # 进行中的调用记录为 concurrent.futures.Future，等待方通过 asyncio.wrap_future 在自己的事件循环中等待；与同步版本分开记录
+        ikey = ("async", key)
+        with self._lock:
+            hit, value = self.get(key)
+            if hit:
+                return value
+            fut = self._inflight.get(ikey)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[ikey] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(fut))
+        try:
+            value = await fn(*args)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            self._keep(key, value)
+            fut.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(ikey, None)
+
+# LRUCache 是内存中的 LRU 缓存，支持容量上限 maxsize 和过期时间 ttl（秒）
+class LRUCache(Cache):
+    def __init__(self, maxsize=1024, ttl=None):
+        super().__init__()
+        self.maxsize, self.ttl, self._data = maxsize, ttl, OrderedDict()
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl if self.ttl else None, value)
+        self._data.move_to_end(key)
+        while self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# DiskCache 将结果 pickle 后保存在本地 sqlite 文件中，可跨进程和多次运行复用
+class DiskCache(Cache):
+    def __init__(self, path, ttl=None):
+        super().__init__()
+        self.path, self.ttl = str(path), ttl
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, created REAL)")
+        self._conn.commit()
+
+    def _get(self, key):
+        row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False, None
+        if self.ttl is not None and row[1] + self.ttl < time.time():
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def _set(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                           (key, pickle.dumps(value, protocol=4), time.time()))
+        self._conn.commit()
+
+    def _clear(self):
+        self._conn.execute("DELETE FROM cache")
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
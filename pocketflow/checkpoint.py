@@ -0,0 +1,183 @@
+# 流程检查点：把 shared、当前节点位置、最后的动作和批处理进度增量保存到本地 sqlite，崩溃后可从最近的检查点恢复
+import contextvars, hashlib, pickle, sqlite3, threading, time
+from .store import unwrap
+from .stream import Stream
+
+# 当前正在运行的检查点游标，由最外层启用了检查点的流程设置
+current = contextvars.ContextVar("pocketflow_checkpoint", default=None)
+
+# 可以通过对象身份判断是否变化的不可变类型，保存时无需重新 pickle
+_IMMUTABLE = (str, bytes, int, float, bool, complex, type(None), frozenset)
+_MISSING = object()
+
+class Checkpoint:
+    def __init__(self, path, every=1, interval=None):
+        # every 为每隔多少个完成的步骤（节点或批次）保存一次；interval 为两次保存之间的最短间隔（秒）
+        self.path, self.every, self.interval = str(path), every, interval
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS shared (key BLOB PRIMARY KEY, value BLOB);"
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB);")
+        self._lock = threading.RLock()
+        self._states, self._saved, self._pending, self._last_save = {}, {}, 0, 0.0
+        # 上次保存后可能变化的键（步骤中写入、删除或读取过的键）；None 表示下次保存时检查所有键
+        self._dirty = None
+
+    def exists(self):
+        # 是否存在可以恢复的检查点
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM meta WHERE name = 'states'").fetchone() is not None
+
+    def clear(self):
+        # 删除已保存的检查点，流程成功结束时自动调用
+        with self._lock:
+            self._conn.execute("DELETE FROM shared")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.commit()
+            self._states, self._saved, self._pending = {}, {}, 0
+
+    def close(self):
+        self._conn.close()
+
+    def save(self, shared, keys=None):
+        # 立即保存：只写入相对于上一次保存发生变化的键；keys 为可能变化的键，None 时检查 shared 的所有键
+        # 只有这些键会被重新 pickle（不可变类型的值未被替换时不重新 pickle），未被访问的大值不会在每一步重复序列化
+        # 未结束的流（Stream）无法 pickle：这些键保留上一次保存的值，并在下一次保存时重新检查
+        shared = unwrap(shared)
+        with self._lock:
+            changed, removed, deferred = [], [], set()
+            if keys is None:
+                seen = set()
+                for k, v in list(shared.items()):
+                    seen.add(self._store(changed, deferred, k, v))
+                removed = [kb for kb in self._saved if kb not in seen]
+            else:
+                for k in keys:
+                    v = shared.get(k, _MISSING)
+                    if v is not _MISSING:
+                        self._store(changed, deferred, k, v)
+                    elif (kb := pickle.dumps(k, protocol=4)) in self._saved:
+                        removed.append(kb)
+            for kb in removed:
+                del self._saved[kb]
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO shared VALUES (?, ?)", changed)
+                self._conn.executemany("DELETE FROM shared WHERE key = ?", [(kb,) for kb in removed])
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('states', ?)",
+                                   (pickle.dumps(self._states, protocol=4),))
+            self._pending, self._last_save, self._dirty = 0, time.monotonic(), deferred
+
+    def _store(self, changed, deferred, k, v):
+        # 值的 pickle 摘要与上次保存的不同时加入 changed，值为未结束的流时加入 deferred；返回键的 pickle
+        kb = pickle.dumps(k, protocol=4)
+        if isinstance(v, Stream) and not v.done:
+            deferred.add(k)
+            return kb
+        prev = self._saved.get(kb)
+        if prev is not None and type(v) in _IMMUTABLE and prev[0] is v:
+            return kb
+        vb = pickle.dumps(v, protocol=4)
+        digest = hashlib.blake2b(vb, digest_size=16).digest()
+        if prev is None or prev[1] != digest:
+            changed.append((kb, vb))
+        self._saved[kb] = (v if type(v) in _IMMUTABLE else None, digest)
+        return kb
+
+    def _load(self, shared, signature):
+        # 从检查点恢复 shared 和各层流程的位置；没有检查点时记录流程签名并返回 False
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'signature'").fetchone()
+            if row is not None and pickle.loads(row[0]) != signature:
+                raise ValueError(f"Checkpoint {self.path} was saved by a different flow graph")
+            if not self.exists():
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)",
+                                   (pickle.dumps(signature, protocol=4),))
+                self._conn.commit()
+                self._states, self._saved, self._pending = {}, {}, 0
+                return False
+            shared.clear()
+            self._saved = {}
+            for kb, vb in self._conn.execute("SELECT key, value FROM shared"):
+                v = pickle.loads(vb)
+                shared[pickle.loads(kb)] = v
+                self._saved[kb] = (v if type(v) in _IMMUTABLE else None, hashlib.blake2b(vb, digest_size=16).digest())
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'states'").fetchone()
+            self._states, self._pending = pickle.loads(row[0]), 0
+            return True
+
+    def _tick(self, shared, view=None):
+        # 完成一个步骤后调用，view 为记录了这一步读写的 Recorder；按 every 和 interval 决定是否保存
+        with self._lock:
+            if view is not None and self._dirty is not None:
+                self._dirty.update(view.reads, view.writes, view.deletes)
+            self._pending += 1
+            if self._pending < self.every:
+                return
+            if self.interval is not None and time.monotonic() - self._last_save < self.interval:
+                return
+            self.save(shared, self._dirty)
+
+    def _drop(self, path):
+        # 删除某一层及其所有子层的位置
+        with self._lock:
+            for p in [p for p in self._states if p == path or p.startswith(path + "/") or p.startswith(path + "#")]:
+                del self._states[p]
+
+    def _start(self, flow, shared):
+        # 开始运行最外层流程：恢复检查点（如果有）并返回根游标
+        signature = [type(s.node).__qualname__ for s in flow.compile()._plan.state[3]]
+        self._load(shared, signature)
+        # 第一次保存检查所有键，包括流程的 prep 在第一步之前写入的键
+        self._dirty = None
+        return _Cursor(self, "")
+
+# _Cursor 表示流程图中的一层编排：顶层为 ""，第 3 步的嵌套流程为 "/3"，批处理的第 i 组参数为 "#i"
+class _Cursor:
+    __slots__ = ("ckpt", "path")
+
+    def __init__(self, ckpt, path):
+        self.ckpt, self.path = ckpt, path
+
+    def resume(self, flow, first):
+        # 返回这一层应当继续执行的步骤和最后的动作；没有保存的位置时从起始节点开始
+        state = self.ckpt._states.get(self.path)
+        if state is None or "step" not in state:
+            return first, None
+        idx = state["step"]
+        return (flow._plan.state[3][idx] if idx is not None else None), state["action"]
+
+    def enter(self, step):
+        # 运行某一步之前调用，使嵌套流程使用子游标
+        return current.set(_Cursor(self.ckpt, f"{self.path}/{step.index}"))
+
+    def leave(self, token, step, nxt, action, shared, view=None):
+        # 某一步成功完成后调用：记录下一步和动作，并按需保存
+        current.reset(token)
+        ck = self.ckpt
+        with ck._lock:
+            ck._drop(f"{self.path}/{step.index}")
+            ck._states[self.path] = {"step": nxt.index if nxt is not None else None, "action": action}
+            ck._tick(shared, view)
+
+    def batch_done(self, i):
+        # 第 i 组批处理参数是否已经完成
+        state = self.ckpt._states.get(self.path)
+        return state is not None and "done" in state and (i < state["done"][0] or i in state["done"][1])
+
+    def enter_batch(self, i):
+        return current.set(_Cursor(self.ckpt, f"{self.path}#{i}"))
+
+    def leave_batch(self, token, i, shared, view=None):
+        # 第 i 组批处理参数完成后调用；进度保存为 (连续完成的前缀长度, 其余已完成的下标)，顺序批处理时不随项目数增长
+        current.reset(token)
+        ck = self.ckpt
+        with ck._lock:
+            ck._drop(f"{self.path}#{i}")
+            state = ck._states.setdefault(self.path, {})
+            prefix, extra = state.get("done", (0, set()))
+            extra.add(i)
+            while prefix in extra:
+                extra.discard(prefix)
+                prefix += 1
+            state["done"] = (prefix, extra)
+            ck._tick(shared, view)
@@ -0,0 +1,103 @@
+# 对冲请求：exec_async 运行超过本节点近期延迟的某个分位数后仍未完成时，再发起一次相同的调用，采用先成功的结果并取消另一个
+# 适合尾延迟远高于中位数的远程调用（例如 LLM）；额外调用由预算限制，对冲率和命中率见 HedgePolicy.stats()
+import asyncio, threading, time
+from collections import deque
+from . import ratelimit as _ratelimit
+from . import stream as _stream
+from .tracing import current as _tracer_var
+
+class HedgePolicy:
+    def __init__(self, percentile=0.95, window=200, min_samples=20, max_extra=0.05, burst=10, min_delay=0.0):
+        # 调用运行超过最近 window 次成功调用延迟的 percentile 分位数（不少于 min_delay 秒）时发起对冲；样本少于 min_samples 时不对冲
+        # 预算初始为 burst 次对冲，每次调用补充 max_extra 次（最多 burst 次），因此对冲的额外调用约为总调用数的 max_extra 比例
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1")
+        self.percentile, self.min_samples, self.min_delay = percentile, min_samples, min_delay
+        self.max_extra, self.burst = max_extra, burst
+        self.calls = self.hedged = self.wins = self.skipped = 0
+        self._latencies, self._delay, self._budget = deque(maxlen=window), None, float(burst)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {**self.__dict__, "_lock": None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        # 当前的对冲等待时间（秒）；样本不足时返回 None
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            if self._delay is None:
+                values = sorted(self._latencies)
+                self._delay = max(self.min_delay, values[min(len(values) - 1, int(self.percentile * len(values)))])
+            return self._delay
+
+    def stats(self):
+        # hedge_rate 为发起对冲的调用比例，win_rate 为对冲调用先于原调用成功的比例；skipped 为因预算或限流而放弃的对冲
+        delay = self.delay()
+        with self._lock:
+            return {"calls": self.calls, "hedged": self.hedged, "wins": self.wins, "skipped": self.skipped,
+                    "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+                    "win_rate": self.wins / self.hedged if self.hedged else 0.0, "delay": delay}
+
+    def _begin(self):
+        with self._lock:
+            self.calls += 1
+            self._budget = min(self.burst, self._budget + self.max_extra)
+
+    def _spend(self, node, prep_res):
+        # 取得一次对冲的预算；节点设置了限流器时还需立即取得额度，不为对冲等待限流
+        with self._lock:
+            if self._budget < 1:
+                self.skipped += 1
+                return False
+            self._budget -= 1
+        if node.rate_limit is not None and _ratelimit._resolve(node).try_acquire(node.rate_cost(prep_res)) > 0:
+            with self._lock:
+                self._budget += 1
+                self.skipped += 1
+            return False
+        with self._lock:
+            self.hedged += 1
+        return True
+
+    def _done(self, latency, won):
+        # 记录调用方观察到的延迟（从原调用开始到取得结果）
+        with self._lock:
+            self._latencies.append(latency)
+            self._delay = None
+            self.wins += won
+
+    async def run(self, node, prep_res):
+        # 运行一次（可能对冲的）exec_async，返回先成功的结果；所有调用都失败时抛出原调用的异常
+        self._begin()
+        delay, start = self.delay(), time.monotonic()
+        tasks, hedge_ns = [asyncio.ensure_future(_call(node, prep_res))], None
+        try:
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+                if not tasks[0].done() and self._spend(node, prep_res):
+                    hedge_ns = time.perf_counter_ns()
+                    tasks.append(asyncio.ensure_future(_call(node, prep_res)))
+            winner, pending = None, set(tasks)
+            while winner is None and pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in tasks if t in done and t.exception() is None), None)
+            if winner is None:
+                return tasks[0].result()
+            won = winner is not tasks[0]
+            self._done(time.monotonic() - start, won)
+            t = _tracer_var.get()
+            if t is not None and hedge_ns is not None:
+                t.record("hedge", "exec", hedge_ns, time.perf_counter_ns(), node, won=won)
+            return winner.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+async def _call(node, prep_res):
+    return await _stream._exec_result(node.exec_async(prep_res))
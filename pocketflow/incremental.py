@@ -0,0 +1,191 @@
+# 增量执行：记录每个节点的代码、实例属性和 prep_res 的指纹、读取的 params 和 post 读取的 shared 键及其值的指纹、写入和删除的键；
+# 再次运行时，这些都未变化的节点直接恢复上次写入 shared 的内容和返回的动作，跳过 exec 和 post
+import contextvars, hashlib, pickle, threading, time
+from .cache import Cache, DiskCache
+from .store import Recorder, MISSING
+from .tracing import current as _tracer_var
+
+# 当前启用的增量执行记录，由 with Incremental(...) 设置
+current = contextvars.ContextVar("pocketflow_incremental", default=None)
+
+def _fingerprint(value):
+    # 值的指纹；键不存在时为 b""，无法 pickle 的值为 None（使该节点这次不被记录）
+    if value is MISSING:
+        return b""
+    try:
+        return hashlib.blake2b(pickle.dumps(value, protocol=4), digest_size=16).digest()
+    except Exception:
+        return None
+
+def _code_digest(code, h):
+    # 字节码、常量（包括嵌套函数）和引用的名称；不包括行号，修改其他节点的代码不会使该节点失效
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for c in code.co_consts:
+        if hasattr(c, "co_code"):
+            _code_digest(c, h)
+        else:
+            h.update(repr(c).encode())
+
+_code_cache = {}
+
+# 框架的运行时配置（缓存、执行器、重试、限速、超时等）不影响节点的输出，不参与实例属性指纹；cache_version 单独参与键
+_RUNTIME = frozenset(("successors", "params", "cache", "cache_version", "retry_policy", "exec_timeout", "rate_limit",
+                      "always_run", "hedge_policy", "executor", "max_workers", "offload_sync", "max_concurrency",
+                      "checkpoint", "timeout"))
+
+def code_fingerprint(cls):
+    # 节点类（不包括 pocketflow 自身的基础类）中所有方法的代码指纹；修改 prompt 等代码中的常量会使该类的记录失效
+    fp = _code_cache.get(cls)
+    if fp is None:
+        h = hashlib.blake2b(digest_size=16)
+        for c in cls.__mro__:
+            if c.__module__.split(".")[0] == "pocketflow" or c is object:
+                continue
+            for name, attr in sorted(vars(c).items()):
+                fn = getattr(attr, "__func__", attr)
+                if hasattr(fn, "__code__"):
+                    h.update(name.encode())
+                    _code_digest(fn.__code__, h)
+        fp = _code_cache[cls] = h.hexdigest()
+    return fp
+
+class Incremental:
+    def __init__(self, cache):
+        # cache 为文件路径（保存在 DiskCache 中，可跨多次运行复用）或任意 Cache 实例（例如 LRUCache）
+        self.cache = cache if isinstance(cache, Cache) else DiskCache(cache)
+        self.hits = self.misses = self.uncacheable = 0
+        self.saved = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._token = current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        current.reset(self._token)
+
+    def stats(self):
+        # hits 为跳过的节点执行次数，saved 为这些节点上次执行 exec 和 post 所用的秒数之和
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "uncacheable": self.uncacheable, "saved": self.saved}
+
+    def _count(self, name, saved=0.0):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self.saved += saved
+
+    def _skip(self, node):
+        # 设置了 always_run 或自定义了运行方式（例如流式批处理）的节点总是正常运行
+        from . import BaseNode, AsyncNode
+        if getattr(node, "always_run", False):
+            return True
+        if isinstance(node, AsyncNode):
+            return type(node)._run_async is not AsyncNode._run_async
+        return type(node)._run is not BaseNode._run
+
+    def _instance(self, node):
+        # 节点实例属性的指纹（例如构造函数传入的 prompt），在 prep 之前计算；不包括 _RUNTIME 中的属性和下划线开头的运行时状态
+        # 无法 pickle 时为 None
+        return _fingerprint({k: v for k, v in vars(node).items() if k not in _RUNTIME and not k.startswith("_")})
+
+    def _key(self, node, instance, prep_res):
+        # 由节点类、cache_version、代码指纹、实例属性指纹和 prep_res 计算；params 不在键中，而是只比较节点读取过的参数
+        # 实例属性或 prep_res 无法 pickle 时返回 None
+        cls = type(node)
+        if instance is None:
+            return None
+        try:
+            data = pickle.dumps((f"{cls.__module__}.{cls.__qualname__}", node.cache_version, code_fingerprint(cls), instance, prep_res), protocol=4)
+        except Exception:
+            return None
+        return "incremental:" + hashlib.sha256(data).hexdigest()
+
+    def _changed(self, reads, mapping):
+        return any(_fingerprint(mapping.get(k, MISSING)) != fp for k, fp in reads.items())
+
+    def _restore(self, node, key, shared, params):
+        # 命中且读取的参数与 post 读取的值都未变化时恢复写入并返回 (True, 动作)
+        hit, entry = self.cache.get(key)
+        if not hit:
+            return False, None
+        reads, param_reads, writes, deletes, action, elapsed = entry
+        if self._changed(param_reads, params) or self._changed(reads, shared):
+            return False, None
+        start = time.perf_counter_ns()
+        for k, v in pickle.loads(writes).items():
+            shared[k] = v
+        for k in deletes:
+            shared.pop(k, None)
+        t = _tracer_var.get()
+        if t is not None:
+            t.record("restore", "phase", start, time.perf_counter_ns(), node, action=action, saved=elapsed)
+        self._count("hits", elapsed)
+        return True, action
+
+    def _before(self, shared, prep_rec):
+        # exec 之前记录 prep 读取的值的指纹，用于发现 exec 或 post 对它们的原地修改
+        return {k: _fingerprint(shared.get(k, MISSING)) for k in prep_rec.reads}
+
+    def _save(self, key, shared, prep_rec, post_rec, before, post_reads, param_reads, action, elapsed):
+        # 保存读取的参数和 post 读取的值的指纹、写入的键及其新值（包括原地修改的值）、删除的键和动作
+        if None in before.values() or None in post_reads.values() or None in param_reads.values():
+            self._count("uncacheable")
+            return
+        try:
+            changed = {k for k, fp in {**before, **post_reads}.items() if _fingerprint(shared.get(k, MISSING)) != fp}
+            deletes = (prep_rec.deletes | post_rec.deletes) - prep_rec.writes - post_rec.writes
+            writes = {k: shared[k] for k in prep_rec.writes | post_rec.writes | changed if k in shared}
+            entry = (post_reads, param_reads, pickle.dumps(writes, protocol=4), deletes | {k for k in changed if k not in shared}, action, elapsed)
+        except Exception:
+            self._count("uncacheable")
+            return
+        self.cache.set(key, entry)
+        self._count("misses")
+
+    def run(self, node, shared):
+        # 以增量方式运行同步节点的 prep -> exec -> post
+        if self._skip(node):
+            self._count("uncacheable")
+            return node._run(shared)
+        t, prep_rec, param_reads, instance = _tracer_var.get(), Recorder(shared), {}, self._instance(node)
+        params = node.params
+        node.params = Recorder(params, lambda k, v: param_reads.__setitem__(k, _fingerprint(v)))
+        p = node.prep(prep_rec) if t is None else t.call(node, "prep", node.prep, prep_rec)
+        key = self._key(node, instance, p)
+        if key is None:
+            self._count("uncacheable")
+            e = node._exec(p)
+            return node.post(shared, p, e) if t is None else t.call(node, "post", node.post, shared, p, e)
+        hit, action = self._restore(node, key, shared, params)
+        if hit:
+            return action
+        before, post_reads, start = self._before(shared, prep_rec), {}, time.perf_counter()
+        post_rec = Recorder(shared, lambda k, v: post_reads.__setitem__(k, _fingerprint(v)))
+        e = node._exec(p)
+        action = node.post(post_rec, p, e) if t is None else t.call(node, "post", node.post, post_rec, p, e)
+        self._save(key, shared, prep_rec, post_rec, before, post_reads, param_reads, action, time.perf_counter() - start)
+        return action
+
+    async def run_async(self, node, shared):
+        if self._skip(node):
+            self._count("uncacheable")
+            return await node._run_async(shared)
+        t, prep_rec, param_reads, instance = _tracer_var.get(), Recorder(shared), {}, self._instance(node)
+        params = node.params
+        node.params = Recorder(params, lambda k, v: param_reads.__setitem__(k, _fingerprint(v)))
+        p = await (node.prep_async(prep_rec) if t is None else t.call_async(node, "prep", node.prep_async, prep_rec))
+        key = self._key(node, instance, p)
+        if key is None:
+            self._count("uncacheable")
+            e = await node._exec(p)
+            return await (node.post_async(shared, p, e) if t is None else t.call_async(node, "post", node.post_async, shared, p, e))
+        hit, action = self._restore(node, key, shared, params)
+        if hit:
+            return action
+        before, post_reads, start = self._before(shared, prep_rec), {}, time.perf_counter()
+        post_rec = Recorder(shared, lambda k, v: post_reads.__setitem__(k, _fingerprint(v)))
+        e = await node._exec(p)
+        action = await (node.post_async(post_rec, p, e) if t is None else t.call_async(node, "post", node.post_async, post_rec, p, e))
+        self._save(key, shared, prep_rec, post_rec, before, post_reads, param_reads, action, time.perf_counter() - start)
+        return action
@@ -0,0 +1,136 @@
+# 令牌桶限流：每秒请求数和每分钟 token（成本）预算，按名称在进程内共享；可选的文件锁后端在同一台机器的多个进程之间协调
+import asyncio, struct, threading, time
+from .tracing import current as _tracer_var
+
+try:
+    import fcntl
+except ImportError:  # Windows 等平台没有 fcntl，文件后端不可用
+    fcntl = None
+
+class RateLimiter:
+    def __init__(self, rps=None, tpm=None, burst=None, path=None, name=None):
+        # rps 为每秒请求数，burst 为允许的突发请求数（默认 max(1, rps)）；tpm 为每分钟的 token 或成本预算
+        # path 不为 None 时桶的状态保存在该文件中，通过文件锁在多个进程之间共享
+        if rps is None and tpm is None:
+            raise ValueError("RateLimiter needs rps or tpm")
+        if path is not None and fcntl is None:
+            raise RuntimeError("The file-lock backend requires fcntl (POSIX only)")
+        # 每个桶为 (每秒补充量, 容量, 是否按成本计)
+        self.buckets = ([(rps, burst or max(1, rps), False)] if rps else []) + ([(tpm / 60, tpm, True)] if tpm else [])
+        self.path, self.name = path, name
+        self.waits, self.wait_time = 0, 0.0
+        self._lock, self._state = threading.Lock(), None
+
+    def __getstate__(self):
+        # 发送给其他进程时不携带锁和内存中的状态；需要跨进程共享额度时应设置 path
+        return {**self.__dict__, "_lock": None, "_state": None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _take(self, state, now, cost):
+        # 按经过的时间补充各个桶，额度足够时扣除并返回 (0, 新状态)，否则返回 (需要等待的秒数, 状态)
+        # 成本超过桶容量的请求在桶满时放行，之后桶为负数，后续请求等待补足
+        levels, stamp = state if state is not None else ([cap for _, cap, _ in self.buckets], now)
+        levels = [min(cap, lvl + max(0.0, now - stamp) * rate) for (rate, cap, _), lvl in zip(self.buckets, levels)]
+        needs = [cost if by_cost else 1 for _, _, by_cost in self.buckets]
+        wait = max((min(n, cap) - lvl) / rate for (rate, cap, _), lvl, n in zip(self.buckets, levels, needs))
+        if wait > 0:
+            return wait, (levels, now)
+        return 0.0, ([lvl - n for lvl, n in zip(levels, needs)], now)
+
+    def try_acquire(self, cost=0):
+        # 尝试取得一次请求和 cost 个 token 的额度；成功返回 0，否则返回建议的等待秒数（不扣除额度）
+        with self._lock:
+            if self.path is None:
+                wait, state = self._take(self._state, time.monotonic(), cost)
+                if wait == 0:
+                    self._state = state
+                return wait
+            return self._try_file(cost)
+
+    def _try_file(self, cost):
+        # 文件中依次保存各个桶的余量和上次更新的时间（time.time()，多个进程之间可比较）
+        fmt = f"<{len(self.buckets) + 1}d"
+        with open(self.path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                data = f.read()
+                state = None
+                if len(data) == struct.calcsize(fmt):
+                    *levels, stamp = struct.unpack(fmt, data)
+                    state = (levels, stamp)
+                wait, state = self._take(state, time.time(), cost)
+                if wait == 0:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(struct.pack(fmt, *state[0], state[1]))
+                    f.flush()
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _waited(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_time += seconds
+
+    def acquire(self, cost=0):
+        # 同步取得额度，需要时只让当前线程睡眠；返回等待的秒数
+        wait, start = self.try_acquire(cost), time.monotonic()
+        if wait == 0:
+            return 0.0
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.try_acquire(cost)
+        waited = time.monotonic() - start
+        self._waited(waited)
+        return waited
+
+    async def acquire_async(self, cost=0):
+        # 异步取得额度，等待期间不阻塞事件循环
+        wait, start = self.try_acquire(cost), time.monotonic()
+        if wait == 0:
+            return 0.0
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.try_acquire(cost)
+        waited = time.monotonic() - start
+        self._waited(waited)
+        return waited
+
+# 进程内按名称共享的限流器
+_registry, _registry_lock = {}, threading.Lock()
+
+def rate_limiter(name, **config):
+    # 返回名为 name 的限流器；第一次调用时按 config 创建，之后的调用返回同一个实例（忽略 config）
+    with _registry_lock:
+        lim = _registry.get(name)
+        if lim is None:
+            if not config:
+                raise KeyError(f"Rate limiter '{name}' is not defined")
+            lim = _registry[name] = RateLimiter(name=name, **config)
+        return lim
+
+def _resolve(node):
+    lim = node.rate_limit
+    return rate_limiter(lim) if isinstance(lim, str) else lim
+
+def _record(node, lim, start, cost):
+    # 启用追踪时把等待时间记录为一个事件
+    t = _tracer_var.get()
+    if t is not None:
+        t.record("rate_limit", "wait", start, time.perf_counter_ns(), node, limiter=lim.name, cost=cost)
+
+def acquire(node, cost):
+    # 在节点执行一次 exec 之前取得其限流器的额度
+    lim, start = _resolve(node), time.perf_counter_ns()
+    if lim.acquire(cost) > 0:
+        _record(node, lim, start, cost)
+
+async def acquire_async(node, cost):
+    lim, start = _resolve(node), time.perf_counter_ns()
+    if await lim.acquire_async(cost) > 0:
+        _record(node, lim, start, cost)
@@ -0,0 +1,35 @@
+# 重试策略：指数退避、完全抖动（full jitter）、最大等待时间、按异常类型过滤，以及遵循异常携带的 retry-after 提示
+import random
+
+def retry_after_hint(exc):
+    # 从异常中读取服务端建议的等待时间（秒）：优先使用 exc.retry_after，其次是 exc.response.headers["Retry-After"]
+    hint = getattr(exc, "retry_after", None)
+    if hint is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        hint = headers.get("retry-after") or headers.get("Retry-After") if headers is not None else None
+    try:
+        return float(hint) if hint is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    def __init__(self, base=1.0, factor=2.0, max_delay=60.0, jitter=True, retry_on=(Exception,), retry_after=True):
+        # 第 n 次失败后等待 min(max_delay, base * factor ** n)；jitter 为 True 时在 [0, 该值] 中均匀取值
+        # retry_on 为可重试的异常类型（或接收异常返回 bool 的函数）；retry_after 为 True 时等待时间不少于服务端的提示
+        self.base, self.factor, self.max_delay, self.jitter = base, factor, max_delay, jitter
+        self.retry_on, self.retry_after = retry_on, retry_after
+
+    def should_retry(self, exc):
+        if isinstance(self.retry_on, (type, tuple)):
+            return isinstance(exc, self.retry_on)
+        return bool(self.retry_on(exc))
+
+    def delay(self, attempt, exc):
+        # 返回第 attempt 次（从 0 开始）失败后的等待时间（秒）；不可重试时返回 None
+        if not self.should_retry(exc):
+            return None
+        d = min(self.max_delay, self.base * self.factor ** attempt)
+        if self.jitter:
+            d = random.uniform(0, d)
+        hint = retry_after_hint(exc) if self.retry_after else None
+        return max(d, hint) if hint is not None else d
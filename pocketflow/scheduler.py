@@ -0,0 +1,205 @@
+# 多租户流程调度器：按优先级和租户排队运行流程，限制总并发数与每个租户的并发数，并统计排队长度与等待时间
+# FlowScheduler 在线程池中运行，AsyncFlowScheduler 在事件循环中以任务运行；两者都可以运行同步或异步流程
+import asyncio, collections, contextvars, heapq, itertools, queue, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from .tracing import current as _tracer_var
+
+class _Job:
+    __slots__ = ("flow", "shared", "priority", "tenant", "seq", "future", "ctx", "queued_at", "queued_ns")
+
+    def __init__(self, flow, shared, priority, tenant, seq, future):
+        self.flow, self.shared, self.priority, self.tenant, self.seq, self.future = flow, shared, priority, tenant, seq, future
+        # 在提交方的上下文中运行，继承追踪、截止时间等 contextvars
+        self.ctx, self.queued_at, self.queued_ns = contextvars.copy_context(), time.monotonic(), time.perf_counter_ns()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+# _Queues 保存每个租户的等待队列（按 优先级, 提交顺序 排列的堆）与运行中的数量；调用方负责加锁
+class _Queues:
+    def __init__(self, workers, tenant_limit, tenant_limits, max_queue, window):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.workers, self.tenant_limit, self.tenant_limits, self.max_queue = workers, tenant_limit, dict(tenant_limits or {}), max_queue
+        self.heaps, self.running, self.size, self.active, self.seq = {}, collections.Counter(), 0, 0, itertools.count()
+        self.completed, self.rejected, self.window = collections.Counter(), 0, window
+        self.waits = collections.defaultdict(lambda: collections.deque(maxlen=window))
+
+    def limit(self, tenant):
+        return self.tenant_limits.get(tenant, self.tenant_limit)
+
+    def push(self, flow, shared, priority, tenant, future):
+        # 队列已满时拒绝（准入控制）
+        if self.max_queue is not None and self.size >= self.max_queue:
+            self.rejected += 1
+            raise queue.Full(f"Scheduler queue is full ({self.max_queue} runs waiting)")
+        job = _Job(flow, shared, priority, tenant, next(self.seq), future)
+        heapq.heappush(self.heaps.setdefault(tenant, []), job)
+        self.size += 1
+        return job
+
+    def pop(self):
+        # 选出下一个可以运行的作业：优先级最高（数值最小），同优先级时运行中作业较少的租户优先，再按提交顺序；
+        # 已达到并发上限的租户跳过。没有空闲的工作者或可运行的作业时返回 None
+        if self.active >= self.workers:
+            return None
+        best = None
+        for tenant, heap in self.heaps.items():
+            while heap and heap[0].future.cancelled():
+                heapq.heappop(heap)
+                self.size -= 1
+            if not heap:
+                continue
+            limit = self.limit(tenant)
+            if limit is not None and self.running[tenant] >= limit:
+                continue
+            key = (heap[0].priority, self.running[tenant], heap[0].seq)
+            if best is None or key < best[0]:
+                best = (key, tenant)
+        if best is None:
+            return None
+        tenant = best[1]
+        job = heapq.heappop(self.heaps[tenant])
+        if not self.heaps[tenant]:
+            del self.heaps[tenant]
+        self.size -= 1
+        self.active += 1
+        self.running[tenant] += 1
+        self.waits[tenant].append(time.monotonic() - job.queued_at)
+        return job
+
+    def done(self, job):
+        self.active -= 1
+        self.running[job.tenant] -= 1
+        if not self.running[job.tenant]:
+            del self.running[job.tenant]
+        self.completed[job.tenant] += 1
+
+    def stats(self):
+        # 总体与每个租户的排队数、运行数、完成数，以及最近 window 次的等待时间（秒）
+        tenants = set(self.heaps) | set(self.running) | set(self.completed)
+        per = {}
+        for t in tenants:
+            waits = sorted(self.waits.get(t, ()))
+            per[t] = {"queued": sum(not j.future.cancelled() for j in self.heaps.get(t, ())), "running": self.running.get(t, 0),
+                      "completed": self.completed.get(t, 0), "wait_mean": sum(waits) / len(waits) if waits else 0.0,
+                      "wait_p50": _percentile(waits, 0.5), "wait_p95": _percentile(waits, 0.95), "wait_max": waits[-1] if waits else 0.0}
+        return {"queued": sum(p["queued"] for p in per.values()), "running": self.active,
+                "completed": sum(self.completed.values()), "rejected": self.rejected, "tenants": per}
+
+def _record(job):
+    # 启用追踪时把排队时间记录为一个事件
+    t = job.ctx.get(_tracer_var)
+    if t is not None:
+        t.record("schedule", "wait", job.queued_ns, time.perf_counter_ns(), job.flow,
+                 tenant=job.tenant, priority=job.priority)
+
+def _run_sync(job):
+    # 在工作线程中运行同步流程，或在新的事件循环中运行异步流程
+    _record(job)
+    if hasattr(job.flow, "run_async"):
+        return asyncio.run(job.flow.run_async(job.shared))
+    return job.flow.run(job.shared)
+
+class FlowScheduler:
+    def __init__(self, workers=8, tenant_limit=None, tenant_limits=None, max_queue=None, window=1000):
+        # workers 为同时运行的流程数（工作线程数）；tenant_limit 为每个租户的默认并发上限，tenant_limits 可为个别租户单独设置
+        # max_queue 为等待中的运行数上限，超过时 submit 抛出 queue.Full；window 为统计等待时间的最近样本数
+        self._q = _Queues(workers, tenant_limit, tenant_limits, max_queue, window)
+        self._lock, self._executor = threading.Lock(), ThreadPoolExecutor(workers, thread_name_prefix="pocketflow-scheduler")
+
+    def submit(self, flow, shared, priority=0, tenant=None):
+        # 提交一次 flow.run(shared)，返回 Future；priority 数值越小越先运行
+        fut = Future()
+        with self._lock:
+            self._q.push(flow, shared, priority, tenant, fut)
+        self._dispatch()
+        return fut
+
+    def run(self, flow, shared, priority=0, tenant=None, timeout=None):
+        # 提交并等待结果
+        return self.submit(flow, shared, priority, tenant).result(timeout)
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                job = self._q.pop()
+            if job is None:
+                return
+            if not job.future.set_running_or_notify_cancel():
+                self._finish(job)
+                continue
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            job.future.set_result(job.ctx.run(_run_sync, job))
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            self._finish(job)
+
+    def _finish(self, job):
+        with self._lock:
+            self._q.done(job)
+        self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            return self._q.stats()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+class AsyncFlowScheduler:
+    def __init__(self, workers=64, tenant_limit=None, tenant_limits=None, max_queue=None, window=1000, executor=None):
+        # 参数与 FlowScheduler 相同；同步流程在 executor（默认为事件循环的默认线程池）中运行
+        self._q, self.executor = _Queues(workers, tenant_limit, tenant_limits, max_queue, window), executor
+
+    async def submit(self, flow, shared, priority=0, tenant=None):
+        # 提交一次运行并等待其结果；等待期间被取消时，尚未开始的运行从队列中移除
+        fut = asyncio.get_running_loop().create_future()
+        self._q.push(flow, shared, priority, tenant, fut)
+        self._dispatch()
+        return await fut
+
+    def _dispatch(self):
+        while (job := self._q.pop()) is not None:
+            # 任务在提交方上下文的副本中运行
+            task = job.ctx.run(asyncio.ensure_future, self._run(job))
+            task.add_done_callback(lambda _, job=job: self._finish(job))
+            # 提交方取消等待时一并取消正在运行的流程
+            job.future.add_done_callback(lambda f, task=task: task.cancel() if f.cancelled() else None)
+
+    async def _run(self, job):
+        try:
+            _record(job)
+            if hasattr(job.flow, "run_async"):
+                res = await job.flow.run_async(job.shared)
+            else:
+                loop, ctx = asyncio.get_running_loop(), contextvars.copy_context()
+                res = await loop.run_in_executor(self.executor, ctx.run, job.flow.run, job.shared)
+        except BaseException as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(res)
+
+    def _finish(self, job):
+        self._q.done(job)
+        self._dispatch()
+
+    def stats(self):
+        return self._q.stats()
@@ -0,0 +1,189 @@
+# 写时复制的 shared 视图：并行的分支各自在父 shared 的快照上读写，结束后按合并规则提交回父 shared
+import threading
+from collections.abc import MutableMapping
+
+# 第一次读取时复制的内置容器类型（浅拷贝）；其他值（例如 NumPy 数组、图像）不会被复制，应整体替换而不是原地修改
+_COPY_ON_READ = (list, dict, set)
+
+# 表示键不存在
+MISSING = object()
+
+class Overlay(MutableMapping):
+    def __init__(self, base):
+        # base 为父 shared（或其浅拷贝快照）；写入和删除只记录在本视图中
+        self._base, self._local, self._deleted, self._copied = base, {}, set(), set()
+
+    def __getitem__(self, key):
+        if key in self._local:
+            return self._local[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        value = self._base[key]
+        if type(value) in _COPY_ON_READ:
+            # 分支可能原地修改内置容器（例如 append），先复制一份
+            value = self._local[key] = type(value)(value)
+            self._copied.add(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._local[key] = value
+        self._deleted.discard(key)
+        self._copied.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._local.pop(key, None)
+        self._copied.discard(key)
+        if key in self._base:
+            self._deleted.add(key)
+
+    def __contains__(self, key):
+        return key in self._local or (key not in self._deleted and key in self._base)
+
+    def __iter__(self):
+        for key in self._base:
+            if key not in self._deleted:
+                yield key
+        for key in self._local:
+            if key not in self._base:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Overlay({dict(self)!r})"
+
+    def changes(self):
+        # 返回 (新增或替换的键 -> 值, 删除的键)；读取时复制但内容未变的容器不算修改
+        writes = {k: v for k, v in self._local.items() if k not in self._copied or v != self._base.get(k, MISSING)}
+        return writes, set(self._deleted)
+
+    def base_value(self, key):
+        return self._base.get(key, MISSING)
+
+# Recorder 包装 shared，记录节点读取和写入的键；读写都直接作用于 base（用于增量执行、依赖分析和检查点的脏键跟踪）
+class Recorder(MutableMapping):
+    def __init__(self, base, on_read=None, copied_reads=True):
+        # on_read(key, value) 在每个键第一次被读取时调用，键不存在时 value 为 MISSING；读取自己写入的键不算读取
+        # copied_reads 为 False 时，snapshot() 中会被 Overlay 在读取时复制的内置容器不计为读取（并行分支无法原地修改它们）
+        self._base, self._on_read, self._copied_reads = base, on_read, copied_reads
+        self.reads, self.writes, self.deletes = {}, set(), set()
+
+    def _read(self, key, value):
+        if key not in self.reads and key not in self.writes and key not in self.deletes:
+            self.reads[key] = None
+            if self._on_read is not None:
+                self._on_read(key, value)
+
+    def __getitem__(self, key):
+        try:
+            value = self._base[key]
+        except KeyError:
+            self._read(key, MISSING)
+            raise
+        self._read(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._base[key] = value
+        self.writes.add(key)
+        self.deletes.discard(key)
+
+    def __delitem__(self, key):
+        del self._base[key]
+        self.writes.discard(key)
+        self.deletes.add(key)
+
+    def __contains__(self, key):
+        found = key in self._base
+        self._read(key, self._base[key] if found else MISSING)
+        return found
+
+    def __iter__(self):
+        return iter(self._base)
+
+    def __len__(self):
+        return len(self._base)
+
+    def __repr__(self):
+        return f"Recorder({self._base!r})"
+
+    def __reduce__(self):
+        # pickle（例如把节点发送给工作进程）时还原为普通字典
+        return (dict, (dict(self._base),))
+
+    def snapshot(self):
+        data = snapshot(self._base)
+        for k, v in data.items():
+            if self._copied_reads or type(v) not in _COPY_ON_READ:
+                self._read(k, v)
+        return data
+
+def snapshot(shared):
+    # shared 的浅拷贝快照，作为并行分支的 Overlay 的 base
+    return shared.snapshot() if isinstance(shared, Recorder) else dict(shared)
+
+def unwrap(shared):
+    # 去掉 Recorder 包装，返回实际保存数据的映射；通过它读取不会被记录
+    while isinstance(shared, Recorder):
+        shared = shared._base
+    return shared
+
+# 合并规则：rule(当前值, 分支开始时的值, 分支写入的值) -> 提交后的值；键不存在时为 MISSING
+
+def _last(current, base, value):
+    # 后提交的分支覆盖先提交的
+    return value
+
+def _add(current, base, value):
+    # 数值累加：各分支相对于开始时的增量相加，例如计数器
+    return (0 if current is MISSING else current) + value - (0 if base is MISSING else base)
+
+def _append(current, base, value):
+    # 列表追加：各分支在开始时的列表之后追加的元素依次拼接
+    start = 0 if base is MISSING else len(base)
+    return ([] if current is MISSING else list(current)) + list(value[start:])
+
+def _update(current, base, value):
+    # 字典合并：各分支新增、替换或删除的子键分别合并
+    merged = {} if current is MISSING else dict(current)
+    base = {} if base is MISSING else base
+    merged.update({k: v for k, v in value.items() if k not in base or base[k] is not v})
+    for k in base:
+        if k not in value:
+            merged.pop(k, None)
+    return merged
+
+def _error(current, base, value):
+    # 多个分支修改同一个键时报错
+    if current is not base:
+        raise ValueError("Conflicting writes from parallel branches")
+    return value
+
+RULES = {"last": _last, "add": _add, "append": _append, "update": _update, "error": _error}
+
+# 提交时持有的锁，使线程池中的多个分支依次提交
+_commit_lock = threading.Lock()
+
+def apply(shared, writes, base_value, rules=None):
+    # 把一个分支写入的值按 rules（键 -> 规则名或函数，未声明的键使用 "last"）写回 shared；base_value(key) 为分支开始时的值
+    rules = rules or {}
+    for key, value in writes.items():
+        rule = rules.get(key, "last")
+        fn = RULES[rule] if isinstance(rule, str) else rule
+        try:
+            shared[key] = fn(shared.get(key, MISSING), base_value(key), value)
+        except ValueError as e:
+            raise ValueError(f"{e}: '{key}'") from None
+
+def commit(shared, overlay, rules=None):
+    # 把分支视图的修改按 rules 提交回 shared
+    writes, deletes = overlay.changes()
+    with _commit_lock:
+        apply(shared, writes, overlay.base_value, rules)
+        for key in deletes:
+            if key not in writes:
+                shared.pop(key, None)
+    return writes
@@ -0,0 +1,97 @@
+# 异步流：节点的 exec_async 可以产出（yield）或返回异步迭代器，结果包装为 Stream，下游节点在第一块到达后即可开始处理
+# Stream 缓存已产出的块，可以被多个消费者各自从头迭代（例如同时发送给 WebSocket 和 TTS），也可以在结束后取得全部内容
+import asyncio
+
+class Stream:
+    def __init__(self, source):
+        # source 为异步或同步可迭代对象
+        self._it = source.__aiter__() if hasattr(source, "__aiter__") else _from_iter(source)
+        self._chunks, self._done, self._error, self._lock = [], False, None, asyncio.Lock()
+        self._callbacks = []
+
+    def __repr__(self):
+        return f"Stream({len(self._chunks)} chunks{', done' if self._done else ''})"
+
+    def __reduce__(self):
+        # 结束后可以 pickle（例如保存检查点），还原为包含全部块的流
+        if not self._done or self._error is not None:
+            raise TypeError("Cannot pickle a Stream that is still being produced or has failed")
+        return (Stream, (list(self._chunks),))
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def chunks(self):
+        # 目前已产出的块
+        return list(self._chunks)
+
+    def _on_done(self, fn):
+        # 流成功结束后调用 fn(stream)；已经结束时立即调用，失败的流不调用
+        if not self._done:
+            self._callbacks.append(fn)
+        elif self._error is None:
+            fn(self)
+
+    async def _pull(self, known):
+        # 已有消费者取得了第 known 块之后的块或流已结束时直接返回，否则从来源取得下一块
+        async with self._lock:
+            if len(self._chunks) > known or self._done:
+                return
+            try:
+                self._chunks.append(await self._it.__anext__())
+            except StopAsyncIteration:
+                self._done = True
+                for fn in self._callbacks:
+                    fn(self)
+                self._callbacks.clear()
+            except BaseException as e:
+                self._done, self._error = True, e
+                raise
+
+    def __aiter__(self):
+        return self._reader()
+
+    async def _reader(self):
+        # 每个消费者从第一块开始读取；读到缓存末尾时由该消费者从来源取得下一块
+        i = 0
+        while True:
+            if i < len(self._chunks):
+                yield self._chunks[i]
+                i += 1
+            elif self._done:
+                if self._error is not None:
+                    raise self._error
+                return
+            else:
+                await self._pull(i)
+
+    async def first(self):
+        # 等待第一块到达（来源在第一块之前失败时抛出异常）；流为空时返回 None
+        await self._pull(0)
+        if self._error is not None:
+            raise self._error
+        return self._chunks[0] if self._chunks else None
+
+    async def collect(self):
+        # 等待流结束，返回全部块的列表
+        return [c async for c in self]
+
+    async def text(self):
+        # 等待流结束，返回全部块拼接的字符串
+        return "".join(map(str, await self.collect()))
+
+async def _from_iter(items):
+    for i in items:
+        yield i
+
+async def _exec_result(res):
+    # exec_async 的结果：协程先 await；异步迭代器包装为 Stream，并在本次执行尝试内取得第一块，
+    # 因此第一块之前的失败和超时按节点的重试与 exec_timeout 处理
+    if hasattr(res, "__await__"):
+        res = await res
+    if hasattr(res, "__anext__"):
+        res = Stream(res)
+        await res.first()
+    return res
@@ -0,0 +1,138 @@
+# 节点追踪：记录 prep、exec（每次重试）、post 的起止时间、动作、批处理项目下标和所属流程，可导出为 Chrome trace-event JSON
+import asyncio, contextvars, json, os, threading, time
+
+# 当前启用的追踪器；未启用时节点只多一次 ContextVar.get()
+current = contextvars.ContextVar("pocketflow_tracer", default=None)
+# 当前所属的流程名和批处理项目下标
+_parent = contextvars.ContextVar("pocketflow_trace_parent", default=None)
+_item = contextvars.ContextVar("pocketflow_trace_item", default=None)
+
+def indexed(fn):
+    # 包装批处理的单项执行函数，接收 (下标, 项目)，使该项目内的事件记录下标
+    if asyncio.iscoroutinefunction(fn):
+        async def call_async(pair):
+            tok = _item.set(pair[0])
+            try:
+                return await fn(pair[1])
+            finally:
+                _item.reset(tok)
+        return call_async
+    def call(pair):
+        tok = _item.set(pair[0])
+        try:
+            return fn(pair[1])
+        finally:
+            _item.reset(tok)
+    return call
+
+class Tracer:
+    def __init__(self, callback=None):
+        # callback(event) 在每个事件记录后调用，可用于实时导出
+        self.events, self.callback = [], callback
+        self._t0, self._lanes, self._lock = time.perf_counter_ns(), {}, threading.Lock()
+
+    def __enter__(self):
+        self._token = current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        current.reset(self._token)
+
+    def _lane(self):
+        # 同一线程中的不同 asyncio 任务使用不同的泳道，避免并发的事件在火焰图中错误嵌套
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    def record(self, name, cat, start, end, node=None, flow=None, **args):
+        # 记录一个事件；start 和 end 为 time.perf_counter_ns() 的返回值
+        event = {"name": name, "cat": cat, "node": type(node).__name__ if node is not None else None,
+                 "flow": flow if flow is not None else _parent.get(), "item": _item.get(),
+                 "start": (start - self._t0) / 1000, "dur": (end - start) / 1000, "lane": self._lane(), **args}
+        self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+        return event
+
+    def call(self, node, name, fn, *args, **extra):
+        # 运行 fn(*args) 并记录为一个事件；失败时记录异常，post 事件同时记录返回的动作
+        start, error, res = time.perf_counter_ns(), None, None
+        try:
+            res = fn(*args)
+            return res
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            if name == "post":
+                extra["action"] = res
+            self.record(name, "phase", start, time.perf_counter_ns(), node, error=error, **extra)
+
+    async def call_async(self, node, name, fn, *args, **extra):
+        start, error, res = time.perf_counter_ns(), None, None
+        try:
+            res = await fn(*args)
+            return res
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            if name == "post":
+                extra["action"] = res
+            self.record(name, "phase", start, time.perf_counter_ns(), node, error=error, **extra)
+
+    def run_phases(self, node, shared):
+        # 追踪版本的 prep -> exec -> post；exec 的每次尝试在 Node._exec_retry 中记录
+        p = self.call(node, "prep", node.prep, shared)
+        e = node._exec(p)
+        return self.call(node, "post", node.post, shared, p, e)
+
+    async def run_phases_async(self, node, shared):
+        p = await self.call_async(node, "prep", node.prep_async, shared)
+        e = await node._exec(p)
+        return await self.call_async(node, "post", node.post_async, shared, p, e)
+
+    def step(self, flow, node, shared, run=None):
+        # 流程中的一步：记录节点整体的事件，并让其内部事件指向所属流程；run(shared) 代替 node._run 运行该节点
+        name = type(flow).__name__
+        tok, start, action, error = _parent.set(name), time.perf_counter_ns(), None, None
+        try:
+            action = node._run(shared) if run is None else run(shared)
+            return action
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            _parent.reset(tok)
+            self.record(type(node).__name__, "node", start, time.perf_counter_ns(), node, flow=name, action=action, error=error)
+
+    async def step_async(self, flow, node, run):
+        # run() 返回运行该节点的协程（同步节点可能在执行器中运行）
+        name = type(flow).__name__
+        tok, start, action, error = _parent.set(name), time.perf_counter_ns(), None, None
+        try:
+            action = await run()
+            return action
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            _parent.reset(tok)
+            self.record(type(node).__name__, "node", start, time.perf_counter_ns(), node, flow=name, action=action, error=error)
+
+    def to_chrome_trace(self):
+        # 导出为 Chrome trace-event 格式，可在 chrome://tracing 或 Perfetto 中以火焰图打开
+        pid, skip = os.getpid(), ("name", "cat", "start", "dur", "lane")
+        return {"traceEvents": [
+            {"name": e["name"], "cat": e["cat"], "ph": "X", "ts": e["start"], "dur": e["dur"], "pid": pid,
+             "tid": e["lane"], "args": {k: v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+                                        for k, v in e.items() if k not in skip}}
+            for e in self.events]}
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
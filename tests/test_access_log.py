@@ -0,0 +1,160 @@
+import unittest
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import (Node, AsyncNode, Flow, BatchFlow, ThreadPoolBatchFlow, AsyncParallelBatchFlow,
+                        AsyncFanOutFlow, AccessLog)
+
+class Load(Node):
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['doc'] = "pocket flow"
+
+class Summarize(Node):
+    def prep(self, shared_storage):
+        return shared_storage['doc']
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['summary'] = prep_res.upper()
+
+class Tag(Node):
+    def prep(self, shared_storage):
+        return shared_storage['doc']
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['tags'] = prep_res.split()
+
+class Save(Node):
+    def prep(self, shared_storage):
+        return shared_storage['summary'], shared_storage['tags']
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['saved'] = True
+
+class AddToTotal(Node):
+    # 读-改-写同一个键：并行运行时会互相覆盖
+    def prep(self, shared_storage):
+        return shared_storage.get('total', 0)
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['total'] = prep_res + self.params.get('x', 1)
+
+class WriteOwnKey(Node):
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage[f"result_{self.params['x']}"] = self.params['x']
+
+class Append(Node):
+    # 原地追加到 shared 中已有的列表，不重新赋值
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['history'].append(type(self).__name__)
+
+class A(Append):
+    pass
+
+class B(Append):
+    pass
+
+class C(Node):
+    def prep(self, shared_storage):
+        return shared_storage['history'][-1]
+
+def items(n):
+    return [{'x': i} for i in range(n)]
+
+class TestAccessLog(unittest.TestCase):
+    def test_report_finds_independent_nodes(self):
+        """
+        测试顺序连接的节点中，读写集合不相交的节点被报告为可以并行运行
+        """
+        load = Load()
+        load >> Summarize() >> Tag() >> Save()
+        with AccessLog() as log:
+            for _ in range(2):
+                Flow(start=load).run({})
+        [dep] = log.dependencies()
+        self.assertEqual(dep['nodes'], ['Load', 'Summarize', 'Tag', 'Save'])
+        self.assertEqual(dep['runs'], 2)
+        self.assertEqual(dep['stages'], [[0], [1, 2], [3]])
+        self.assertIn((1, 3, "reads 'summary'"), dep['deps'])
+        report = log.report()
+        self.assertIn("stage 2: Summarize | Tag  <- can run in parallel", report)
+        self.assertEqual(log.by_node()['Save']['reads'], {'summary', 'tags'})
+        self.assertEqual(len(log.records), 8)
+
+    def test_in_place_changes_are_writes(self):
+        """
+        测试原地修改读取到的值（append）计为写入：依次追加同一个列表的节点和读取它的节点不被报告为可以并行
+        """
+        a = A()
+        a >> B() >> C()
+        with AccessLog() as log:
+            Flow(start=a).run({'history': []})
+        [dep] = log.dependencies()
+        self.assertEqual(dep['writes'][:2], [{'history'}, {'history'}])
+        self.assertEqual(dep['stages'], [[0], [1], [2]])
+        self.assertIn((1, 2, "reads 'history'"), dep['deps'])
+        self.assertNotIn("can run in parallel", log.report())
+
+    def test_branching_node_is_a_barrier(self):
+        """
+        测试有多个后继的节点返回的动作决定后面的路径，之后的节点依赖它；嵌套流程的读写计入外层的步骤
+        """
+        class Route(Node):
+            def post(self, shared_storage, prep_res, exec_res):
+                return "go"
+        route, inner_load = Route(), Load()
+        inner_load >> Summarize()
+        route - "go" >> Flow(start=inner_load) >> Tag()
+        route - "stop" >> Save()
+        with AccessLog() as log:
+            Flow(start=route).run({})
+        outer = next(d for d in log.dependencies() if d['nodes'][0] == 'Route')
+        self.assertEqual(outer['nodes'], ['Route', 'Flow', 'Tag'])
+        self.assertEqual(outer['writes'][1], {'doc', 'summary'})
+        self.assertEqual(outer['stages'], [[0], [1], [2]])
+        self.assertIn((0, 2, "branches on its action"), outer['deps'])
+
+    def test_conflicts_in_parallel_batch_flows(self):
+        """
+        测试线程池批处理流中并行分支读改写同一个键时报告冲突；各自写入不同的键或顺序批处理时没有冲突
+        """
+        class Parallel(ThreadPoolBatchFlow):
+            def prep(self, shared_storage):
+                return items(4)
+        class Sequential(BatchFlow):
+            def prep(self, shared_storage):
+                return items(4)
+        with AccessLog() as log:
+            Parallel(start=AddToTotal(), max_workers=2).run({})
+        kinds = {(c['key'], c['kind']): c['count'] for c in log.conflicts()}
+        self.assertEqual(kinds, {('total', 'write-write'): 6})
+        self.assertIn("write-write on 'total': AddToTotal / AddToTotal (6x)", log.report())
+
+        with AccessLog() as log:
+            Parallel(start=WriteOwnKey()).run({})
+            Sequential(start=AddToTotal()).run({})
+        self.assertEqual(log.conflicts(), [])
+
+    def test_async_parallel_flows(self):
+        """
+        测试异步并行批处理流和异步扇出中的冲突：一个分支写入另一个分支读取的键
+        """
+        class Reader(AsyncNode):
+            async def prep_async(self, shared_storage):
+                await asyncio.sleep(0.01)
+                return shared_storage.get('total')
+        class Batch(AsyncParallelBatchFlow):
+            async def prep_async(self, shared_storage):
+                return items(3)
+        async def main():
+            await Batch(start=AddToTotal()).run_async({})
+            await AsyncFanOutFlow(AddToTotal(), Reader()).run_async({})
+        with AccessLog() as log:
+            asyncio.run(main())
+        kinds = {(c['key'], c['kind'], c['nodes']): c['count'] for c in log.conflicts()}
+        self.assertEqual(kinds[('total', 'write-write', ('AddToTotal', 'AddToTotal'))], 3)
+        self.assertEqual(kinds[('total', 'read-write', ('AddToTotal', 'Reader'))], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import asyncio
+import threading
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, AsyncFlow, Tracer, remaining_time
+
+class BlockingNode(Node):
+    # 记录运行所在的线程和流程剩余时间，然后阻塞 0.1 秒
+    def prep(self, shared_storage):
+        return threading.current_thread().name, remaining_time()
+
+    def exec(self, prep_res):
+        time.sleep(0.1)
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['thread'], shared_storage['budget'] = prep_result
+        return "next"
+
+class AsyncEnd(AsyncNode):
+    async def post_async(self, shared_storage, prep_result, exec_result):
+        shared_storage['end'] = True
+
+async def run_with_heartbeat(flow, shared_storage):
+    # 流程运行期间每 10 毫秒计一次心跳
+    beats, done = [0], asyncio.Event()
+    async def heartbeat():
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            beats[0] += 1
+    task = asyncio.ensure_future(heartbeat())
+    await flow.run_async(shared_storage)
+    done.set()
+    await task
+    return beats[0]
+
+def build():
+    node = BlockingNode()
+    node - "next" >> AsyncEnd()
+    return AsyncFlow(start=node)
+
+class TestOffloadSync(unittest.TestCase):
+    def test_default_runs_on_loop(self):
+        """
+        测试默认情况下同步节点仍在事件循环线程中运行
+        """
+        shared_storage = {}
+        beats = asyncio.run(run_with_heartbeat(build(), shared_storage))
+        self.assertEqual(shared_storage['thread'], threading.current_thread().name)
+        self.assertLessEqual(beats, 2)
+
+    def test_offload_keeps_loop_responsive(self):
+        """
+        测试 offload_sync 时同步节点在线程池中运行，事件循环不被阻塞，流程照常继续
+        """
+        flow = build()
+        flow.offload_sync = True
+        shared_storage = {}
+        beats = asyncio.run(run_with_heartbeat(flow, shared_storage))
+        self.assertNotEqual(shared_storage['thread'], threading.current_thread().name)
+        self.assertGreaterEqual(beats, 5)
+        self.assertTrue(shared_storage['end'])
+
+    def test_custom_executor_and_context(self):
+        """
+        测试使用自定义执行器，且节点在线程中仍能获取流程的剩余时间
+        """
+        with ThreadPoolExecutor(1, thread_name_prefix="sync-nodes") as ex:
+            flow = build()
+            flow.offload_sync, flow.executor, flow.timeout = True, ex, 30
+            shared_storage = {}
+            asyncio.run(flow.run_async(shared_storage))
+        self.assertTrue(shared_storage['thread'].startswith("sync-nodes"))
+        self.assertTrue(0 < shared_storage['budget'] <= 30)
+
+    def test_offload_with_tracing(self):
+        """
+        测试启用追踪时同步节点同样在线程池中运行并被记录
+        """
+        flow = build()
+        flow.offload_sync = True
+        shared_storage = {}
+        async def run():
+            with Tracer() as tracer:
+                await flow.run_async(shared_storage)
+            return tracer
+        tracer = asyncio.run(run())
+        self.assertNotEqual(shared_storage['thread'], threading.current_thread().name)
+        steps = [(e['name'], e['action']) for e in tracer.events if e['cat'] == 'node']
+        self.assertEqual(steps, [('BlockingNode', 'next'), ('AsyncEnd', None)])
+
+if __name__ == '__main__':
+    unittest.main()
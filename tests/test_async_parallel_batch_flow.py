@@ -156,5 +156,36 @@ class TestAsyncParallelBatchFlow(unittest.TestCase):
         expected_total = sum(num * 2 for batch in shared_storage['batches'] for num in batch)
         self.assertEqual(shared_storage['total'], expected_total)
 
+    def test_max_concurrency(self):
+        """
+        测试 max_concurrency 限制同时运行的子流数
+        """
+        state = {'running': 0, 'peak': 0}
+
+        class TrackingProcessor(AsyncParallelNumberProcessor):
+            async def prep_async(self, shared_storage):
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+                return await super().prep_async(shared_storage)
+
+            async def post_async(self, shared_storage, prep_result, exec_result):
+                state['running'] -= 1
+                return await super().post_async(shared_storage, prep_result, exec_result)
+
+        class LimitedBatchFlow(AsyncParallelBatchFlow):
+            async def prep_async(self, shared_storage):
+                return [{'batch_id': i} for i in range(len(shared_storage['batches']))]
+
+        shared_storage = {
+            'batches': [[i, i + 1] for i in range(6)]
+        }
+
+        flow = LimitedBatchFlow(start=TrackingProcessor(delay=0.01), max_concurrency=2)
+        self.loop.run_until_complete(flow.run_async(shared_storage))
+
+        expected = {i: [i * 2, (i + 1) * 2] for i in range(6)}
+        self.assertEqual(shared_storage['processed_numbers'], expected)
+        self.assertEqual(state['peak'], 2)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
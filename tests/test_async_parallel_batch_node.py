@@ -139,5 +139,74 @@ class TestAsyncParallelBatchNode(unittest.TestCase):
         self.assertLess(execution_order.index(1), execution_order.index(0))
         self.assertLess(execution_order.index(3), execution_order.index(2))
 
+    def test_max_concurrency(self):
+        """
+        测试 max_concurrency 限制同时运行的项目数，并保持结果顺序
+        """
+        state = {'running': 0, 'peak': 0}
+
+        class TrackingProcessor(AsyncParallelNumberProcessor):
+            async def exec_async(self, number):
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+                await asyncio.sleep(0.01 if number % 2 else 0.02)
+                state['running'] -= 1
+                return number * 2
+
+        shared_storage = {
+            'input_numbers': list(range(20))
+        }
+
+        processor = TrackingProcessor()
+        processor.max_concurrency = 3
+        self.loop.run_until_complete(processor.run_async(shared_storage))
+
+        self.assertEqual(shared_storage['processed_numbers'], [x * 2 for x in range(20)])
+        self.assertEqual(state['peak'], 3)
+
+    def test_max_concurrency_param_override(self):
+        """
+        测试通过 params["max_concurrency"] 按次运行覆盖节点上的限制
+        """
+        state = {'running': 0, 'peak': 0}
+
+        class TrackingProcessor(AsyncParallelBatchNode):
+            async def prep_async(self, shared_storage):
+                return shared_storage['input_numbers']
+
+            async def exec_async(self, number):
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+                await asyncio.sleep(0.01)
+                state['running'] -= 1
+                return number
+
+            async def post_async(self, shared_storage, prep_result, exec_result):
+                shared_storage['processed_numbers'] = exec_result
+
+        shared_storage = {
+            'input_numbers': list(range(10))
+        }
+
+        processor = TrackingProcessor(max_concurrency=5)
+        processor.set_params({'max_concurrency': 2})
+        self.loop.run_until_complete(processor.run_async(shared_storage))
+
+        self.assertEqual(shared_storage['processed_numbers'], list(range(10)))
+        self.assertEqual(state['peak'], 2)
+
+    def test_invalid_max_concurrency(self):
+        """
+        测试 max_concurrency 小于 1（包括 0）时报错，项目数不超过上限时也一样；None 表示不限制
+        """
+        for limit in (0, -1):
+            processor = AsyncParallelNumberProcessor(delay=0)
+            processor.max_concurrency = limit
+            with self.assertRaises(ValueError):
+                self.loop.run_until_complete(processor.run_async({'input_numbers': [1]}))
+        shared_storage = {'input_numbers': [1, 2]}
+        self.loop.run_until_complete(AsyncParallelNumberProcessor(delay=0).run_async(shared_storage))
+        self.assertEqual(shared_storage['processed_numbers'], [2, 4])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
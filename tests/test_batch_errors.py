@@ -0,0 +1,172 @@
+import unittest
+import asyncio
+import pickle
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import (BatchNode, ThreadPoolBatchNode, ProcessPoolBatchNode, AsyncBatchNode,
+                        AsyncParallelBatchNode, Flow, BatchResult)
+
+class Flaky(BatchNode):
+    # bad 中的项目始终失败；每次 exec 调用都记录在 calls 中
+    on_error = "collect"
+
+    def __init__(self, bad=(), **kwargs):
+        super().__init__(**kwargs)
+        self.bad, self.calls = set(bad), []
+
+    def prep(self, shared_storage):
+        return shared_storage.get('results') or shared_storage['items']
+
+    def exec(self, item):
+        self.calls.append(item)
+        if item in self.bad:
+            raise ValueError(f"item {item} failed")
+        return item * 10
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['results'] = exec_res
+
+class ThreadFlaky(Flaky, ThreadPoolBatchNode):
+    pass
+
+class ProcessFlaky(ProcessPoolBatchNode):
+    on_error = "collect"
+
+    def exec(self, item):
+        if item == 2:
+            raise ValueError("item 2 failed")
+        return item * 10
+
+class AsyncFlaky(AsyncParallelBatchNode):
+    def __init__(self, bad=(), **kwargs):
+        super().__init__(**kwargs)
+        self.bad, self.finished = set(bad), []
+
+    async def prep_async(self, shared_storage):
+        return shared_storage.get('results') or shared_storage['items']
+
+    async def exec_async(self, item):
+        await asyncio.sleep(0.01 if item in self.bad else 0.05)
+        if item in self.bad:
+            raise ValueError(f"item {item} failed")
+        self.finished.append(item)
+        return item * 10
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        shared_storage['results'] = exec_res
+
+class SeqAsyncFlaky(AsyncBatchNode):
+    on_error = "collect"
+
+    async def exec_async(self, item):
+        if item == 1:
+            raise ValueError("item 1 failed")
+        return item
+
+class TestBatchErrors(unittest.TestCase):
+    def test_collect_and_retry_failed(self):
+        """
+        测试收集模式：失败项目的异常记录在 BatchResult 中，再次运行时只重新执行失败的项目
+        """
+        node = Flaky(bad={2, 4}, max_retries=2)
+        shared_storage = {'items': list(range(6))}
+        node.run(shared_storage)
+        res = shared_storage['results']
+        self.assertIsInstance(res, BatchResult)
+        self.assertEqual(res, [0, 10, None, 30, None, 50])
+        self.assertEqual(res.failed, [2, 4])
+        self.assertIsInstance(res.errors[2], ValueError)
+
+        node.bad, node.calls = {4}, []
+        node.run(shared_storage)
+        res = shared_storage['results']
+        self.assertEqual(node.calls, [2, 4, 4])
+        self.assertEqual(res, [0, 10, 20, 30, None, 50])
+        self.assertEqual(res.failed, [4])
+
+        node.bad, node.calls = set(), []
+        node.run(shared_storage)
+        self.assertEqual(node.calls, [4])
+        self.assertEqual(shared_storage['results'].errors, {})
+        self.assertEqual(shared_storage['results'], [i * 10 for i in range(6)])
+
+    def test_retry_loop_in_flow(self):
+        """
+        测试在流程中循环重跑失败的项目，直到全部成功
+        """
+        class Retrying(Flaky):
+            def exec(self, item):
+                self.calls.append(item)
+                if item % 2 and self.calls.count(item) < 3:
+                    raise ValueError("transient")
+                return item
+            def post(self, shared_storage, prep_res, exec_res):
+                shared_storage['results'] = exec_res
+                return "retry" if exec_res.errors else None
+        node = Retrying()
+        node - "retry" >> node
+        shared_storage = {'items': list(range(5))}
+        Flow(start=node).run(shared_storage)
+        self.assertEqual(shared_storage['results'], list(range(5)))
+        self.assertEqual(len(node.calls), 5 + 2 + 2)
+
+    def test_raise_is_default(self):
+        """
+        测试默认策略为抛出异常，可通过 params 按次运行切换为收集模式
+        """
+        class Strict(Flaky):
+            on_error = "raise"
+        node = Strict(bad={1})
+        with self.assertRaises(ValueError):
+            node.run({'items': [0, 1, 2]})
+        flow = Flow(start=node)
+        flow.set_params({'on_error': 'collect'})
+        shared_storage = {'items': [0, 1, 2]}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['results'].failed, [1])
+
+    def test_thread_and_process_pools(self):
+        """
+        测试线程池与进程池批处理节点的收集模式
+        """
+        shared_storage = {'items': list(range(5))}
+        ThreadFlaky(bad={3}, max_workers=3).run(shared_storage)
+        self.assertEqual(shared_storage['results'], [0, 10, 20, None, 40])
+        self.assertEqual(shared_storage['results'].failed, [3])
+
+        res = ProcessFlaky(max_workers=2)._exec(range(4))
+        self.assertEqual(res, [0, 10, None, 30])
+        self.assertIsInstance(res.errors[2], ValueError)
+
+    def test_async_collect_and_fail_fast(self):
+        """
+        测试异步并行批处理：收集模式等待所有项目；抛出模式在第一个失败时取消其余项目
+        """
+        node = AsyncFlaky(bad={1})
+        node.on_error = "collect"
+        shared_storage = {'items': list(range(4))}
+        asyncio.run(node.run_async(shared_storage))
+        self.assertEqual(shared_storage['results'], [0, None, 20, 30])
+        node.bad = set()
+        asyncio.run(node.run_async(shared_storage))
+        self.assertEqual(shared_storage['results'], [0, 10, 20, 30])
+
+        node = AsyncFlaky(bad={1})
+        with self.assertRaises(ValueError):
+            asyncio.run(node.run_async({'items': list(range(4))}))
+        self.assertEqual(node.finished, [])
+
+        res = asyncio.run(SeqAsyncFlaky()._exec([0, 1, 2]))
+        self.assertEqual((res, res.failed), ([0, None, 2], [1]))
+
+    def test_pickle(self):
+        """
+        测试 BatchResult 可以 pickle（用于检查点）
+        """
+        res = pickle.loads(pickle.dumps(BatchResult([1, None], ['a', 'b'], {1: ValueError("x")})))
+        self.assertEqual((res, res.items, res.failed), ([1, None], ['a', 'b'], [1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,301 @@
+import unittest
+import asyncio
+import tempfile
+import threading
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, BatchNode, AsyncParallelBatchNode, ThreadPoolBatchNode, LRUCache, DiskCache
+
+class CountingNode(Node):
+    # 统计 exec 实际调用次数的节点
+    calls = 0
+
+    def prep(self, shared_storage):
+        return shared_storage['text']
+
+    def exec(self, text):
+        CountingNode.calls += 1
+        return text.upper()
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['result'] = exec_result
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        CountingNode.calls = 0
+
+    def test_hit_and_miss(self):
+        """
+        测试相同的 prep_res 第二次运行时命中缓存
+        """
+        node = CountingNode()
+        node.cache = LRUCache()
+        for text in ['a', 'a', 'b', 'a']:
+            shared_storage = {'text': text}
+            node.run(shared_storage)
+            self.assertEqual(shared_storage['result'], text.upper())
+
+        self.assertEqual(CountingNode.calls, 2)
+        stats = node.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 2, 2))
+
+    def test_maxsize_eviction(self):
+        """
+        测试超过 maxsize 时淘汰最久未使用的项目
+        """
+        node = CountingNode()
+        node.cache = LRUCache(maxsize=2)
+        for text in ['a', 'b', 'a', 'c', 'b']:
+            node.run({'text': text})
+        # 'b' 在插入 'c' 时被淘汰
+        self.assertEqual(CountingNode.calls, 4)
+        self.assertEqual(len(node.cache), 2)
+
+    def test_ttl_expiry(self):
+        """
+        测试超过 ttl 的结果不再命中
+        """
+        node = CountingNode()
+        node.cache = LRUCache(ttl=0.05)
+        node.run({'text': 'a'})
+        node.run({'text': 'a'})
+        time.sleep(0.06)
+        node.run({'text': 'a'})
+        self.assertEqual(CountingNode.calls, 2)
+
+    def test_version_and_params_in_key(self):
+        """
+        测试 cache_version 和 params 都参与缓存键
+        """
+        cache = LRUCache()
+        node = CountingNode()
+        node.cache = cache
+        node.run({'text': 'a'})
+
+        node.cache_version = 2
+        node.run({'text': 'a'})
+
+        node.set_params({'lang': 'en'})
+        node.run({'text': 'a'})
+        self.assertEqual(CountingNode.calls, 3)
+
+    def test_fallback_not_cached(self):
+        """
+        测试回退结果不会被缓存，下一次运行会重新执行
+        """
+        attempts = []
+
+        class FlakyNode(CountingNode):
+            def exec(self, text):
+                attempts.append(text)
+                if len(attempts) == 1:
+                    raise ValueError("故意失败")
+                return text
+
+            def exec_fallback(self, prep_result, exc):
+                return "fallback"
+
+        node = FlakyNode()
+        node.cache = LRUCache()
+        shared_storage = {'text': 'a'}
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['result'], "fallback")
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['result'], "a")
+        node.run(shared_storage)
+        self.assertEqual(len(attempts), 2)
+
+    def test_batch_node_per_item(self):
+        """
+        测试批处理节点按项目缓存
+        """
+        calls = []
+
+        class Squares(BatchNode):
+            cache = LRUCache()
+
+            def prep(self, shared_storage):
+                return shared_storage['numbers']
+
+            def exec(self, number):
+                calls.append(number)
+                return number * number
+
+            def post(self, shared_storage, prep_result, exec_result):
+                shared_storage['squares'] = exec_result
+
+        shared_storage = {'numbers': [1, 2, 3]}
+        Squares().run(shared_storage)
+        shared_storage['numbers'] = [2, 3, 4]
+        Squares().run(shared_storage)
+        self.assertEqual(shared_storage['squares'], [4, 9, 16])
+        self.assertEqual(calls, [1, 2, 3, 4])
+
+    def test_single_flight_threads(self):
+        """
+        测试多个线程同时请求同一个键时只执行一次
+        """
+        calls = []
+        lock = threading.Lock()
+
+        class SlowSquares(ThreadPoolBatchNode):
+            def prep(self, shared_storage):
+                return [7] * 8
+
+            def exec(self, number):
+                with lock:
+                    calls.append(number)
+                time.sleep(0.05)
+                return number * number
+
+            def post(self, shared_storage, prep_result, exec_result):
+                shared_storage['squares'] = exec_result
+
+        node = SlowSquares(max_workers=8)
+        node.cache = LRUCache()
+        shared_storage = {}
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['squares'], [49] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(node.cache.shared + node.cache.hits, 7)
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        CountingNode.calls = 0
+
+    def test_persists_across_instances(self):
+        """
+        测试磁盘缓存在重新打开后仍然命中
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.db"
+            node = CountingNode()
+            node.cache = DiskCache(path)
+            node.run({'text': 'a'})
+            node.cache.close()
+
+            node.cache = DiskCache(path)
+            shared_storage = {'text': 'a'}
+            node.run(shared_storage)
+            self.assertEqual(shared_storage['result'], 'A')
+            self.assertEqual(CountingNode.calls, 1)
+            self.assertEqual(node.cache.stats()['hits'], 1)
+            node.cache.close()
+
+    def test_ttl_expiry(self):
+        """
+        测试磁盘缓存的过期时间
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            node = CountingNode()
+            node.cache = DiskCache(Path(tmp) / "cache.db", ttl=0.05)
+            node.run({'text': 'a'})
+            time.sleep(0.06)
+            node.run({'text': 'a'})
+            self.assertEqual(CountingNode.calls, 2)
+            node.cache.close()
+
+class TestAsyncCache(unittest.TestCase):
+    def test_single_flight_async(self):
+        """
+        测试并发的相同 exec_async 调用共享同一个进行中的请求
+        """
+        calls = []
+
+        class Embed(AsyncParallelBatchNode):
+            async def prep_async(self, shared_storage):
+                return shared_storage['texts']
+
+            async def exec_async(self, text):
+                calls.append(text)
+                await asyncio.sleep(0.02)
+                return len(text)
+
+            async def post_async(self, shared_storage, prep_result, exec_result):
+                shared_storage['lengths'] = exec_result
+
+        node = Embed()
+        node.cache = LRUCache()
+        shared_storage = {'texts': ['aa', 'bbb', 'aa', 'aa', 'bbb']}
+        asyncio.run(node.run_async(shared_storage))
+        self.assertEqual(shared_storage['lengths'], [2, 3, 2, 2, 3])
+        self.assertEqual(sorted(calls), ['aa', 'bbb'])
+        self.assertEqual(node.cache.stats()['shared'], 3)
+
+    def test_single_flight_across_event_loops(self):
+        """
+        测试多个线程各自的事件循环中相同的并发调用共享同一个进行中的请求
+        """
+        calls = []
+
+        class Embed(AsyncNode):
+            async def exec_async(self, text):
+                calls.append(text)
+                await asyncio.sleep(0.05)
+                return len(text)
+
+        cache, results, barrier = LRUCache(), [], threading.Barrier(3)
+        def worker():
+            node = Embed()
+            node.cache = cache
+            barrier.wait()
+            results.append(asyncio.run(node._exec("abc")))
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [3, 3, 3])
+        self.assertEqual(calls, ["abc"])
+        self.assertEqual(cache.shared + cache.hits, 2)
+
+    def test_async_fallback(self):
+        """
+        测试异步节点失败时使用异步回退，且共享请求的调用者都收到回退结果
+        """
+        class FailingNode(AsyncParallelBatchNode):
+            async def prep_async(self, shared_storage):
+                return ['x', 'x']
+
+            async def exec_async(self, text):
+                await asyncio.sleep(0.01)
+                raise ValueError("故意失败")
+
+            async def exec_fallback_async(self, prep_result, exc):
+                return "fallback"
+
+            async def post_async(self, shared_storage, prep_result, exec_result):
+                shared_storage['results'] = exec_result
+
+        node = FailingNode()
+        node.cache = LRUCache()
+        shared_storage = {}
+        asyncio.run(node.run_async(shared_storage))
+        self.assertEqual(shared_storage['results'], ["fallback", "fallback"])
+        self.assertEqual(len(node.cache), 0)
+
+    def test_async_node_hit(self):
+        """
+        测试单个 AsyncNode 的缓存命中
+        """
+        calls = []
+
+        class AsyncUpper(AsyncNode):
+            async def prep_async(self, shared_storage):
+                return shared_storage['text']
+
+            async def exec_async(self, text):
+                calls.append(text)
+                return text.upper()
+
+        node = AsyncUpper()
+        node.cache = LRUCache()
+        asyncio.run(node.run_async({'text': 'a'}))
+        asyncio.run(node.run_async({'text': 'a'}))
+        self.assertEqual(calls, ['a'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+import unittest
+import asyncio
+import tempfile
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, BatchFlow, AsyncFlow, AsyncParallelBatchFlow, ThreadPoolBatchFlow, Checkpoint
+
+class Crash(Exception):
+    pass
+
+class StepNode(Node):
+    # 记录运行过的节点；当 crash_at[0] 等于节点名时模拟崩溃（只崩溃一次）
+    def __init__(self, name, action=None):
+        super().__init__()
+        self.name, self.action = name, action
+
+    def prep(self, shared_storage):
+        if crash_at[0] == self.name:
+            crash_at[0] = None
+            raise Crash(self.name)
+        return self.name
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage.setdefault('ran', []).append(self.name)
+        runs.append(self.name)
+        return self.action
+
+class ItemNode(Node):
+    # 处理第 params['i'] 个批次；当 i 等于 crash_at[0] 时模拟崩溃（只崩溃一次）
+    def prep(self, shared_storage):
+        i = self.params['i']
+        if crash_at[0] == i:
+            crash_at[0] = None
+            raise Crash(i)
+        return i
+
+    def exec(self, i):
+        runs.append(i)
+        return i * i
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage.setdefault('squares', {})[prep_result] = exec_result
+
+class AsyncItemNode(AsyncNode):
+    async def prep_async(self, shared_storage):
+        i = self.params['i']
+        if crash_at[0] == i:
+            crash_at[0] = None
+            raise Crash(i)
+        return i
+
+    async def exec_async(self, i):
+        await asyncio.sleep(0.001 * (i % 3))
+        runs.append(i)
+        return i * i
+
+    async def post_async(self, shared_storage, prep_result, exec_result):
+        shared_storage.setdefault('squares', {})[prep_result] = exec_result
+
+class Squares(BatchFlow):
+    def prep(self, shared_storage):
+        return [{'i': i} for i in range(shared_storage['n'])]
+
+class Counted:
+    # 记录被 pickle 的次数
+    pickles = 0
+
+    def __reduce__(self):
+        Counted.pickles += 1
+        return (Counted, ())
+
+runs, crash_at = [], [None]
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        runs.clear()
+        crash_at[0] = None
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "run.db"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resume_flow(self):
+        """
+        测试流程在第三个节点崩溃后，重新运行时从该节点继续
+        """
+        a, b, c = StepNode('a'), StepNode('b', 'next'), StepNode('c', 'end')
+        a >> b
+        b - "next" >> c
+        flow = Flow(start=a)
+        flow.checkpoint = Checkpoint(self.path)
+
+        shared_storage = {}
+        crash_at[0] = 'c'
+        with self.assertRaises(Crash):
+            flow.run(shared_storage)
+        self.assertTrue(flow.checkpoint.exists())
+
+        # 模拟新进程：shared 从检查点恢复
+        fresh = {}
+        action = flow.run(fresh)
+        self.assertEqual(action, 'end')
+        self.assertEqual(fresh['ran'], ['a', 'b', 'c'])
+        self.assertEqual(runs, ['a', 'b', 'c'])
+        self.assertFalse(flow.checkpoint.exists())
+
+    def test_resume_nested_flow(self):
+        """
+        测试嵌套流程中途崩溃后，外层和内层都从各自的位置继续
+        """
+        inner_a, inner_b = StepNode('inner_a'), StepNode('inner_b')
+        inner_a >> inner_b
+        outer_a, outer_b = StepNode('outer_a'), StepNode('outer_b')
+        inner = Flow(start=inner_a)
+        outer_a >> inner >> outer_b
+        flow = Flow(start=outer_a)
+        flow.checkpoint = Checkpoint(self.path)
+
+        crash_at[0] = 'inner_b'
+        with self.assertRaises(Crash):
+            flow.run({})
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['ran'], ['outer_a', 'inner_a', 'inner_b', 'outer_b'])
+        self.assertEqual(runs, ['outer_a', 'inner_a', 'inner_b', 'outer_b'])
+
+    def test_resume_batch_flow(self):
+        """
+        测试批处理流程崩溃后只运行未完成的批次
+        """
+        flow = Squares(start=ItemNode())
+        flow.checkpoint = Checkpoint(self.path)
+
+        crash_at[0] = 6
+        with self.assertRaises(Crash):
+            flow.run({'n': 10})
+        self.assertEqual(runs, list(range(6)))
+
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['squares'], {i: i * i for i in range(10)})
+        self.assertEqual(runs, list(range(10)))
+
+    def test_checkpoint_every(self):
+        """
+        测试 every > 1 时最多重复运行最近一次保存之后的批次
+        """
+        flow = Squares(start=ItemNode())
+        flow.checkpoint = Checkpoint(self.path, every=5)
+
+        crash_at[0] = 6
+        with self.assertRaises(Crash):
+            flow.run({'n': 10})
+        flow.run({})
+        # 每个批次计两个步骤（子流程中的节点和批次本身），最近一次保存在批次 4 完成时，因此批次 5 会重新运行
+        self.assertEqual(runs, list(range(6)) + list(range(5, 10)))
+
+    def test_nested_batch_in_flow(self):
+        """
+        测试嵌套在普通流程中的批处理流程按批次恢复
+        """
+        start, end = StepNode('start'), StepNode('end')
+        batch = Squares(start=ItemNode())
+        start >> batch >> end
+        flow = Flow(start=start)
+        flow.checkpoint = Checkpoint(self.path)
+
+        crash_at[0] = 3
+        with self.assertRaises(Crash):
+            flow.run({'n': 5})
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['ran'], ['start', 'end'])
+        self.assertEqual(shared_storage['squares'], {i: i * i for i in range(5)})
+        self.assertEqual(runs, ['start', 0, 1, 2, 3, 4, 'end'])
+
+    def test_thread_pool_batch_flow(self):
+        """
+        测试线程池批处理流程同样记录已完成的批次
+        """
+        class ThreadSquares(ThreadPoolBatchFlow):
+            def prep(self, shared_storage):
+                return [{'i': i} for i in range(shared_storage['n'])]
+
+        flow = ThreadSquares(start=ItemNode(), max_workers=1)
+        flow.checkpoint = Checkpoint(self.path)
+        crash_at[0] = 3
+        with self.assertRaises(Crash):
+            flow.run({'n': 6})
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['squares'], {i: i * i for i in range(6)})
+        self.assertEqual(sorted(runs), list(range(6)))
+
+    def test_incremental_save(self):
+        """
+        测试保存时只写入发生变化的键，删除的键也会同步删除
+        """
+        ckpt = Checkpoint(self.path)
+        shared_storage = {'big': 'x' * 1000, 'n': 1, 'gone': [1]}
+        ckpt.save(shared_storage)
+        del shared_storage['gone']
+        shared_storage['n'] = 2
+        ckpt.save(shared_storage)
+        rows = dict(ckpt._conn.execute("SELECT key, value FROM shared").fetchall())
+        self.assertEqual(len(rows), 2)
+        ckpt.close()
+
+    def test_untouched_values_not_repickled(self):
+        """
+        测试每一步只重新序列化读写过的键：未被访问的值只在第一次保存时 pickle，原地修改的值仍被保存
+        """
+        flow = Squares(start=ItemNode())
+        flow.checkpoint = Checkpoint(self.path)
+        Counted.pickles = 0
+        crash_at[0] = 30
+        with self.assertRaises(Crash):
+            flow.run({'n': 40, 'big': Counted()})
+        self.assertEqual(Counted.pickles, 1)
+
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['squares'], {i: i * i for i in range(40)})
+        self.assertEqual(runs, list(range(40)))
+
+    def test_graph_mismatch(self):
+        """
+        测试用不同流程图的检查点恢复时报错
+        """
+        flow = Squares(start=ItemNode())
+        flow.checkpoint = Checkpoint(self.path)
+        crash_at[0] = 1
+        with self.assertRaises(Crash):
+            flow.run({'n': 3})
+
+        other = Flow(start=StepNode('a'))
+        other.checkpoint = Checkpoint(self.path)
+        with self.assertRaises(ValueError):
+            other.run({})
+
+    def test_resume_async_parallel_batch_flow(self):
+        """
+        测试异步并行批处理流程崩溃后只运行未完成的批次
+        """
+        class AsyncSquares(AsyncParallelBatchFlow):
+            async def prep_async(self, shared_storage):
+                return [{'i': i} for i in range(shared_storage['n'])]
+
+        flow = AsyncSquares(start=AsyncFlow(start=AsyncItemNode()), max_concurrency=2)
+        flow.checkpoint = Checkpoint(self.path)
+        crash_at[0] = 5
+        with self.assertRaises(Crash):
+            asyncio.run(flow.run_async({'n': 8}))
+        done = set(runs)
+
+        runs.clear()
+        shared_storage = {}
+        asyncio.run(flow.run_async(shared_storage))
+        self.assertEqual(shared_storage['squares'], {i: i * i for i in range(8)})
+        self.assertTrue(done.isdisjoint(runs))
+        self.assertFalse(flow.checkpoint.exists())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import asyncio
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow, FanOutFlow, AsyncFanOutFlow
+
+class Branch(Node):
+    # 阻塞 delay 秒后写入 shared[name]，并记录看到的 shared['seen']
+    def __init__(self, name, delay=0.1):
+        super().__init__()
+        self.name, self.delay = name, delay
+
+    def prep(self, shared_storage):
+        return shared_storage.get('seen')
+
+    def exec(self, prep_res):
+        time.sleep(self.delay)
+        return prep_res
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage[self.name] = exec_result
+        shared_storage['seen'] = self.name
+
+class AsyncBranch(AsyncNode):
+    def __init__(self, name, delay=0.1):
+        super().__init__()
+        self.name, self.delay = name, delay
+
+    async def exec_async(self, prep_res):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            cancelled.append(self.name)
+            raise
+
+    async def post_async(self, shared_storage, prep_result, exec_result):
+        shared_storage[self.name] = self.params.get('tag', True)
+
+class Failing(Node):
+    def exec(self, prep_res):
+        raise ValueError("branch failed")
+
+class Done(Node):
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['done'] = True
+
+cancelled = []
+
+class TestFanOutFlow(unittest.TestCase):
+    def test_branches_run_concurrently_and_merge(self):
+        """
+        测试各分支同时运行、互相看不到对方的修改，结束后合并回 shared，之后继续运行后继节点
+        """
+        fan = FanOutFlow(Branch('payment'), Branch('inventory'), Branch('shipping'))
+        fan >> Done()
+        shared_storage = {'seen': 'start'}
+        start = time.monotonic()
+        Flow(start=fan).run(shared_storage)
+        self.assertLess(time.monotonic() - start, 0.25)
+        self.assertEqual([shared_storage[k] for k in ('payment', 'inventory', 'shipping')], ['start'] * 3)
+        # 多个分支写入同一个键时，后面的分支覆盖前面的
+        self.assertEqual(shared_storage['seen'], 'shipping')
+        self.assertTrue(shared_storage['done'])
+
+    def test_nested_flow_branch(self):
+        """
+        测试分支可以是多步的流程
+        """
+        a, b = Branch('a', 0), Branch('b', 0)
+        a >> b
+        shared_storage = {}
+        FanOutFlow(Flow(start=a), Branch('c', 0)).run(shared_storage)
+        self.assertEqual(shared_storage['b'], 'a')
+        self.assertIsNone(shared_storage['c'])
+
+    def test_first_n_and_reducer(self):
+        """
+        测试只等待最先完成的分支，未完成的分支不参与合并；自定义合并函数收到按分支顺序排列的修改
+        """
+        seen = []
+        def reduce(shared_storage, updates):
+            seen.extend(updates)
+            shared_storage['winners'] = [next(iter(u)) for u in updates if u]
+
+        fan = FanOutFlow(Branch('slow', 1), Branch('fast', 0.01), first=1, reduce=reduce)
+        shared_storage = {}
+        start = time.monotonic()
+        fan.run(shared_storage)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertIsNone(seen[0])
+        self.assertEqual(shared_storage['winners'], ['fast'])
+        self.assertNotIn('slow', shared_storage)
+
+    def test_branch_error(self):
+        """
+        测试分支的异常会传递给调用方，shared 不会被部分合并
+        """
+        shared_storage = {}
+        with self.assertRaises(ValueError):
+            FanOutFlow(Branch('ok', 0), Failing()).run(shared_storage)
+        self.assertEqual(shared_storage, {})
+
+class TestAsyncFanOutFlow(unittest.TestCase):
+    def setUp(self):
+        cancelled.clear()
+
+    def test_latency_is_slowest_branch(self):
+        """
+        测试异步扇出的总耗时接近最慢的分支，分支继承流程参数
+        """
+        fan = AsyncFanOutFlow(AsyncBranch('a', 0.1), AsyncBranch('b', 0.1), Branch('c', 0))
+        fan >> Done()
+        flow = AsyncFlow(start=fan)
+        flow.set_params({'tag': 'x'})
+        shared_storage = {}
+        start = time.monotonic()
+        asyncio.run(flow.run_async(shared_storage))
+        self.assertLess(time.monotonic() - start, 0.19)
+        self.assertEqual((shared_storage['a'], shared_storage['b']), ('x', 'x'))
+        self.assertTrue(shared_storage['done'])
+
+    def test_first_n_cancels_rest(self):
+        """
+        测试达到 first 个分支后取消其余分支
+        """
+        fan = AsyncFanOutFlow(AsyncBranch('slow', 5), AsyncBranch('fast', 0.01), AsyncBranch('fast2', 0.02), first=2)
+        shared_storage = {}
+        asyncio.run(fan.run_async(shared_storage))
+        self.assertEqual(sorted(k for k in shared_storage), ['fast', 'fast2'])
+        self.assertEqual(cancelled, ['slow'])
+
+if __name__ == '__main__':
+    unittest.main()
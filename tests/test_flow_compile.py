@@ -0,0 +1,215 @@
+import unittest
+import asyncio
+import copy
+import warnings
+import sys
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import pocketflow
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow, BatchFlow
+
+class VisitNode(Node):
+    # 记录访问次数的节点：实例属性只在本次执行的副本上修改
+    def __init__(self, name, limit=3):
+        super().__init__()
+        self.name, self.limit, self.visits = name, limit, 0
+
+    def prep(self, shared_storage):
+        self.visits += 1
+        shared_storage.setdefault('trace', []).append((self.name, self.visits, self.params.get('tag')))
+        return len(shared_storage['trace'])
+
+    def post(self, shared_storage, prep_result, exec_result):
+        return "loop" if prep_result < self.limit else "done"
+
+class AsyncVisitNode(AsyncNode):
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+    async def prep_async(self, shared_storage):
+        shared_storage.setdefault('trace', []).append(self.name)
+
+class TestFlowCompile(unittest.TestCase):
+    def test_per_visit_isolation(self):
+        """
+        测试每次访问节点都使用一份新的副本，实例属性不会泄漏到模板或下一次访问
+        """
+        a, b = VisitNode('a', limit=4), VisitNode('b', limit=4)
+        a - "loop" >> b
+        b - "loop" >> a
+        flow = Flow(start=a)
+        flow.set_params({'tag': 'x'})
+        shared_storage = {}
+        last_action = flow.run(shared_storage)
+
+        self.assertEqual(shared_storage['trace'], [('a', 1, 'x'), ('b', 1, 'x'), ('a', 1, 'x'), ('b', 1, 'x')])
+        self.assertEqual(last_action, "done")
+        self.assertEqual(a.visits, 0)
+        self.assertEqual(a.params, {})
+
+    def test_explicit_compile(self):
+        """
+        测试 compile() 返回流程本身，并可重复运行
+        """
+        a = VisitNode('a', limit=1)
+        flow = Flow(start=a).compile()
+        self.assertIsInstance(flow, Flow)
+        for _ in range(2):
+            shared_storage = {}
+            flow.run(shared_storage)
+            self.assertEqual(shared_storage['trace'], [('a', 1, None)])
+
+    def test_recompiles_after_graph_change(self):
+        """
+        测试运行后修改流程图（next/start）会自动重新编译
+        """
+        a, b, c = VisitNode('a', limit=9), VisitNode('b', limit=9), VisitNode('c', limit=9)
+        flow = Flow(start=a)
+        flow.run({})
+
+        a - "loop" >> b
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual([t[0] for t in shared_storage['trace']], ['a', 'b'])
+
+        flow.start(c)
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual([t[0] for t in shared_storage['trace']], ['c'])
+
+    def test_direct_successor_edits(self):
+        """
+        测试直接修改 successors 字典也会重新编译；修改其他流程图不会使该流程重新编译
+        """
+        a, b, c = VisitNode('a', limit=9), VisitNode('b', limit=9), VisitNode('c', limit=9)
+        a.successors['loop'] = b
+        flow = Flow(start=a)
+        flow.run({})
+        state = flow._plan.state
+
+        VisitNode('x') >> VisitNode('y')
+        flow.run({})
+        self.assertIs(flow._plan.state, state)
+
+        a.successors['loop'] = c
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual([t[0] for t in shared_storage['trace']], ['a', 'c'])
+        del a.successors['loop']
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual([t[0] for t in shared_storage['trace']], ['a'])
+
+    def test_graph_checked_once_per_run(self):
+        """
+        测试一次运行中每个执行计划只检查一次后继表，批处理的每组参数和每次进入嵌套流程时不再重复检查；
+        运行中通过 next() 修改流程图后，之后的批次使用重新编译的执行计划
+        """
+        class Items(BatchFlow):
+            def prep(self, shared_storage):
+                return [{'tag': i} for i in range(20)]
+
+        a = VisitNode('a', limit=0)
+        a - "done" >> VisitNode('b', limit=0)
+        flow = Items(start=Flow(start=a))
+        flow.run({})
+        with mock.patch.object(pocketflow, "_stale", wraps=pocketflow._stale) as stale:
+            shared_storage = {}
+            flow.run(shared_storage)
+        self.assertEqual(stale.call_count, 2)
+        self.assertEqual(len(shared_storage['trace']), 40)
+
+        class Grow(Node):
+            # 运行时在自己后面接上一个新节点
+            def post(self, shared_storage, prep_result, exec_result):
+                if not self.successors:
+                    self.next(VisitNode('added'))
+        shared_storage = {}
+        Items(start=Flow(start=Grow())).run(shared_storage)
+        self.assertEqual([t[2] for t in shared_storage['trace']], list(range(1, 20)))
+
+    def test_invalid_successor(self):
+        """
+        测试编译时检查后继是否为节点
+        """
+        a = VisitNode('a')
+        a.successors['loop'] = "not a node"
+        with self.assertRaises(TypeError):
+            Flow(start=a).compile()
+
+    def test_custom_copy_respected(self):
+        """
+        测试定义了 __copy__ 的节点仍通过 copy.copy 复制
+        """
+        copies = []
+
+        class CustomCopyNode(VisitNode):
+            def __copy__(self):
+                copies.append(self.name)
+                clone = VisitNode.__new__(CustomCopyNode)
+                clone.__dict__.update(self.__dict__)
+                return clone
+
+        flow = Flow(start=CustomCopyNode('a', limit=1))
+        flow.run({})
+        self.assertEqual(copies, ['a'])
+
+    def test_copied_flow_shares_plan(self):
+        """
+        测试嵌套流程的浅拷贝共享同一个已编译的执行计划
+        """
+        inner = Flow(start=VisitNode('a', limit=1))
+        outer = Flow(start=inner)
+        outer.run({})
+        state = inner._plan.state
+        copy.copy(inner).run({})
+        self.assertIs(inner._plan.state, state)
+
+    def test_no_successor_warning_inside_flow(self):
+        """
+        测试流程内部运行节点时不再发出 "Node won't run successors" 警告
+        """
+        a, b = VisitNode('a', limit=2), VisitNode('b', limit=2)
+        a - "loop" >> b
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            Flow(start=a).run({})
+        self.assertEqual(len(w), 0)
+
+    def test_custom_run_is_called(self):
+        """
+        测试重写了 run() 的节点和嵌套流程在流程中仍通过 run() 运行
+        """
+        class Wrapped(VisitNode):
+            def run(self, shared):
+                shared.setdefault('wrapped', []).append(self.name)
+                return super().run(shared)
+        class WrappedFlow(Flow):
+            def run(self, shared):
+                shared.setdefault('wrapped', []).append('flow')
+                return super().run(shared)
+        a = Wrapped('a', limit=1)
+        a - "done" >> WrappedFlow(start=Wrapped('b', limit=1))
+        shared_storage = {}
+        Flow(start=a).run(shared_storage)
+        self.assertEqual(shared_storage['wrapped'], ['a', 'flow', 'b'])
+        shared_storage = {}
+        asyncio.run(AsyncFlow(start=a).run_async(shared_storage))
+        self.assertEqual(shared_storage['wrapped'], ['a', 'flow', 'b'])
+
+    def test_async_flow(self):
+        """
+        测试 AsyncFlow 使用编译后的执行计划，同步与异步节点混合运行
+        """
+        a, b, c = AsyncVisitNode('a'), VisitNode('b', limit=2), AsyncVisitNode('c')
+        a >> b
+        b - "done" >> c
+        shared_storage = {}
+        asyncio.run(AsyncFlow(start=a).run_async(shared_storage))
+        self.assertEqual(shared_storage['trace'], ['a', ('b', 1, None), 'c'])
+
+if __name__ == '__main__':
+    unittest.main()
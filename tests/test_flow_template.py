@@ -0,0 +1,126 @@
+import unittest
+import asyncio
+import pickle
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow, FlowTemplate, FlowScheduler, AsyncFlowScheduler
+
+class Remember(Node):
+    # 把问题保存在节点属性中，稍后的阶段再读取：并发的运行不能互相覆盖
+    def prep(self, shared_storage):
+        self.question = shared_storage['question']
+        return self.question
+
+    def exec(self, question):
+        time.sleep(0.005)
+        assert self.question == question
+        return question.upper()
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['answer'] = exec_res
+        return "check"
+
+class Check(Node):
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['checked'] = self.params.get('user')
+
+class AsyncAnswer(AsyncNode):
+    async def prep_async(self, shared_storage):
+        return shared_storage['question']
+
+    async def exec_async(self, question):
+        await asyncio.sleep(0.01)
+        return f"{self.params['user']}:{question}"
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        shared_storage['answer'] = exec_res
+
+def create_flow():
+    remember = Remember()
+    remember - "check" >> Check()
+    return Flow(start=Flow(start=remember))
+
+class TestFlowTemplate(unittest.TestCase):
+    def test_concurrent_runs_are_isolated(self):
+        """
+        测试多个线程同时运行同一个模板，节点属性与参数互不影响
+        """
+        template = FlowTemplate(create_flow())
+        def handle(i):
+            shared_storage = {'question': f"q{i}"}
+            template.run(shared_storage, params={'user': i})
+            return shared_storage
+        with ThreadPoolExecutor(8) as ex:
+            results = list(ex.map(handle, range(40)))
+        self.assertEqual([r['answer'] for r in results], [f"Q{i}" for i in range(40)])
+        self.assertEqual([r['checked'] for r in results], list(range(40)))
+        self.assertEqual(template.flow.params, {})
+
+    def test_async_runs(self):
+        """
+        测试多个任务同时运行异步模板
+        """
+        template = FlowTemplate(AsyncFlow(start=AsyncAnswer()))
+        async def main():
+            shared = [{'question': f"q{i}"} for i in range(20)]
+            await asyncio.gather(*(template.run_async(s, params={'user': i}) for i, s in enumerate(shared)))
+            return [s['answer'] for s in shared]
+        self.assertEqual(asyncio.run(main()), [f"{i}:q{i}" for i in range(20)])
+
+    def test_schedulers_run_templates(self):
+        """
+        测试同步和异步调度器都可以运行同步流程和异步流程的模板；同步流程的模板没有 run_async
+        """
+        sync_template, async_template = FlowTemplate(create_flow()), FlowTemplate(AsyncFlow(start=AsyncAnswer()))
+        self.assertFalse(hasattr(sync_template, "run_async"))
+        self.assertIsInstance(async_template, FlowTemplate)
+        with FlowScheduler(workers=2) as scheduler:
+            shared = [{'question': "a"}, {'question': "b", 'user': 1}]
+            scheduler.run(sync_template, shared[0])
+            async_template.flow.params = {'user': 1}
+            scheduler.run(async_template, shared[1])
+        self.assertEqual([s['answer'] for s in shared], ["A", "1:b"])
+
+        async def main():
+            scheduler = AsyncFlowScheduler(workers=2)
+            shared = [{'question': "c"}, {'question': "d"}]
+            await asyncio.gather(scheduler.submit(sync_template, shared[0]), scheduler.submit(async_template, shared[1]))
+            return [s['answer'] for s in shared]
+        self.assertEqual(asyncio.run(main()), ["C", "1:d"])
+
+    def test_graph_is_frozen(self):
+        """
+        测试模板中的流程图不能再修改，修改其他流程图也不会使模板重新编译
+        """
+        flow = create_flow()
+        template = FlowTemplate(flow)
+        inner = flow.start_node
+        with self.assertRaises(TypeError):
+            inner.start_node >> Check()
+        with self.assertRaises(TypeError):
+            inner.start(Check())
+        with self.assertRaises(TypeError):
+            inner.start_node.successors['other'] = Check()
+        steps = inner._plan.state[3]
+        create_flow()
+        template.run({'question': 'x'})
+        self.assertIs(inner._plan.state[3], steps)
+
+    def test_pickle_and_type_check(self):
+        """
+        测试模板中的节点可以 pickle（后继表还原为普通字典），模板只接受流程
+        """
+        flow = create_flow()
+        FlowTemplate(flow)
+        copy = pickle.loads(pickle.dumps(flow.start_node.start_node))
+        self.assertEqual(list(copy.successors), ['check'])
+        copy >> Check()
+        with self.assertRaises(TypeError):
+            FlowTemplate(Remember())
+
+if __name__ == '__main__':
+    unittest.main()
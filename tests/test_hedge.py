@@ -0,0 +1,132 @@
+import unittest
+import asyncio
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import AsyncNode, AsyncParallelBatchNode, HedgePolicy, RateLimiter
+
+class CallLLM(AsyncNode):
+    # 模拟远程调用：第 n 次调用的延迟为 latencies[n]（超出列表时为 10ms）；记录被取消的调用
+    def __init__(self, latencies=(), fail=(), max_retries=1):
+        super().__init__(max_retries)
+        self.latencies, self.fail, self.calls, self.cancelled = list(latencies), set(fail), 0, 0
+
+    async def exec_async(self, prep_res):
+        n = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latencies[n] if n < len(self.latencies) else 0.01)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if n in self.fail:
+            raise ConnectionError(f"call {n} failed")
+        return f"{prep_res}:{n}"
+
+def warm(node, n):
+    # 积累 n 次正常调用的延迟样本
+    async def main():
+        for _ in range(n):
+            await node._exec("warm")
+    asyncio.run(main())
+
+class TestHedge(unittest.TestCase):
+    def test_slow_call_is_hedged(self):
+        """
+        测试调用超过历史延迟的分位数后发起对冲，采用先完成的结果并取消原调用
+        """
+        node = CallLLM(latencies=[0.01] * 5 + [1.0])
+        node.hedge_policy = HedgePolicy(min_samples=5, burst=1, max_extra=0.5)
+        warm(node, 5)
+        start = time.monotonic()
+        res = asyncio.run(node._exec("q"))
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertEqual(res, "q:6")
+        self.assertEqual(node.cancelled, 1)
+        stats = node.hedge_policy.stats()
+        self.assertEqual((stats['calls'], stats['hedged'], stats['wins']), (6, 1, 1))
+        self.assertAlmostEqual(stats['win_rate'], 1.0)
+
+    def test_no_hedge_without_history(self):
+        """
+        测试样本不足时不对冲
+        """
+        node = CallLLM(latencies=[0.1])
+        node.hedge_policy = HedgePolicy(min_samples=5, burst=5, max_extra=1)
+        self.assertEqual(asyncio.run(node._exec("q")), "q:0")
+        self.assertEqual(node.calls, 1)
+        self.assertEqual(node.hedge_policy.stats()['hedged'], 0)
+
+    def test_budget_caps_extra_load(self):
+        """
+        测试对冲预算限制额外调用的数量，超出预算时放弃对冲
+        """
+        class Slow(AsyncNode):
+            calls = 0
+            async def exec_async(self, prep_res):
+                Slow.calls += 1
+                await asyncio.sleep(0.005 if prep_res == "fast" else 0.02)
+        node = Slow()
+        node.hedge_policy = HedgePolicy(min_samples=5, percentile=0.1, max_extra=0.1, burst=1)
+        async def main():
+            for _ in range(20):
+                await node._exec("fast")
+            for _ in range(20):
+                await node._exec("slow")
+        asyncio.run(main())
+        stats = node.hedge_policy.stats()
+        self.assertEqual(stats['calls'], 40)
+        self.assertLessEqual(stats['hedged'], 0.1 * stats['calls'] + 1)
+        self.assertGreater(stats['hedged'], 0)
+        self.assertGreater(stats['skipped'], 0)
+        self.assertEqual(Slow.calls, stats['calls'] + stats['hedged'])
+
+    def test_failures(self):
+        """
+        测试原调用在对冲后失败时采用对冲的结果；两次调用都失败时按节点的重试处理
+        """
+        node = CallLLM(latencies=[0.01] * 5 + [0.05, 0.1], fail=[5])
+        node.hedge_policy = HedgePolicy(min_samples=5, burst=1, max_extra=1)
+        warm(node, 5)
+        self.assertEqual(asyncio.run(node._exec("q")), "q:6")
+
+        node = CallLLM(latencies=[0.01] * 5 + [0.05, 0.03], fail=[5, 6], max_retries=2)
+        node.hedge_policy = HedgePolicy(min_samples=5, burst=1, max_extra=1)
+        warm(node, 5)
+        self.assertEqual(asyncio.run(node._exec("q")), "q:7")
+
+    def test_rate_limit_and_batch(self):
+        """
+        测试限流器没有额度时不对冲；并行批处理中慢调用被对冲，整批不再被它拖慢
+        """
+        node = CallLLM(latencies=[0.01] * 5 + [0.3])
+        node.hedge_policy = HedgePolicy(min_samples=5, burst=1, max_extra=1)
+        warm(node, 5)
+        node.rate_limit = RateLimiter(rps=1, burst=1)
+        self.assertEqual(asyncio.run(node._exec("q")), "q:5")
+        self.assertEqual(node.hedge_policy.stats()['skipped'], 1)
+
+        class Batch(AsyncParallelBatchNode):
+            hedge_policy = HedgePolicy(min_samples=5, max_extra=0.2, burst=2)
+            slow = {7}
+            async def prep_async(self, shared_storage):
+                return shared_storage['items']
+            async def exec_async(self, item):
+                slow = item in self.slow
+                self.slow.discard(item)
+                await asyncio.sleep(1.0 if slow else 0.01)
+                return item
+            async def post_async(self, shared_storage, prep_res, exec_res):
+                shared_storage['results'] = exec_res
+        batch = Batch()
+        asyncio.run(batch.run_async({'items': list(range(5))}))
+        shared_storage = {'items': list(range(5, 15))}
+        start = time.monotonic()
+        asyncio.run(batch.run_async(shared_storage))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(shared_storage['results'], list(range(5, 15)))
+
+if __name__ == '__main__':
+    unittest.main()
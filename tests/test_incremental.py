@@ -0,0 +1,240 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow, Incremental, LRUCache, Tracer
+
+# 每个节点类 exec 被调用的次数
+calls = {}
+
+def count(node):
+    calls[type(node).__name__] = calls.get(type(node).__name__, 0) + 1
+
+class Chunk(Node):
+    def prep(self, shared_storage):
+        return shared_storage['document']
+
+    def exec(self, document):
+        count(self)
+        return document.split(".")
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['chunks'] = exec_res
+
+class Embed(Node):
+    def prep(self, shared_storage):
+        return shared_storage['chunks']
+
+    def exec(self, chunks):
+        count(self)
+        return [len(c) for c in chunks]
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['embeddings'] = exec_res
+
+class Answer(Node):
+    def prep(self, shared_storage):
+        return shared_storage['embeddings'], self.params['prompt']
+
+    def exec(self, prep_res):
+        count(self)
+        return f"{prep_res[1]}: {sum(prep_res[0])}"
+
+    def post(self, shared_storage, prep_res, exec_res):
+        # post 读取 shared 中的 history 并原地追加
+        shared_storage['history'].append(exec_res)
+        shared_storage['answer'] = exec_res
+        shared_storage.pop('draft', None)
+        return "done"
+
+class Ask(Node):
+    # prompt 由构造函数传入，保存为实例属性
+    def __init__(self, prompt):
+        super().__init__()
+        self.prompt = prompt
+
+    def prep(self, shared_storage):
+        return shared_storage['document']
+
+    def exec(self, document):
+        count(self)
+        return f"{self.prompt}: {document}"
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['answer'] = exec_res
+
+def create_flow(prompt="Summarize"):
+    chunk, embed, answer = Chunk(), Embed(), Answer()
+    chunk >> embed >> answer
+    flow = Flow(start=chunk)
+    flow.set_params({'prompt': prompt})
+    return flow
+
+def new_shared(document="Pocket flow. Is small. And fast"):
+    return {'document': document, 'history': [], 'draft': "x"}
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_rerun_restores_outputs(self):
+        """
+        测试输入未变时再次运行不执行任何节点，shared 的内容（包括原地修改和删除）与第一次运行相同
+        """
+        inc = Incremental(LRUCache())
+        first = new_shared()
+        with inc:
+            create_flow().run(first)
+        second = new_shared()
+        with inc:
+            create_flow().run(second)
+        self.assertEqual(calls, {'Chunk': 1, 'Embed': 1, 'Answer': 1})
+        self.assertEqual(second, first)
+        self.assertNotIn('draft', second)
+        self.assertEqual(second['history'], ["Summarize: 29"])
+        self.assertEqual(inc.stats()['hits'], 3)
+
+    def test_only_changed_nodes_rerun(self):
+        """
+        测试只修改最后一个节点的参数时前面的节点被跳过；修改文档时所有节点重新运行
+        """
+        inc = Incremental(LRUCache())
+        with inc:
+            create_flow().run(new_shared())
+            shared_storage = new_shared()
+            create_flow("Translate").run(shared_storage)
+        self.assertEqual(calls, {'Chunk': 1, 'Embed': 1, 'Answer': 2})
+        self.assertEqual(shared_storage['answer'], "Translate: 29")
+
+        with inc:
+            create_flow().run(new_shared("Another. Document"))
+        self.assertEqual(calls, {'Chunk': 2, 'Embed': 2, 'Answer': 3})
+
+    def test_post_reads_are_checked(self):
+        """
+        测试 post 读取的值变化时节点重新运行，即使 prep_res 相同
+        """
+        inc = Incremental(LRUCache())
+        with inc:
+            create_flow().run(new_shared())
+            shared_storage = new_shared()
+            shared_storage['history'] = ["earlier"]
+            create_flow().run(shared_storage)
+        self.assertEqual(calls['Answer'], 2)
+        self.assertEqual(shared_storage['history'], ["earlier", "Summarize: 29"])
+
+    def test_code_change_invalidates_node(self):
+        """
+        测试修改节点代码中的常量（例如 prompt）后该节点重新运行
+        """
+        def make(version):
+            # 模拟编辑同一个节点类的代码：两个版本的类名和模块相同，只有 exec 中的常量不同
+            if version == 1:
+                def exec(self, prep_res):
+                    count(self)
+                    return "Summarize briefly"
+            else:
+                def exec(self, prep_res):
+                    count(self)
+                    return "Summarize in detail"
+            def post(self, shared_storage, prep_res, exec_res):
+                shared_storage['answer'] = exec_res
+            return type("Prompt", (Node,), {'exec': exec, 'post': post, '__module__': __name__})
+        inc = Incremental(LRUCache())
+        with inc:
+            for version in (1, 1, 2):
+                shared_storage = {}
+                Flow(start=make(version)()).run(shared_storage)
+        self.assertEqual(calls, {'Prompt': 2})
+        self.assertEqual(shared_storage['answer'], "Summarize in detail")
+
+    def test_instance_attributes_in_key(self):
+        """
+        测试构造函数传入的实例属性参与键：修改 prompt 后节点重新运行，相同 prompt 时跳过；无法 pickle 的实例属性使节点不被记录
+        """
+        with Incremental(LRUCache()) as inc:
+            answers = []
+            for prompt in ["Summarize", "Translate", "Translate"]:
+                shared_storage = new_shared()
+                Flow(start=Ask(prompt)).run(shared_storage)
+                answers.append(shared_storage['answer'])
+        self.assertEqual([a.split(":")[0] for a in answers], ["Summarize", "Translate", "Translate"])
+        self.assertEqual(calls, {'Ask': 2})
+        self.assertEqual(inc.stats()['hits'], 1)
+
+        with Incremental(LRUCache()) as inc:
+            for _ in range(2):
+                node = Ask("Summarize")
+                node.lock = threading.Lock()
+                Flow(start=node).run(new_shared())
+        self.assertEqual(calls, {'Ask': 4})
+        self.assertEqual(inc.stats()['uncacheable'], 2)
+
+    def test_runtime_attributes_not_in_key(self):
+        """
+        测试节点上设置的 cache、executor 等运行时配置（无法 pickle）不参与键，节点仍被记录和跳过
+        """
+        with Incremental(LRUCache()) as inc, ThreadPoolExecutor(1) as executor:
+            for _ in range(3):
+                node = Ask("Summarize")
+                node.cache, node.executor = LRUCache(), executor
+                Flow(start=node).run(new_shared())
+        self.assertEqual(calls, {'Ask': 1})
+        self.assertEqual((inc.stats()['hits'], inc.stats()['uncacheable']), (2, 0))
+
+    def test_disk_cache_and_always_run(self):
+        """
+        测试记录保存在文件中可跨多次运行复用；always_run 的节点总是运行
+        """
+        class Notify(Answer):
+            always_run = True
+        path = os.path.join(tempfile.mkdtemp(), "build.db")
+        for _ in range(2):
+            chunk, notify = Chunk(), Notify()
+            chunk >> Embed() >> notify
+            flow = Flow(start=chunk)
+            flow.set_params({'prompt': "p"})
+            inc = Incremental(path)
+            with inc:
+                flow.run(new_shared())
+            inc.cache.close()
+        self.assertEqual(calls, {'Chunk': 1, 'Embed': 1, 'Notify': 2})
+        self.assertEqual(inc.stats(), {'hits': 2, 'misses': 0, 'uncacheable': 1, 'saved': inc.saved})
+
+    def test_async_flow_and_tracing(self):
+        """
+        测试异步流程中的异步节点与同步节点；启用追踪时恢复记录为 restore 事件
+        """
+        class AsyncEmbed(AsyncNode):
+            async def prep_async(self, shared_storage):
+                return shared_storage['chunks']
+
+            async def exec_async(self, chunks):
+                count(self)
+                return [len(c) for c in chunks]
+
+            async def post_async(self, shared_storage, prep_res, exec_res):
+                shared_storage['embeddings'] = exec_res
+
+        def create():
+            chunk = Chunk()
+            chunk >> AsyncEmbed()
+            return AsyncFlow(start=chunk)
+        inc = Incremental(LRUCache())
+        with inc:
+            asyncio.run(create().run_async(new_shared()))
+            shared_storage = new_shared()
+            with Tracer() as tracer:
+                asyncio.run(create().run_async(shared_storage))
+        self.assertEqual(calls, {'Chunk': 1, 'AsyncEmbed': 1})
+        self.assertEqual(shared_storage['embeddings'], [11, 9, 9])
+        self.assertEqual([e['node'] for e in tracer.events if e['name'] == "restore"], ['Chunk', 'AsyncEmbed'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import unittest
+import asyncio
+import threading
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Flow, AsyncFlow, AsyncParallelBatchFlow, MicroBatchNode, AsyncMicroBatchNode
+
+class Embed(MicroBatchNode):
+    # 模拟按数组收费的嵌入 API：记录每次调用的批次
+    def __init__(self, fail_first=0, **kwargs):
+        super().__init__(**kwargs)
+        self.calls, self.fail_first = [], fail_first
+
+    def prep(self, shared_storage):
+        return shared_storage['text']
+
+    def exec_batch(self, items):
+        self.calls.append(list(items))
+        if self.fail_first:
+            self.fail_first -= 1
+            raise ConnectionError("temporary")
+        return [len(t) for t in items]
+
+    def exec_fallback(self, prep_res, exc):
+        return -1
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['embedding'] = exec_result
+
+class AsyncEmbed(AsyncMicroBatchNode):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    async def prep_async(self, shared_storage):
+        return shared_storage.get('text', self.params.get('text'))
+
+    async def exec_batch_async(self, items):
+        self.calls.append(list(items))
+        await asyncio.sleep(0.01)
+        return [t.upper() for t in items]
+
+    async def post_async(self, shared_storage, prep_result, exec_result):
+        shared_storage.setdefault('results', {})[prep_result] = exec_result
+
+def run_concurrently(flow, texts):
+    # 在多个线程中同时运行同一个流程，每个调用方使用自己的 shared
+    def one(text):
+        shared_storage = {'text': text}
+        flow.run(shared_storage)
+        return shared_storage['embedding']
+    with ThreadPoolExecutor(len(texts)) as ex:
+        return list(ex.map(one, texts))
+
+class TestMicroBatchNode(unittest.TestCase):
+    def test_coalesces_concurrent_callers(self):
+        """
+        测试多个线程的调用被合并为少量 exec_batch，每个调用方拿到自己的结果
+        """
+        node = Embed(max_batch_size=8, max_wait_ms=100)
+        texts = ['x' * i for i in range(1, 21)]
+        self.assertEqual(run_concurrently(Flow(start=node), texts), list(range(1, 21)))
+        self.assertLessEqual(len(node.calls), 5)
+        self.assertTrue(all(len(c) <= 8 for c in node.calls))
+        self.assertEqual(sorted(sum(node.calls, [])), sorted(texts))
+
+    def test_single_caller_flushes_after_wait(self):
+        """
+        测试只有一个调用方时等待 max_wait_ms 后单独执行
+        """
+        node = Embed(max_wait_ms=1)
+        shared_storage = {'text': 'abc'}
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['embedding'], 3)
+        self.assertEqual(node.calls, [['abc']])
+
+    def test_retry_and_fallback(self):
+        """
+        测试整批失败时重试，重试用完后每个调用方各自调用 exec_fallback
+        """
+        node = Embed(fail_first=1, max_retries=2, max_wait_ms=50)
+        self.assertEqual(run_concurrently(Flow(start=node), ['a', 'bb']), [1, 2])
+
+        node = Embed(fail_first=5, max_retries=2, max_wait_ms=50)
+        self.assertEqual(run_concurrently(Flow(start=node), ['a', 'bb']), [-1, -1])
+
+    def test_wrong_result_count(self):
+        """
+        测试 exec_batch 返回的结果数与项目数不一致时报错
+        """
+        class Broken(Embed):
+            def exec_batch(self, items):
+                return []
+            def exec_fallback(self, prep_res, exc):
+                raise exc
+
+        with self.assertRaises(ValueError):
+            Broken(max_wait_ms=1).run({'text': 'a'})
+
+class TestAsyncMicroBatchNode(unittest.TestCase):
+    def test_coalesces_concurrent_flows(self):
+        """
+        测试并发运行的异步流程共享同一个收集器，合并为少量批次
+        """
+        node = AsyncEmbed(max_batch_size=4, max_wait_ms=20)
+        flow = AsyncFlow(start=node)
+        async def run():
+            shared = [{'text': f"t{i}"} for i in range(10)]
+            await asyncio.gather(*(flow.run_async(s) for s in shared))
+            return shared
+        shared = asyncio.run(run())
+        self.assertEqual([s['results'][f"t{i}"] for i, s in enumerate(shared)], [f"T{i}" for i in range(10)])
+        self.assertEqual([len(c) for c in node.calls], [4, 4, 2])
+
+    def test_parallel_batch_flow_items(self):
+        """
+        测试并行批处理流程中的各个批次被合并为一次调用
+        """
+        class PerText(AsyncParallelBatchFlow):
+            async def prep_async(self, shared_storage):
+                return [{'text': t} for t in shared_storage['texts']]
+
+        node = AsyncEmbed(max_batch_size=64, max_wait_ms=20)
+        shared_storage = {'texts': ['a', 'b', 'c']}
+        asyncio.run(PerText(start=node).run_async(shared_storage))
+        self.assertEqual(shared_storage['results'], {'a': 'A', 'b': 'B', 'c': 'C'})
+        self.assertEqual(node.calls, [['a', 'b', 'c']])
+
+    def test_event_loops_in_threads(self):
+        """
+        测试同一个节点在多个线程各自的事件循环中运行时，每个事件循环的调用方各自组成批次，都能拿到结果
+        """
+        node = AsyncEmbed(max_batch_size=64, max_wait_ms=50)
+        flow, results, barrier = AsyncFlow(start=node), {}, threading.Barrier(2)
+        def worker(texts):
+            async def run():
+                shared = [{'text': t} for t in texts]
+                await asyncio.gather(*(flow.run_async(s) for s in shared))
+                return [s['results'][t] for s, t in zip(shared, texts)]
+            barrier.wait()
+            results[texts[0]] = asyncio.run(run())
+        threads = [threading.Thread(target=worker, args=(texts,), daemon=True) for texts in (['a', 'b'], ['c', 'd'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(results, {'a': ['A', 'B'], 'c': ['C', 'D']})
+        self.assertEqual(sorted(node.calls), [['a', 'b'], ['c', 'd']])
+
+    def test_cancelled_caller_does_not_break_batch(self):
+        """
+        测试某个调用方被取消时，同一批次的其他调用方仍能拿到结果
+        """
+        node = AsyncEmbed(max_wait_ms=20)
+        async def run():
+            loser = asyncio.ensure_future(node._exec('a'))
+            winner = asyncio.ensure_future(node._exec('b'))
+            await asyncio.sleep(0)
+            loser.cancel()
+            return await winner
+        self.assertEqual(asyncio.run(run()), 'B')
+        self.assertEqual(node.calls, [['a', 'b']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import asyncio
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, AsyncFlow, AsyncPipelineFlow
+
+class Stage(AsyncNode):
+    # 每个项目耗时 delay 秒，把 fn 作用于项目
+    def __init__(self, fn, delay=0.01, workers=1):
+        super().__init__()
+        self.fn, self.delay, self.workers = fn, delay, workers
+
+    async def exec_async(self, item):
+        await asyncio.sleep(self.delay)
+        return self.fn(item)
+
+class SyncStage(Node):
+    def exec(self, item):
+        time.sleep(0.01)
+        return item * 10
+
+class Collect(AsyncPipelineFlow):
+    async def prep_async(self, shared_storage):
+        return shared_storage['source']
+
+    async def post_item_async(self, shared_storage, item, exec_res):
+        shared_storage.setdefault('out', []).append((item, exec_res))
+
+async def numbers(n):
+    for i in range(n):
+        yield i
+
+class TestAsyncPipelineFlow(unittest.TestCase):
+    def test_stages_overlap(self):
+        """
+        测试各阶段重叠运行：总耗时接近最慢阶段的耗时，而不是各阶段耗时之和
+        """
+        chunk, embed, index = Stage(lambda x: x + 1), Stage(lambda x: x * 2), Stage(str)
+        chunk >> embed >> index
+        shared_storage = {'source': range(20)}
+        start = time.monotonic()
+        asyncio.run(Collect(start=chunk).run_async(shared_storage))
+        self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual(shared_storage['out'], [(i, str((i + 1) * 2)) for i in range(20)])
+
+    def test_stage_workers(self):
+        """
+        测试为慢阶段设置多个工作协程，吞吐量随之提高
+        """
+        slow = Stage(lambda x: x, delay=0.05, workers=5)
+        fast = Stage(lambda x: x)
+        slow >> fast
+        shared_storage = {'source': numbers(20)}
+        start = time.monotonic()
+        asyncio.run(Collect(start=slow).run_async(shared_storage))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(sorted(r for _, r in shared_storage['out']), list(range(20)))
+
+    def test_backpressure_bounds_memory(self):
+        """
+        测试下游较慢时，队列满会使上游等待，同时在处理中的项目数受队列容量限制
+        """
+        started, finished, peak = [0], [0], [0]
+        def start_item(x):
+            started[0] += 1
+            peak[0] = max(peak[0], started[0] - finished[0])
+            return x
+        class Sink(Collect):
+            async def post_item_async(self, shared_storage, item, exec_res):
+                finished[0] += 1
+        load, save = Stage(start_item, delay=0), Stage(lambda x: x, delay=0.005)
+        load >> save
+        asyncio.run(Sink(start=load, queue_size=2).run_async({'source': range(50)}))
+        self.assertEqual(finished[0], 50)
+        # 两个队列各 2 个，加上每个阶段正在处理的 1 个
+        self.assertLessEqual(peak[0], 6)
+
+    def test_filter_and_sync_stage(self):
+        """
+        测试阶段返回 None 时丢弃项目，同步节点在线程池中运行，流水线可以嵌套在流程中
+        """
+        keep_even, scale = Stage(lambda x: x if x % 2 == 0 else None, delay=0), SyncStage()
+        keep_even >> scale
+        pipeline = Collect(start=keep_even)
+        shared_storage = {'source': range(6)}
+        asyncio.run(AsyncFlow(start=pipeline).run_async(shared_storage))
+        self.assertEqual(shared_storage['out'], [(0, 0), (2, 20), (4, 40)])
+
+    def test_error_cancels_pipeline(self):
+        """
+        测试任一阶段失败时取消整个流水线并抛出异常
+        """
+        def boom(x):
+            if x == 3:
+                raise ValueError("bad item")
+            return x
+        a, b = Stage(boom, delay=0), Stage(lambda x: x)
+        a >> b
+        with self.assertRaises(ValueError):
+            asyncio.run(Collect(start=a).run_async({'source': range(100)}))
+
+    def test_branching_stage_rejected(self):
+        """
+        测试阶段使用非 default 动作时报错
+        """
+        a = Stage(lambda x: x)
+        a - "other" >> Stage(lambda x: x)
+        with self.assertRaises(ValueError):
+            asyncio.run(Collect(start=a).run_async({'source': range(3)}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import unittest
+import threading
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, ThreadPoolBatchNode, ProcessPoolBatchNode, ThreadPoolBatchFlow
+
+class SleepyDoubler(ThreadPoolBatchNode):
+    def __init__(self, delay=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running, self.peak = 0, 0
+
+    def prep(self, shared_storage):
+        return shared_storage['input_numbers']
+
+    def exec(self, number):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)  # 模拟阻塞 I/O
+        with self.lock:
+            self.running -= 1
+        return number * 2
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['results'] = exec_result
+
+# 进程池中使用的节点必须定义在模块级别，以便 pickle
+class SquareProcessor(ProcessPoolBatchNode):
+    def prep(self, shared_storage):
+        return shared_storage['input_numbers']
+
+    def exec(self, number):
+        return number * number
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['results'] = exec_result
+
+class FlakyProcessor(ProcessPoolBatchNode):
+    def prep(self, shared_storage):
+        return shared_storage['input_numbers']
+
+    def exec(self, number):
+        if number == 3:
+            raise ValueError("故意失败")
+        return number
+
+    def exec_fallback(self, prep_result, exc):
+        return -1
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['results'] = exec_result
+
+class TestThreadPoolBatchNode(unittest.TestCase):
+    def test_parallel_and_ordered(self):
+        """
+        测试项目在线程池中并行运行，且结果保持输入顺序
+        """
+        shared_storage = {'input_numbers': list(range(8))}
+        node = SleepyDoubler(delay=0.05, max_workers=8)
+
+        start = time.perf_counter()
+        node.run(shared_storage)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(shared_storage['results'], [x * 2 for x in range(8)])
+        self.assertLess(elapsed, 0.05 * 8 / 2)
+
+    def test_max_workers_limit(self):
+        """
+        测试 max_workers 限制同时运行的项目数
+        """
+        shared_storage = {'input_numbers': list(range(9))}
+        node = SleepyDoubler(delay=0.02, max_workers=3)
+        node.run(shared_storage)
+
+        self.assertEqual(shared_storage['results'], [x * 2 for x in range(9)])
+        self.assertLessEqual(node.peak, 3)
+
+    def test_shared_executor(self):
+        """
+        测试使用外部传入的线程池，运行后线程池不被关闭
+        """
+        with ThreadPoolExecutor(2) as executor:
+            node = SleepyDoubler(delay=0.01, executor=executor)
+            shared_storage = {'input_numbers': [1, 2, 3]}
+            node.run(shared_storage)
+            self.assertEqual(shared_storage['results'], [2, 4, 6])
+            self.assertEqual(executor.submit(lambda: 42).result(), 42)
+
+    def test_empty_input(self):
+        """
+        测试空输入
+        """
+        shared_storage = {'input_numbers': []}
+        node = SleepyDoubler()
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['results'], [])
+
+    def test_error_propagates(self):
+        """
+        测试重试耗尽后异常会抛出
+        """
+        class ErrorNode(SleepyDoubler):
+            def exec(self, number):
+                if number == 2:
+                    raise ValueError("故意失败")
+                return number
+
+        with self.assertRaises(ValueError):
+            ErrorNode(max_workers=2).run({'input_numbers': [1, 2, 3]})
+
+class TestProcessPoolBatchNode(unittest.TestCase):
+    def test_process_pool(self):
+        """
+        测试项目在进程池中运行，结果保持输入顺序
+        """
+        shared_storage = {'input_numbers': list(range(50))}
+        SquareProcessor(max_workers=2, chunksize=7).run(shared_storage)
+        self.assertEqual(shared_storage['results'], [x * x for x in range(50)])
+
+    def test_retry_and_fallback_in_worker(self):
+        """
+        测试工作进程中的重试与回退逻辑
+        """
+        shared_storage = {'input_numbers': [1, 2, 3, 4]}
+        FlakyProcessor(max_retries=2, max_workers=2).run(shared_storage)
+        self.assertEqual(shared_storage['results'], [1, 2, -1, 4])
+
+class TestThreadPoolBatchFlow(unittest.TestCase):
+    def test_batch_flow_in_threads(self):
+        """
+        测试每组批处理参数的子流程在线程池中并行运行
+        """
+        class SlowWriter(Node):
+            def prep(self, shared_storage):
+                return self.params['key']
+
+            def exec(self, key):
+                time.sleep(0.05)
+                return key.upper()
+
+            def post(self, shared_storage, prep_result, exec_result):
+                shared_storage['results'][prep_result] = exec_result
+
+        class KeysFlow(ThreadPoolBatchFlow):
+            def prep(self, shared_storage):
+                return [{'key': k} for k in shared_storage['keys']]
+
+        shared_storage = {'keys': ['a', 'b', 'c', 'd', 'e', 'f'], 'results': {}}
+        flow = KeysFlow(start=SlowWriter(), max_workers=6)
+
+        start = time.perf_counter()
+        flow.run(shared_storage)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(shared_storage['results'], {k: k.upper() for k in 'abcdef'})
+        self.assertLess(elapsed, 0.05 * 6 / 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, Flow, ProcessBatchFlow
+
+# 节点类定义在模块级别，以便进程池 pickle
+
+class LoadImage(Node):
+    # 与并行批处理示例一样写入同一个键 shared['image']，各分片之间互不干扰
+    def prep(self, shared_storage):
+        return self.params['image'], shared_storage['scale']
+
+    def exec(self, prep_res):
+        image, scale = prep_res
+        return image * scale
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['image'] = exec_result
+
+class SaveImage(Node):
+    def prep(self, shared_storage):
+        return shared_storage['image']
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['results'] = {self.params['image']: (prep_result, os.getpid())}
+
+class Fail(Node):
+    def exec(self, prep_res):
+        raise ValueError("worker failed")
+
+class Images(ProcessBatchFlow):
+    def prep(self, shared_storage):
+        return [{'image': i} for i in shared_storage['images']]
+
+    def shard(self, shared_storage, bp):
+        # 只发送子流程需要的键
+        return {'scale': shared_storage['scale']}
+
+    def merge(self, shared_storage, updates):
+        shared_storage['results'] = {}
+        for u in updates:
+            shared_storage['results'].update(u['results'])
+
+class Counted(ProcessBatchFlow):
+    def prep(self, shared_storage):
+        return [{'image': i} for i in range(3)]
+
+class Record(Node):
+    # 原地修改分片中的列表和字典
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['seen'].append(self.params['image'])
+        shared_storage['marks'][self.params['image']] = 1
+
+class Records(Counted):
+    def merge(self, shared_storage, updates):
+        shared_storage['updates'] = updates
+
+class Count(Node):
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['seen'].append(self.params['image'])
+        shared_storage['n'] += 1
+
+class Counts(Counted):
+    merge_rules = {'seen': "append", 'n': "add"}
+
+    def prep(self, shared_storage):
+        return [{'image': i} for i in range(4)]
+
+def build():
+    load = LoadImage()
+    load >> SaveImage()
+    return load
+
+class TestProcessBatchFlow(unittest.TestCase):
+    def test_shards_and_merge(self):
+        """
+        测试每组参数在工作进程中使用独立的分片，写入同一个键也不会冲突，最后由 merge 合并
+        """
+        shared_storage = {'images': list(range(8)), 'scale': 3, 'big': 'x' * 10000}
+        Images(start=build(), max_workers=2).run(shared_storage)
+        results = shared_storage['results']
+        self.assertEqual({i: v for i, (v, _) in results.items()}, {i: i * 3 for i in range(8)})
+        self.assertNotIn(os.getpid(), {pid for _, pid in results.values()})
+        self.assertNotIn('image', shared_storage)
+
+    def test_default_shard_and_merge(self):
+        """
+        测试默认分片为 shared 的浅拷贝，默认合并时后面的批次覆盖前面的
+        """
+        shared_storage = {'scale': 2}
+        flow = Flow(start=Counted(start=build(), max_workers=2, chunksize=2))
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['image'], 4)
+        self.assertEqual(list(shared_storage['results']), [2])
+
+    def test_in_place_changes(self):
+        """
+        测试子流程原地修改分片中的值（append、字典赋值）时，修改同样返回给 merge；未修改的键不返回
+        """
+        shared_storage = {'seen': [], 'marks': {}, 'scale': 1}
+        Records(start=Record(), max_workers=2).run(shared_storage)
+        self.assertEqual(shared_storage['updates'], [{'seen': [i], 'marks': {i: 1}} for i in range(3)])
+
+    def test_merge_rules(self):
+        """
+        测试未重写 merge 时按 merge_rules 合并各分片的修改，与 isolate 的线程池批处理流程结果相同
+        """
+        shared_storage = {'seen': [], 'n': 0}
+        Counts(start=Count(), max_workers=2).run(shared_storage)
+        self.assertEqual(shared_storage, {'seen': [0, 1, 2, 3], 'n': 4})
+
+    def test_worker_error(self):
+        """
+        测试工作进程中的异常传递给调用方
+        """
+        shared_storage = {'images': [1], 'scale': 1}
+        with self.assertRaises(ValueError):
+            Images(start=Fail(), max_workers=1).run(shared_storage)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import asyncio
+import pickle
+import tempfile
+import time
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import ThreadPoolBatchNode, AsyncParallelBatchNode, RateLimiter, rate_limiter, Tracer
+
+class CallLLM(ThreadPoolBatchNode):
+    rate_limit = "test-llm"
+
+    def prep(self, shared_storage):
+        return list(range(10))
+
+    def exec(self, item):
+        return item
+
+    def rate_cost(self, item):
+        return 1
+
+class AsyncCallLLM(AsyncParallelBatchNode):
+    rate_limit = "test-async-llm"
+
+    async def prep_async(self, shared_storage):
+        return list(range(10))
+
+    async def exec_async(self, item):
+        return item
+
+def acquire_times(path, n):
+    # 在子进程中按共享的文件限流器取得 n 次额度，返回每次取得的时间
+    lim, times = RateLimiter(rps=50, burst=1, path=path), []
+    for _ in range(n):
+        lim.acquire()
+        times.append(time.time())
+    return times
+
+class TestRateLimiter(unittest.TestCase):
+    def test_requests_per_second(self):
+        """
+        测试每秒请求数限制：突发额度用完后按速率放行
+        """
+        lim = RateLimiter(rps=50, burst=2)
+        start = time.monotonic()
+        for _ in range(7):
+            lim.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertGreater(lim.waits, 0)
+        self.assertGreater(lim.wait_time, 0)
+
+    def test_token_budget(self):
+        """
+        测试 token 预算：超过容量的大请求在桶满时放行，之后的请求等待补足
+        """
+        lim = RateLimiter(tpm=6000)
+        self.assertEqual(lim.try_acquire(6000), 0)
+        start = time.monotonic()
+        lim.acquire(10)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+        lim = RateLimiter(tpm=6000)
+        self.assertEqual(lim.try_acquire(8000), 0)
+        # 透支 2000 个 token，按每秒 100 个补足需要约 20 秒
+        self.assertGreater(lim.try_acquire(0), 19)
+
+    def test_registry(self):
+        """
+        测试按名称共享限流器，未定义的名称报错
+        """
+        lim = rate_limiter("test-registry", rps=5)
+        self.assertIs(rate_limiter("test-registry"), lim)
+        self.assertIs(rate_limiter("test-registry", rps=100), lim)
+        with self.assertRaises(KeyError):
+            rate_limiter("test-undefined")
+        with self.assertRaises(ValueError):
+            RateLimiter()
+
+    def test_thread_pool_node_and_tracing(self):
+        """
+        测试线程池批处理节点共享同一个限流器，等待时间记录在追踪中
+        """
+        rate_limiter("test-llm", rps=50, burst=1)
+        shared_storage = {}
+        start = time.monotonic()
+        with Tracer() as tracer:
+            CallLLM(max_workers=10).run(shared_storage)
+        self.assertGreaterEqual(time.monotonic() - start, 0.17)
+        waits = [e for e in tracer.events if e['name'] == 'rate_limit']
+        self.assertTrue(waits)
+        self.assertTrue(all(e['limiter'] == 'test-llm' and e['cost'] == 1 and e['cat'] == 'wait' for e in waits))
+
+    def test_async_waits_without_blocking(self):
+        """
+        测试异步节点等待额度时不阻塞事件循环
+        """
+        rate_limiter("test-async-llm", rps=50, burst=1)
+        async def run():
+            beats = 0
+            async def heartbeat():
+                nonlocal beats
+                while True:
+                    await asyncio.sleep(0.01)
+                    beats += 1
+            task = asyncio.ensure_future(heartbeat())
+            start = time.monotonic()
+            await AsyncCallLLM().run_async({})
+            elapsed = time.monotonic() - start
+            task.cancel()
+            return elapsed, beats
+        elapsed, beats = asyncio.run(run())
+        self.assertGreaterEqual(elapsed, 0.17)
+        self.assertGreaterEqual(beats, 8)
+
+    def test_file_backend_across_processes(self):
+        """
+        测试文件锁后端在多个进程之间共享额度
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "llm.bucket")
+            with ProcessPoolExecutor(2) as ex:
+                results = list(ex.map(acquire_times, [path, path], [5, 5]))
+        times = sorted(results[0] + results[1])
+        # 除第一次外每次间隔约 1/50 秒
+        self.assertGreaterEqual(times[-1] - times[0], 9 * 0.02 * 0.9)
+
+    def test_pickle(self):
+        """
+        测试限流器可以 pickle（用于进程池），副本使用新的锁
+        """
+        lim = pickle.loads(pickle.dumps(RateLimiter(rps=5, name="x")))
+        self.assertEqual(lim.name, "x")
+        self.assertEqual(lim.try_acquire(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import unittest
+import asyncio
+import random
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncParallelBatchNode, ThreadPoolBatchNode, RetryPolicy
+
+class RateLimited(Exception):
+    # 模拟带 retry_after 提示的限流错误
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.retry_after = retry_after
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+class HttpError(Exception):
+    def __init__(self, headers):
+        super().__init__("http error")
+        self.response = Response(headers)
+
+class FlakyNode(Node):
+    # 依次抛出 errors 中的异常，之后返回结果
+    def __init__(self, errors, max_retries=5):
+        super().__init__(max_retries=max_retries)
+        self.errors, self.attempts = list(errors), 0
+
+    def exec(self, prep_res):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+    def exec_fallback(self, prep_res, exc):
+        return f"fallback:{type(exc).__name__}"
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_exponential_backoff_and_cap(self):
+        """
+        测试不带抖动时等待时间按指数增长并受 max_delay 限制
+        """
+        policy = RetryPolicy(base=0.5, factor=2, max_delay=3, jitter=False)
+        self.assertEqual([policy.delay(n, ValueError()) for n in range(5)], [0.5, 1, 2, 3, 3])
+
+    def test_full_jitter(self):
+        """
+        测试完全抖动时等待时间在 [0, 退避上限] 内
+        """
+        random.seed(0)
+        policy = RetryPolicy(base=1, factor=2, max_delay=10)
+        delays = [policy.delay(3, ValueError()) for _ in range(200)]
+        self.assertTrue(all(0 <= d <= 8 for d in delays))
+        self.assertGreater(len(set(delays)), 100)
+
+    def test_retry_on_filter(self):
+        """
+        测试 retry_on 可以是异常类型或判断函数，不可重试时返回 None
+        """
+        policy = RetryPolicy(retry_on=(RateLimited,), jitter=False)
+        self.assertIsNone(policy.delay(0, ValueError()))
+        self.assertEqual(policy.delay(0, RateLimited()), 1.0)
+        policy = RetryPolicy(retry_on=lambda e: "retry" in str(e), jitter=False)
+        self.assertIsNone(policy.delay(0, ValueError("fatal")))
+        self.assertEqual(policy.delay(0, ValueError("please retry")), 1.0)
+
+    def test_retry_after_hint(self):
+        """
+        测试等待时间不少于异常属性或响应头中的 Retry-After
+        """
+        policy = RetryPolicy(base=0.1, jitter=False)
+        self.assertEqual(policy.delay(0, RateLimited(retry_after=7)), 7)
+        self.assertEqual(policy.delay(0, HttpError({"retry-after": "4"})), 4)
+        self.assertEqual(policy.delay(0, HttpError({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})), 0.1)
+        self.assertEqual(RetryPolicy(base=0.1, jitter=False, retry_after=False).delay(0, RateLimited(7)), 0.1)
+
+    def test_node_uses_policy(self):
+        """
+        测试节点按策略重试，不可重试的异常直接进入回退
+        """
+        node = FlakyNode([RateLimited(), RateLimited()])
+        node.retry_policy = RetryPolicy(base=0.001, retry_on=RateLimited)
+        self.assertEqual(node._exec(None), "ok")
+        self.assertEqual(node.attempts, 3)
+
+        node = FlakyNode([ValueError(), RateLimited()])
+        node.retry_policy = RetryPolicy(base=0.001, retry_on=RateLimited)
+        self.assertEqual(node._exec(None), "fallback:ValueError")
+        self.assertEqual(node.attempts, 1)
+
+    def test_node_without_policy_uses_wait(self):
+        """
+        测试未设置策略时保持原有的固定等待行为
+        """
+        node = FlakyNode([ValueError()] * 5, max_retries=3)
+        node.wait = 0.01
+        start = time.monotonic()
+        self.assertEqual(node._exec(None), "fallback:ValueError")
+        self.assertEqual(node.attempts, 3)
+        self.assertGreaterEqual(time.monotonic() - start, 0.02)
+
+class FailFirst:
+    # 项目 0 第一次执行时失败并要求等待 0.1 秒，其余项目立即完成；finished 按完成顺序记录项目
+    def __init__(self):
+        self.finished, self.failed = [], False
+
+    def __call__(self, item):
+        if item == 0 and not self.failed:
+            self.failed = True
+            raise RateLimited(retry_after=0.1)
+        self.finished.append(item)
+        return item * 10
+
+class TestRetrySlots(unittest.TestCase):
+    def test_async_retry_releases_slot(self):
+        """
+        测试异步并行批处理中，等待重试的项目归还并发名额，其他项目可以先完成
+        """
+        behaviour = FailFirst()
+        class Items(AsyncParallelBatchNode):
+            async def prep_async(self, shared_storage):
+                return [0, 1, 2]
+            async def exec_async(self, item):
+                return behaviour(item)
+            async def post_async(self, shared_storage, prep_result, exec_result):
+                shared_storage['results'] = exec_result
+
+        node = Items(max_retries=2, max_concurrency=1)
+        node.retry_policy = RetryPolicy(base=0, retry_on=RateLimited)
+        shared_storage = {}
+        asyncio.run(node.run_async(shared_storage))
+        self.assertEqual(shared_storage['results'], [0, 10, 20])
+        self.assertEqual(behaviour.finished, [1, 2, 0])
+
+    def test_thread_pool_retry_does_not_block_worker(self):
+        """
+        测试线程池批处理中，等待重试的项目不占用工作线程，重试结果仍按输入顺序返回
+        """
+        behaviour = FailFirst()
+        class Items(ThreadPoolBatchNode):
+            def prep(self, shared_storage):
+                return [0, 1, 2]
+            def exec(self, item):
+                return behaviour(item)
+            def post(self, shared_storage, prep_result, exec_result):
+                shared_storage['results'] = exec_result
+
+        node = Items(max_retries=2, max_workers=1)
+        node.retry_policy = RetryPolicy(base=0, retry_on=RateLimited)
+        shared_storage = {}
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['results'], [0, 10, 20])
+        self.assertEqual(behaviour.finished, [1, 2, 0])
+
+    def test_thread_pool_exhausted_retries_fall_back(self):
+        """
+        测试线程池中延后的重试用完后仍调用 exec_fallback
+        """
+        class Items(ThreadPoolBatchNode):
+            def prep(self, shared_storage):
+                return [0, 1]
+            def exec(self, item):
+                raise RateLimited(retry_after=0.01)
+            def exec_fallback(self, prep_res, exc):
+                return -1
+            def post(self, shared_storage, prep_result, exec_result):
+                shared_storage['results'] = exec_result
+
+        shared_storage = {}
+        Items(max_retries=3, wait=0.01, max_workers=2).run(shared_storage)
+        self.assertEqual(shared_storage['results'], [-1, -1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import asyncio
+import queue
+import threading
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow, FlowScheduler, AsyncFlowScheduler, Tracer
+
+class Work(Node):
+    # 记录开始顺序与同时运行的数量
+    def prep(self, shared_storage):
+        return shared_storage
+
+    def exec(self, shared_storage):
+        log = shared_storage['log']
+        with log['lock']:
+            log['order'].append(shared_storage['name'])
+            log['now'][shared_storage['tenant']] = log['now'].get(shared_storage['tenant'], 0) + 1
+            log['peak'] = max(log['peak'], log['now'][shared_storage['tenant']])
+        time.sleep(shared_storage.get('delay', 0.02))
+        with log['lock']:
+            log['now'][shared_storage['tenant']] -= 1
+        return shared_storage['name']
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['done'] = exec_res
+
+class AsyncWork(AsyncNode):
+    async def prep_async(self, shared_storage):
+        return shared_storage
+
+    async def exec_async(self, shared_storage):
+        shared_storage['log']['order'].append(shared_storage['name'])
+        await asyncio.sleep(0.01)
+        return shared_storage['name']
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        return f"done-{exec_res}"
+
+def new_log():
+    return {'lock': threading.Lock(), 'order': [], 'now': {}, 'peak': 0}
+
+class TestFlowScheduler(unittest.TestCase):
+    def test_priority_order(self):
+        """
+        测试工作者空闲后优先运行优先级数值较小的流程，同优先级按提交顺序
+        """
+        log = new_log()
+        with FlowScheduler(workers=1) as sched:
+            futs = [sched.submit(Flow(start=Work()), {'log': log, 'name': 'first', 'tenant': 'a'})]
+            for name, prio in [('batch1', 10), ('batch2', 10), ('chat', 0)]:
+                futs.append(sched.submit(Flow(start=Work()), {'log': log, 'name': name, 'tenant': 'a'}, priority=prio))
+            for f in futs:
+                f.result()
+        self.assertEqual(log['order'], ['first', 'chat', 'batch1', 'batch2'])
+
+    def test_tenant_quota_and_stats(self):
+        """
+        测试每个租户的并发上限，以及排队数与等待时间统计
+        """
+        log = new_log()
+        sched = FlowScheduler(workers=4, tenant_limit=1, tenant_limits={'big': 2})
+        futs = [sched.submit(Flow(start=Work()), {'log': log, 'name': i, 'tenant': t, 'delay': 0.03}, tenant=t)
+                for i, t in enumerate(['big'] * 6 + ['small'] * 2)]
+        stats = sched.stats()
+        self.assertEqual(stats['running'], 3)
+        self.assertEqual(stats['tenants']['big']['running'], 2)
+        self.assertEqual(stats['queued'], 5)
+        for f in futs:
+            f.result()
+        sched.shutdown()
+        self.assertLessEqual(log['peak'], 2)
+        stats = sched.stats()
+        self.assertEqual((stats['queued'], stats['running'], stats['completed']), (0, 0, 8))
+        self.assertGreater(stats['tenants']['big']['wait_max'], stats['tenants']['small']['wait_max'])
+
+    def test_admission_control_and_errors(self):
+        """
+        测试排队数达到 max_queue 时拒绝新的运行，流程中的异常通过 Future 传递
+        """
+        class Boom(Node):
+            def exec(self, prep_res):
+                time.sleep(0.02)
+                raise ValueError("boom")
+        with FlowScheduler(workers=1, max_queue=1) as sched:
+            first = sched.submit(Flow(start=Boom()), {})
+            sched.submit(Flow(start=Boom()), {})
+            with self.assertRaises(queue.Full):
+                sched.submit(Flow(start=Boom()), {})
+            with self.assertRaises(ValueError):
+                first.result()
+        self.assertEqual(sched.stats()['rejected'], 1)
+
+class TestAsyncFlowScheduler(unittest.TestCase):
+    def test_async_and_sync_flows(self):
+        """
+        测试异步调度器运行异步与同步流程，按优先级开始，结果返回给提交方
+        """
+        async def run():
+            sched = AsyncFlowScheduler(workers=2)
+            log = new_log()
+            jobs = [sched.submit(AsyncFlow(start=AsyncWork()), {'log': log, 'name': i}, priority=i % 2)
+                    for i in range(6)]
+            jobs.append(sched.submit(Flow(start=Work()), {'log': log, 'name': 'sync', 'tenant': 'x'}, tenant='x'))
+            results = await asyncio.gather(*jobs)
+            return results, log['order'], sched.stats()
+        results, order, stats = asyncio.run(run())
+        self.assertEqual(results, [f"done-{i}" for i in range(6)] + [None])
+        # 0 和 1 提交时有空闲的工作者，直接开始；其余按优先级开始
+        self.assertEqual(order[:2], [0, 1])
+        self.assertLess(order.index(4), order.index(3))
+        self.assertEqual(stats['completed'], 7)
+        self.assertEqual(stats['tenants'][None]['completed'], 6)
+
+    def test_cancel_while_queued(self):
+        """
+        测试提交方在排队期间取消时，该运行不会开始
+        """
+        async def run():
+            sched, log = AsyncFlowScheduler(workers=1), new_log()
+            first = asyncio.ensure_future(sched.submit(AsyncFlow(start=AsyncWork()), {'log': log, 'name': 'a'}))
+            second = asyncio.ensure_future(sched.submit(AsyncFlow(start=AsyncWork()), {'log': log, 'name': 'b'}))
+            await asyncio.sleep(0)
+            second.cancel()
+            await first
+            await asyncio.sleep(0.02)
+            return log['order'], sched.stats()
+        order, stats = asyncio.run(run())
+        self.assertEqual(order, ['a'])
+        self.assertEqual(stats['queued'], 0)
+
+    def test_tracing_queue_wait(self):
+        """
+        测试在追踪中提交时记录排队等待事件
+        """
+        async def run():
+            sched = AsyncFlowScheduler(workers=1)
+            with Tracer() as tracer:
+                await asyncio.gather(*(sched.submit(AsyncFlow(start=AsyncWork()), {'log': new_log(), 'name': i}, tenant='t')
+                                       for i in range(3)))
+            return tracer
+        events = [e for e in asyncio.run(run()).events if e['name'] == 'schedule']
+        self.assertEqual(len(events), 3)
+        self.assertTrue(all(e['tenant'] == 't' and e['cat'] == 'wait' for e in events))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import asyncio
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncParallelBatchFlow, ThreadPoolBatchFlow, FanOutFlow, Overlay
+
+class Image:
+    # 模拟 NumPy 数组等大对象：不应被复制
+    def __init__(self, pixels):
+        self.pixels = pixels
+
+class AsyncLoad(AsyncNode):
+    async def prep_async(self, shared_storage):
+        return shared_storage['image'], self.params['i']
+
+    async def exec_async(self, prep_res):
+        await asyncio.sleep(0.01 * (3 - prep_res[1]))
+        return prep_res
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        image, i = exec_res
+        # 所有子流写入同一个键，互不干扰
+        shared_storage['current'] = i
+        await asyncio.sleep(0.01)
+        shared_storage['seen'] = {**shared_storage.get('seen', {}), i: shared_storage['current']}
+        shared_storage['log'].append(i)
+        shared_storage['count'] += 1
+        shared_storage['same_image'] = image is shared_storage['image']
+
+class Load(Node):
+    def prep(self, shared_storage):
+        return self.params['i']
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['log'].append(prep_res)
+        shared_storage['total'] = prep_res
+
+class AsyncImages(AsyncParallelBatchFlow):
+    isolate = True
+    merge_rules = {'seen': 'update', 'log': 'append', 'count': 'add'}
+
+    async def prep_async(self, shared_storage):
+        return [{'i': i} for i in range(3)]
+
+class Images(ThreadPoolBatchFlow):
+    isolate = True
+    merge_rules = {'log': 'append'}
+
+    def prep(self, shared_storage):
+        return [{'i': i} for i in range(4)]
+
+class TestOverlay(unittest.TestCase):
+    def test_reads_writes_and_deletes(self):
+        """
+        测试视图读取穿透到父 shared，写入和删除只记录在视图中
+        """
+        base = {'a': 1, 'b': [1], 'c': Image([0])}
+        view = Overlay(base)
+        view['a'] = 2
+        view['d'] = 4
+        del view['c']
+        view['b'].append(2)
+        self.assertEqual(dict(view), {'a': 2, 'b': [1, 2], 'd': 4})
+        self.assertEqual(base, {'a': 1, 'b': [1], 'c': base['c']})
+        writes, deletes = view.changes()
+        self.assertEqual(writes, {'a': 2, 'b': [1, 2], 'd': 4})
+        self.assertEqual(deletes, {'c'})
+        with self.assertRaises(KeyError):
+            view['c']
+
+    def test_large_values_not_copied(self):
+        """
+        测试只读取未修改的容器不算修改，其他对象不被复制
+        """
+        image = Image([0] * 1000)
+        view = Overlay({'image': image, 'items': [1, 2]})
+        self.assertIs(view['image'], image)
+        self.assertEqual(view['items'], [1, 2])
+        self.assertEqual(view.changes(), ({}, set()))
+
+class TestIsolatedBatchFlow(unittest.TestCase):
+    def test_async_parallel_merge_rules(self):
+        """
+        测试异步并行子流各自的视图互不干扰，修改按声明的规则合并
+        """
+        image = Image([0])
+        shared_storage = {'image': image, 'log': [], 'count': 10}
+        asyncio.run(AsyncImages(start=AsyncLoad()).run_async(shared_storage))
+        self.assertEqual(shared_storage['seen'], {0: 0, 1: 1, 2: 2})
+        self.assertEqual(sorted(shared_storage['log']), [0, 1, 2])
+        self.assertEqual(shared_storage['count'], 13)
+        self.assertTrue(shared_storage['same_image'])
+        self.assertIs(shared_storage['image'], image)
+
+    def test_thread_pool_and_nested(self):
+        """
+        测试线程池批处理流程的隔离，未声明的键后提交的覆盖先提交的，子流程可以嵌套
+        """
+        shared_storage = {'log': []}
+        Flow(start=Images(start=Flow(start=Load()), max_workers=4)).run(shared_storage)
+        self.assertEqual(sorted(shared_storage['log']), [0, 1, 2, 3])
+        self.assertIn(shared_storage['total'], range(4))
+
+    def test_conflict_rule(self):
+        """
+        测试 "error" 规则：并发的子流修改同一个键时报错，先后运行的子流不算冲突
+        """
+        class Slow(Load):
+            def exec(self, prep_res):
+                time.sleep(0.05)
+        class Strict(Images):
+            merge_rules = {'total': 'error', 'log': 'append'}
+        with self.assertRaises(ValueError):
+            Strict(start=Slow(), max_workers=4).run({'log': []})
+        shared_storage = {'log': []}
+        Strict(start=Slow(), max_workers=1).run(shared_storage)
+        self.assertEqual(shared_storage['total'], 3)
+
+    def test_fan_out_rules(self):
+        """
+        测试扇出流程默认按 merge_rules 提交各分支的修改
+        """
+        class Vote(Node):
+            def __init__(self, v):
+                super().__init__()
+                self.v = v
+            def post(self, shared_storage, prep_res, exec_res):
+                shared_storage['votes'].append(self.v)
+        class Judges(FanOutFlow):
+            merge_rules = {'votes': 'append'}
+        shared_storage = {'votes': ['x']}
+        Judges(Vote('a'), Vote('b'), Vote('c')).run(shared_storage)
+        self.assertEqual(shared_storage['votes'], ['x', 'a', 'b', 'c'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import unittest
+import asyncio
+import pickle
+import tempfile
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import AsyncNode, AsyncFlow, AsyncFanOutFlow, Stream, DiskCache, Checkpoint
+
+class StreamLLM(AsyncNode):
+    # 模拟流式 LLM：每 20ms 产出一个 token
+    async def prep_async(self, shared_storage):
+        return shared_storage['prompt']
+
+    async def exec_async(self, prompt):
+        for word in prompt.split():
+            await asyncio.sleep(0.02)
+            yield word + " "
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        shared_storage['reply'] = exec_res
+
+class Speak(AsyncNode):
+    # 模拟 TTS：记录每个块开始处理的时间
+    async def prep_async(self, shared_storage):
+        return shared_storage['reply']
+
+    async def exec_async(self, stream):
+        return [(chunk, time.monotonic()) async for chunk in stream]
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        shared_storage['spoken'] = exec_res
+
+class SaveHistory(AsyncNode):
+    async def prep_async(self, shared_storage):
+        return shared_storage['reply']
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        shared_storage['history'] = await prep_res.text()
+
+class Flaky(AsyncNode):
+    # 前两次尝试在第一块之前失败，之后正常产出
+    attempts = 0
+
+    async def exec_async(self, prep_res):
+        Flaky.attempts += 1
+        if Flaky.attempts < 3:
+            raise ConnectionError("stream failed to start")
+        return _tokens(["a", "b"])
+
+    async def post_async(self, shared_storage, prep_res, exec_res):
+        shared_storage['reply'] = exec_res
+
+class Counted(StreamLLM):
+    # 统计 exec_async 的调用次数
+    calls = 0
+
+    async def exec_async(self, prompt):
+        Counted.calls += 1
+        async for token in super().exec_async(prompt):
+            yield token
+
+class Crash(AsyncNode):
+    # fail[0] 为 True 时模拟崩溃（只崩溃一次）
+    fail = [False]
+
+    async def prep_async(self, shared_storage):
+        if Crash.fail[0]:
+            Crash.fail[0] = False
+            raise RuntimeError("crash")
+
+async def _tokens(items, delay=0.0):
+    for i in items:
+        await asyncio.sleep(delay)
+        yield i
+
+class TestStream(unittest.TestCase):
+    def test_downstream_starts_on_first_chunk(self):
+        """
+        测试下游节点在第一块到达后即开始处理，而不是等待整个流结束；流结束后仍可取得全文
+        """
+        llm, speak, save = StreamLLM(), Speak(), SaveHistory()
+        llm >> speak >> save
+        shared_storage = {'prompt': "one two three four five"}
+        start = time.monotonic()
+        asyncio.run(AsyncFlow(start=llm).run_async(shared_storage))
+        spoken = shared_storage['spoken']
+        self.assertEqual([c for c, _ in spoken], ["one ", "two ", "three ", "four ", "five "])
+        self.assertLess(spoken[0][1] - start, 0.06)
+        self.assertGreater(spoken[-1][1] - spoken[0][1], 0.06)
+        self.assertEqual(shared_storage['history'], "one two three four five ")
+        self.assertIsInstance(shared_storage['reply'], Stream)
+
+    def test_multiple_consumers(self):
+        """
+        测试多个分支同时消费同一个流，每个分支都收到全部块，来源只迭代一次
+        """
+        pulled = []
+        async def source():
+            for i in range(4):
+                pulled.append(i)
+                await asyncio.sleep(0.01)
+                yield i
+        class SpeakA(Speak):
+            async def post_async(self, shared_storage, prep_res, exec_res):
+                shared_storage['a'] = exec_res
+        class SpeakB(Speak):
+            async def post_async(self, shared_storage, prep_res, exec_res):
+                shared_storage['b'] = exec_res
+        async def main():
+            shared_storage = {'reply': Stream(source())}
+            await AsyncFanOutFlow(SpeakA(), SpeakB()).run_async(shared_storage)
+            return shared_storage
+        shared_storage = asyncio.run(main())
+        self.assertEqual([c for c, _ in shared_storage['a']], [0, 1, 2, 3])
+        self.assertEqual([c for c, _ in shared_storage['b']], [0, 1, 2, 3])
+        self.assertEqual(pulled, [0, 1, 2, 3])
+
+    def test_retry_before_first_chunk(self):
+        """
+        测试第一块之前的失败按节点的重试处理，返回的异步迭代器同样包装为 Stream
+        """
+        Flaky.attempts = 0
+        async def main():
+            shared_storage = {}
+            await Flaky(max_retries=3).run_async(shared_storage)
+            return await shared_storage['reply'].collect()
+        self.assertEqual(asyncio.run(main()), ["a", "b"])
+        self.assertEqual(Flaky.attempts, 3)
+
+    def test_first_chunk_timeout(self):
+        """
+        测试 exec_timeout 只计算到第一块到达
+        """
+        class Slow(StreamLLM):
+            exec_timeout = 0.05
+        shared_storage = {'prompt': "a b c d e f"}
+        async def main():
+            await Slow().run_async(shared_storage)
+            return await shared_storage['reply'].text()
+        self.assertEqual(asyncio.run(main()), "a b c d e f ")
+
+        class TooSlow(AsyncNode):
+            exec_timeout = 0.02
+            async def exec_async(self, prep_res):
+                await asyncio.sleep(0.1)
+                yield "late"
+        with self.assertRaises(TimeoutError):
+            asyncio.run(TooSlow().run_async({}))
+
+    def test_errors_and_pickle(self):
+        """
+        测试流中途失败时每个消费者都收到异常；结束的流可以 pickle，未结束的流不能
+        """
+        async def broken():
+            yield 1
+            raise ValueError("connection lost")
+        async def main():
+            stream = Stream(broken())
+            with self.assertRaises(ValueError):
+                await stream.collect()
+            with self.assertRaises(ValueError):
+                await stream.collect()
+            self.assertEqual(stream.chunks, [1])
+            with self.assertRaises(TypeError):
+                pickle.dumps(Stream(_tokens([1])))
+            done = Stream(["x", "y"])
+            await done.collect()
+            return pickle.loads(pickle.dumps(done))
+        copy = asyncio.run(main())
+        self.assertEqual(asyncio.run(copy.text()), "xy")
+
+    def test_cache_stores_finished_stream(self):
+        """
+        测试流式结果在结束后才写入磁盘缓存，之后的运行命中缓存并重放全部块
+        """
+        Counted.calls = 0
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(Path(tmp) / "cache.db")
+            texts = []
+            for _ in range(2):
+                llm = Counted()
+                llm.cache = cache
+                llm >> SaveHistory()
+                shared_storage = {'prompt': "hello world"}
+                asyncio.run(AsyncFlow(start=llm).run_async(shared_storage))
+                texts.append(shared_storage['history'])
+            self.assertEqual(texts, ["hello world "] * 2)
+            self.assertEqual(Counted.calls, 1)
+            self.assertEqual(len(cache), 1)
+            cache.close()
+
+    def test_checkpoint_defers_unfinished_stream(self):
+        """
+        测试检查点保存时跳过未结束的流，流结束后的下一次保存写入该键，恢复后可以读取全部内容
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            llm, crash = StreamLLM(), Crash()
+            llm >> SaveHistory() >> crash
+            flow = AsyncFlow(start=llm)
+            flow.checkpoint = Checkpoint(Path(tmp) / "run.db")
+            Crash.fail[0] = True
+            with self.assertRaises(RuntimeError):
+                asyncio.run(flow.run_async({'prompt': "a b"}))
+
+            shared_storage = {}
+            asyncio.run(flow.run_async(shared_storage))
+            self.assertEqual(shared_storage['history'], "a b ")
+            self.assertEqual(asyncio.run(shared_storage['reply'].text()), "a b ")
+            flow.checkpoint.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Flow, AsyncFlow, StreamingBatchNode, AsyncStreamingBatchNode, AsyncParallelStreamingBatchNode
+
+class RunningSum(StreamingBatchNode):
+    # 对生成器中的每个数字求平方，并在 post_item 中累加，不保留结果列表
+    def prep(self, shared_storage):
+        def numbers():
+            for i in range(shared_storage['count']):
+                shared_storage['produced'] = i + 1
+                yield i
+        return numbers()
+
+    def exec(self, number):
+        return number * number
+
+    def post_item(self, shared_storage, item, exec_result):
+        # 生成器每产生一个项目就会被处理，不会提前全部读入
+        shared_storage['max_lag'] = max(shared_storage.get('max_lag', 0),
+                                        shared_storage['produced'] - item - 1)
+        shared_storage['total'] = shared_storage.get('total', 0) + exec_result
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['processed'] = exec_result
+        return "done"
+
+class AsyncRunningSum(AsyncStreamingBatchNode):
+    async def prep_async(self, shared_storage):
+        async def numbers():
+            for i in range(shared_storage['count']):
+                await asyncio.sleep(0)
+                yield i
+        return numbers()
+
+    async def exec_async(self, number):
+        return number * number
+
+    async def post_item_async(self, shared_storage, item, exec_result):
+        shared_storage.setdefault('order', []).append(item)
+        shared_storage['total'] = shared_storage.get('total', 0) + exec_result
+
+    async def post_async(self, shared_storage, prep_result, exec_result):
+        shared_storage['processed'] = exec_result
+
+class AsyncParallelRunningSum(AsyncParallelStreamingBatchNode):
+    async def prep_async(self, shared_storage):
+        def numbers():
+            for i in range(shared_storage['count']):
+                shared_storage['produced'] = i + 1
+                yield i
+        return numbers()
+
+    async def exec_async(self, number):
+        shared_storage = self.params['shared']
+        shared_storage['in_flight'] = shared_storage['produced'] - shared_storage.get('done', 0)
+        shared_storage['peak'] = max(shared_storage.get('peak', 0), shared_storage['in_flight'])
+        await asyncio.sleep(0.001 * (number % 3))
+        return number * number
+
+    async def post_item_async(self, shared_storage, item, exec_result):
+        shared_storage['done'] = shared_storage.get('done', 0) + 1
+        shared_storage['total'] = shared_storage.get('total', 0) + exec_result
+
+    async def post_async(self, shared_storage, prep_result, exec_result):
+        shared_storage['processed'] = exec_result
+
+class TestStreamingBatchNode(unittest.TestCase):
+    def test_streams_generator(self):
+        """
+        测试逐个消费生成器，并在 post 中收到已处理的项目数
+        """
+        shared_storage = {'count': 1000}
+        action = Flow(start=RunningSum()).run(shared_storage)
+
+        self.assertEqual(action, "done")
+        self.assertEqual(shared_storage['processed'], 1000)
+        self.assertEqual(shared_storage['total'], sum(i * i for i in range(1000)))
+        self.assertEqual(shared_storage['max_lag'], 0)
+
+    def test_empty_input(self):
+        """
+        测试 prep 返回 None 或空迭代器
+        """
+        class EmptyNode(RunningSum):
+            def prep(self, shared_storage):
+                return None
+
+        shared_storage = {}
+        EmptyNode().run(shared_storage)
+        self.assertEqual(shared_storage['processed'], 0)
+
+    def test_retry_per_item(self):
+        """
+        测试每个项目仍然使用重试与回退逻辑
+        """
+        class FlakyNode(RunningSum):
+            def exec(self, number):
+                if number == 2:
+                    raise ValueError("故意失败")
+                return number
+
+            def exec_fallback(self, prep_result, exc):
+                return 100
+
+        shared_storage = {'count': 4}
+        FlakyNode(max_retries=2).run(shared_storage)
+        self.assertEqual(shared_storage['total'], 0 + 1 + 100 + 3)
+
+class TestAsyncStreamingBatchNode(unittest.TestCase):
+    def test_async_iterator(self):
+        """
+        测试消费异步生成器，post_item_async 按输入顺序调用
+        """
+        shared_storage = {'count': 50}
+        asyncio.run(AsyncFlow(start=AsyncRunningSum()).run_async(shared_storage))
+
+        self.assertEqual(shared_storage['order'], list(range(50)))
+        self.assertEqual(shared_storage['total'], sum(i * i for i in range(50)))
+        self.assertEqual(shared_storage['processed'], 50)
+
+    def test_parallel_bounded(self):
+        """
+        测试并行流式处理时同时在内存中的项目数不超过 max_concurrency
+        """
+        shared_storage = {'count': 200}
+        node = AsyncParallelRunningSum(max_concurrency=4)
+        node.set_params({'shared': shared_storage})
+        asyncio.run(node.run_async(shared_storage))
+
+        self.assertEqual(shared_storage['processed'], 200)
+        self.assertEqual(shared_storage['total'], sum(i * i for i in range(200)))
+        self.assertLessEqual(shared_storage['peak'], 4)
+
+    def test_parallel_error_cancels_workers(self):
+        """
+        测试某个项目失败时其余工作协程被取消，异常向上抛出
+        """
+        class ErrorNode(AsyncParallelRunningSum):
+            async def exec_async(self, number):
+                if number == 5:
+                    raise ValueError("故意失败")
+                await asyncio.sleep(0.001)
+                return number
+
+        shared_storage = {'count': 10_000}
+        node = ErrorNode(max_concurrency=4)
+        with self.assertRaises(ValueError):
+            asyncio.run(node.run_async(shared_storage))
+        self.assertLess(shared_storage['produced'], 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+import unittest
+import asyncio
+import time
+import sqlite3
+import threading
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, Flow, AsyncFlow, AsyncParallelBatchNode, remaining_time
+
+class SlowNode(Node):
+    # 依次按 delays 中的时间阻塞，模拟挂起的 HTTP 调用
+    exec_timeout = 0.05
+
+    def __init__(self, delays, max_retries=1):
+        super().__init__(max_retries=max_retries)
+        self.delays, self.attempts = list(delays), 0
+
+    def exec(self, prep_res):
+        self.attempts += 1
+        time.sleep(self.delays.pop(0) if self.delays else 0)
+        return "done"
+
+    def exec_fallback(self, prep_res, exc):
+        return type(exc).__name__
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['result'] = exec_result
+
+class BudgetNode(Node):
+    # 记录执行时所在流程的剩余时间
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage.setdefault('budgets', []).append(remaining_time())
+
+class TestExecTimeout(unittest.TestCase):
+    def test_timeout_goes_to_fallback(self):
+        """
+        测试超时视为失败，重试用完后进入 exec_fallback，且不会等待挂起的调用结束
+        """
+        node, shared_storage = SlowNode([1, 1], max_retries=2), {}
+        start = time.monotonic()
+        node.run(shared_storage)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(shared_storage['result'], 'TimeoutError')
+        self.assertEqual(node.attempts, 2)
+
+    def test_timeout_is_retried(self):
+        """
+        测试超时后重试成功
+        """
+        node, shared_storage = SlowNode([1, 0], max_retries=2), {}
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['result'], 'done')
+
+    def test_async_timeout_cancels(self):
+        """
+        测试异步节点超时后取消正在执行的协程
+        """
+        cancelled = []
+        class Hang(AsyncNode):
+            exec_timeout = 0.05
+            async def exec_async(self, prep_res):
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+            async def exec_fallback_async(self, prep_res, exc):
+                return type(exc).__name__
+
+        self.assertEqual(asyncio.run(Hang()._exec(None)), 'TimeoutError')
+        self.assertEqual(cancelled, [True])
+
+    def test_parallel_batch_straggler(self):
+        """
+        测试并行批处理中挂起的项目超时后不再拖住整个批次
+        """
+        class Items(AsyncParallelBatchNode):
+            exec_timeout = 0.05
+            async def prep_async(self, shared_storage):
+                return [0, 1, 2]
+            async def exec_async(self, item):
+                await asyncio.sleep(10 if item == 1 else 0)
+                return item
+            async def exec_fallback_async(self, prep_res, exc):
+                return None
+            async def post_async(self, shared_storage, prep_result, exec_result):
+                shared_storage['results'] = exec_result
+
+        shared_storage = {}
+        start = time.monotonic()
+        asyncio.run(Items().run_async(shared_storage))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(shared_storage['results'], [0, None, 2])
+
+class TestFlowDeadline(unittest.TestCase):
+    def test_remaining_time_passed_to_nested_flows(self):
+        """
+        测试流程的截止时间传递给嵌套流程，嵌套流程自己的 timeout 更短时使用较早的截止时间
+        """
+        inner = Flow(start=BudgetNode())
+        inner.timeout = 5
+        outer = Flow(start=BudgetNode())
+        outer.start_node >> inner
+        outer.timeout = 60
+        shared_storage = {}
+        outer.run(shared_storage)
+        outer_budget, inner_budget = shared_storage['budgets']
+        self.assertTrue(59 < outer_budget <= 60)
+        self.assertTrue(4 < inner_budget <= 5)
+        self.assertIsNone(remaining_time())
+
+        # 嵌套流程的 timeout 不能延长外层流程的截止时间
+        outer.timeout, inner.timeout = 2, 60
+        shared_storage = {}
+        outer.run(shared_storage)
+        self.assertTrue(shared_storage['budgets'][1] <= 2)
+
+    def test_deadline_caps_exec_and_stops_flow(self):
+        """
+        测试流程超过截止时间后，设置了 exec_timeout 的节点超时，之后的节点不再开始
+        """
+        class Hang(SlowNode):
+            exec_timeout = 30
+            def exec_fallback(self, prep_res, exc):
+                raise exc
+
+        first, second = Hang([10]), BudgetNode()
+        first >> second
+        flow = Flow(start=first)
+        flow.timeout = 0.1
+        shared_storage = {}
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            flow.run(shared_storage)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertNotIn('budgets', shared_storage)
+
+    def test_deadline_without_exec_timeout(self):
+        """
+        测试只有流程截止时间的同步节点在调用方线程中运行 exec（可以使用 prep 中打开的 sqlite 连接），
+        运行中不被中断；截止时间过后不再重试，也不再开始之后的节点
+        """
+        tries = []
+        class Query(SlowNode):
+            exec_timeout = None
+            def prep(self, shared_storage):
+                self.conn = sqlite3.connect(":memory:")
+                return threading.get_ident()
+            def exec(self, prep_res):
+                super().exec(prep_res)
+                tries.append(self.attempts)
+                if self.attempts < 3:
+                    raise ConnectionError("retry")
+                return self.conn.execute("SELECT 1").fetchone()[0], threading.get_ident() == prep_res
+
+        first, second = Query([0, 0, 0], max_retries=3), BudgetNode()
+        first >> second
+        flow = Flow(start=first)
+        flow.timeout = 10
+        shared_storage = {}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['result'], (1, True))
+
+        first.delays, first.max_retries = [0.2], 5
+        tries.clear()
+        shared_storage = {}
+        flow.timeout = 0.1
+        with self.assertRaises(TimeoutError):
+            flow.run(shared_storage)
+        self.assertEqual(tries, [1])
+        self.assertEqual(shared_storage['result'], "ConnectionError")
+        self.assertNotIn('budgets', shared_storage)
+
+    def test_async_flow_deadline(self):
+        """
+        测试异步流程在截止时间到达后不再开始新的节点
+        """
+        class Sleep(AsyncNode):
+            async def exec_async(self, prep_res):
+                await asyncio.sleep(0.06)
+
+        a, b, c = Sleep(), Sleep(), Sleep()
+        a >> b >> c
+        flow = AsyncFlow(start=a)
+        flow.timeout = 0.1
+        with self.assertRaises(TimeoutError):
+            asyncio.run(flow.run_async({}))
+
+if __name__ == '__main__':
+    unittest.main()
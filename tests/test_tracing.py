@@ -0,0 +1,134 @@
+import unittest
+import asyncio
+import json
+import tempfile
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import Node, AsyncNode, BatchNode, Flow, AsyncFlow, BatchFlow, AsyncParallelBatchNode, Tracer
+
+class FlakyNode(Node):
+    # 前两次 exec 失败，第三次成功
+    def __init__(self):
+        super().__init__(max_retries=3)
+        self.failures = 2
+
+    def prep(self, shared_storage):
+        return shared_storage.get('value', 1)
+
+    def exec(self, value):
+        if self.failures:
+            self.failures -= 1
+            raise ValueError("故意失败")
+        return value * 2
+
+    def post(self, shared_storage, prep_result, exec_result):
+        shared_storage['result'] = exec_result
+        return "next"
+
+class DoubleEach(BatchNode):
+    def prep(self, shared_storage):
+        return [1, 2, 3]
+
+    def exec(self, item):
+        return item * 2
+
+class AsyncDoubleEach(AsyncParallelBatchNode):
+    async def prep_async(self, shared_storage):
+        return [1, 2, 3]
+
+    async def exec_async(self, item):
+        await asyncio.sleep(0.01)
+        return item * 2
+
+class EndNode(Node):
+    def post(self, shared_storage, prep_result, exec_result):
+        return "end"
+
+class TestTracing(unittest.TestCase):
+    def test_phases_attempts_and_action(self):
+        """
+        测试记录 prep、每次 exec 尝试和 post，以及所选动作和所属流程
+        """
+        flaky, end = FlakyNode(), EndNode()
+        flaky - "next" >> end
+        with Tracer() as tracer:
+            Flow(start=flaky).run({})
+
+        flaky_events = [e for e in tracer.events if e['node'] == 'FlakyNode' and e['cat'] == 'phase']
+        self.assertEqual([e['name'] for e in flaky_events], ['prep', 'exec', 'exec', 'exec', 'post'])
+        self.assertEqual([e['attempt'] for e in flaky_events if e['name'] == 'exec'], [0, 1, 2])
+        self.assertIsNotNone(flaky_events[1]['error'])
+        self.assertIsNone(flaky_events[3]['error'])
+        self.assertEqual(flaky_events[-1]['action'], 'next')
+        self.assertTrue(all(e['flow'] == 'Flow' for e in flaky_events))
+
+        steps = [e for e in tracer.events if e['cat'] == 'node']
+        self.assertEqual([(e['name'], e['action']) for e in steps], [('FlakyNode', 'next'), ('EndNode', 'end')])
+        self.assertTrue(all(e['dur'] >= 0 for e in tracer.events))
+
+    def test_batch_item_index(self):
+        """
+        测试批处理节点的每次 exec 记录项目下标
+        """
+        with Tracer() as tracer:
+            DoubleEach().run({})
+        execs = [e for e in tracer.events if e['name'] == 'exec']
+        self.assertEqual([e['item'] for e in execs], [0, 1, 2])
+
+    def test_batch_flow_item_index(self):
+        """
+        测试批处理流程中每组参数的子流程事件记录批次下标
+        """
+        class Items(BatchFlow):
+            def prep(self, shared_storage):
+                return [{'i': i} for i in range(3)]
+
+        with Tracer() as tracer:
+            Items(start=EndNode()).run({})
+        steps = [e for e in tracer.events if e['cat'] == 'node']
+        self.assertEqual([e['item'] for e in steps], [0, 1, 2])
+
+    def test_async_parallel_lanes(self):
+        """
+        测试并行的异步项目记录在不同泳道中
+        """
+        async def run():
+            with Tracer() as tracer:
+                await AsyncFlow(start=AsyncDoubleEach()).run_async({})
+            return tracer
+
+        tracer = asyncio.run(run())
+        execs = [e for e in tracer.events if e['name'] == 'exec']
+        self.assertEqual(sorted(e['item'] for e in execs), [0, 1, 2])
+        self.assertEqual(len({e['lane'] for e in execs}), 3)
+
+    def test_disabled(self):
+        """
+        测试未启用追踪时不记录任何事件
+        """
+        tracer = Tracer()
+        Flow(start=FlakyNode()).run({})
+        self.assertEqual(tracer.events, [])
+
+    def test_callback_and_chrome_export(self):
+        """
+        测试回调和 Chrome trace-event JSON 导出
+        """
+        seen = []
+        with Tracer(callback=seen.append) as tracer:
+            Flow(start=FlakyNode()).run({'value': 5})
+        self.assertEqual(seen, tracer.events)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "trace.json"
+            tracer.save(path)
+            data = json.loads(path.read_text())
+        events = data['traceEvents']
+        self.assertEqual(len(events), len(tracer.events))
+        self.assertTrue(all(e['ph'] == 'X' and 'ts' in e and 'dur' in e and 'tid' in e for e in events))
+        self.assertEqual(events[-1]['args']['node'], 'FlakyNode')
+
+if __name__ == '__main__':
+    unittest.main()
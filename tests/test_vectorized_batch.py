@@ -0,0 +1,127 @@
+import unittest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pocketflow import BatchNode, Flow, Tracer, RateLimiter
+
+class Scale(BatchNode):
+    # 模拟向量化运算：一次处理一整块项目
+    def __init__(self, fail_on=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_on, self.chunks, self.singles = fail_on, [], []
+
+    def prep(self, shared_storage):
+        return shared_storage['values']
+
+    def exec_batch(self, items):
+        self.chunks.append(list(items))
+        if self.fail_on in items:
+            raise ValueError("chunk failed")
+        return (x * 2 for x in items)
+
+    def exec(self, item):
+        self.singles.append(item)
+        if item == self.fail_on and len([s for s in self.singles if s == item]) < 2:
+            raise ValueError("item failed")
+        return item * 2
+
+    def post(self, shared_storage, prep_res, exec_res):
+        shared_storage['out'] = exec_res
+
+class Costs(RateLimiter):
+    # 记录每次取得的额度
+    def __init__(self):
+        super().__init__(rps=1000)
+        self.costs = []
+
+    def acquire(self, cost=0):
+        self.costs.append(cost)
+        return super().acquire(cost)
+
+class BatchOnly(BatchNode):
+    # 只实现 exec_batch，没有单项的 exec
+    def exec_batch(self, items):
+        raise RuntimeError("chunk failed")
+
+class Short(BatchNode):
+    def exec_batch(self, items):
+        return items[:-1]
+
+class TestVectorizedBatch(unittest.TestCase):
+    def test_whole_batch(self):
+        """
+        测试重写 exec_batch 后整个批次只调用一次，结果可以是任意可迭代对象
+        """
+        node = Scale()
+        shared_storage = {'values': list(range(10))}
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['out'], [x * 2 for x in range(10)])
+        self.assertEqual(node.chunks, [list(range(10))])
+        self.assertEqual(node.singles, [])
+
+    def test_chunks_and_param_override(self):
+        """
+        测试按 batch_size 分块，并可通过 params 按次运行覆盖
+        """
+        node = Scale()
+        node.batch_size = 4
+        node.run({'values': list(range(10))})
+        self.assertEqual([len(c) for c in node.chunks], [4, 4, 2])
+
+        node = Scale()
+        flow = Flow(start=node)
+        flow.set_params({'batch_size': 3})
+        shared_storage = {'values': list(range(7))}
+        flow.run(shared_storage)
+        self.assertEqual(shared_storage['out'], [x * 2 for x in range(7)])
+
+    def test_chunk_failure_falls_back_per_item(self):
+        """
+        测试某一块失败时，该块内的项目逐个调用 exec（含重试），其他块不受影响
+        """
+        node = Scale(fail_on=5, max_retries=2)
+        node.batch_size = 4
+        shared_storage = {'values': list(range(10))}
+        with Tracer() as tracer:
+            node.run(shared_storage)
+        self.assertEqual(shared_storage['out'], [x * 2 for x in range(10)])
+        self.assertEqual(node.singles, [4, 5, 5, 6, 7])
+        self.assertEqual([e['size'] for e in tracer.events if e['name'] == 'exec_batch'], [4, 4, 2])
+        self.assertEqual(sorted({e['item'] for e in tracer.events if e['name'] == 'exec'}), [4, 5, 6, 7])
+
+    def test_chunk_failure_without_exec(self):
+        """
+        测试只实现 exec_batch 的节点整块失败时不回退为默认的 exec（返回 None），异常交给 exec_fallback
+        """
+        with self.assertRaises(RuntimeError):
+            BatchOnly()._exec([1, 2, 3])
+
+        class Fallback(BatchOnly):
+            def exec_fallback(self, prep_res, exc):
+                return type(exc).__name__
+        self.assertEqual(Fallback()._exec([1, 2]), ["RuntimeError", "RuntimeError"])
+
+    def test_fallback_not_charged_twice(self):
+        """
+        测试整块已计入限流时，逐项回退的第一次尝试不再计入，之后的重试照常计入
+        """
+        class Costly(Scale):
+            def rate_cost(self, item):
+                return item
+        node = Costly(fail_on=5, max_retries=2)
+        node.batch_size, node.rate_limit = 4, Costs()
+        shared_storage = {'values': list(range(10))}
+        node.run(shared_storage)
+        self.assertEqual(shared_storage['out'], [x * 2 for x in range(10)])
+        self.assertEqual(node.rate_limit.costs, [6, 22, 5, 17])
+
+    def test_misaligned_results(self):
+        """
+        测试 exec_batch 返回的结果数与项目数不一致时报错
+        """
+        with self.assertRaises(ValueError):
+            Short()._exec([1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()